@@ -0,0 +1,151 @@
+#! .env/bin/python
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import json
+import os
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from agent import Agent
+from algorithms import Algorithms
+from consts import Spaces
+from inspectors.factory import InspectorsFactory
+from problems import Problems
+import resources
+
+# Benchmarks the calibration table of the resource estimates (see
+# `src/resources.py`): the size of the items the algorithms allocate and the
+# time of a step of each algorithm and problem, with their default
+# parameters. Writes the table to `src/calibration.json`.
+
+# number of items allocated to measure their size
+N_ITEMS = 100000
+# number of episodes each algorithm is timed over at most, and time it is
+# timed for at most (in seconds)
+N_EPISODES = 20
+TIME_BUDGET = 10
+# number of steps between checks of the time budget
+CHUNK_STEPS = 10
+
+# problems the algorithms are timed on, by state space
+REFERENCE_PROBLEMS = {
+    Spaces.Discrete: 'PresetGridWorld',
+    Spaces.Continuous: 'NativeMountainCar'
+}
+
+# parameters overriding the defaults of the algorithms when timed, so they
+# run in this process only
+ALGORITHM_PARAMS = {
+    'HogwildSarsa': {'nWorkers': 1},
+    'CrossEntropyMethod': {'nWorkers': 1}
+}
+
+
+def deepSize(obj):
+    """
+    Bytes used by `obj` and the dicts, tuples and lists it holds.
+    """
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deepSize(k) + deepSize(v) for k, v in obj.iteritems())
+    elif isinstance(obj, (tuple, list)):
+        size += sum(deepSize(item) for item in obj)
+    return size
+
+
+def itemSize(build):
+    """
+    Bytes used per item by the structure of `N_ITEMS` items `build` returns.
+    """
+    return float(deepSize(build(N_ITEMS))) / N_ITEMS
+
+
+def measureBytes():
+    states = lambda n: ((float(i), float(i)) for i in xrange(n))
+    # dict tables of 4 and 16 actions: the difference gives the size of an
+    # entry, the rest the size of a state
+    small = itemSize(lambda n: {s: {a: 0 for a in xrange(4)}
+                                for s in states(n)})
+    large = itemSize(lambda n: {s: {a: 0 for a in xrange(16)}
+                                for s in states(n)})
+    entry = (large - small) / 12
+    return {
+        'float64': 8,
+        'dictState': small - 4 * entry,
+        'dictEntry': entry,
+        'indexEntry': itemSize(
+            lambda n: {s: i for i, s in enumerate(states(n))})
+    }
+
+
+def timeProblem(name):
+    problem = Problems[name]()
+    problem.setup()
+    actions = problem.getActionsList()
+    nSteps = 0
+    startT = time.time()
+    for iEpisode in xrange(N_EPISODES):
+        problem.reset()
+        for iStep in xrange(problem.maxSteps):
+            problem.step(actions[iStep % len(actions)])
+            nSteps += 1
+            if problem.episodeDone(stepI=iStep):
+                break
+    return (time.time() - startT) / nSteps
+
+
+def timeAlgorithm(name, problemStepTime):
+    """
+    Time of a step of the algorithm, on its reference problem, without the
+    time spent in the problem.
+    """
+    cls = Algorithms[name]
+    algo = cls(**dict(cls.PARAMS_DEFAULT, **ALGORITHM_PARAMS.get(name, {})))
+    problem = Problems[REFERENCE_PROBLEMS[algo.DOMAIN['state']]]()
+    agent = Agent(inspectorsFactory=InspectorsFactory(lambda message: None),
+                  nEpisodes=N_EPISODES, renderFreq=-1)
+    agent.setup(problem, algo)
+    nSteps = 0
+    startT = time.time()
+    for _, _, iStep, done in agent.train(yieldSteps=False,
+                                          chunkSteps=CHUNK_STEPS):
+        if done or time.time() - startT > TIME_BUDGET:
+            nSteps += iStep + 1
+        if not done and time.time() - startT > TIME_BUDGET:
+            break
+    duration = time.time() - startT
+    algo.release()
+    return max(0, duration / nSteps - problemStepTime[
+        problem.__class__.__name__])
+
+
+def main():
+    table = {'bytes': measureBytes()}
+    problems = {name: timeProblem(name) for name in Problems}
+    algorithms = {}
+    for name, cls in Algorithms.iteritems():
+        print "Timing %s..." % name
+        try:
+            algorithms[name] = timeAlgorithm(name, problems)
+        except Exception as e:
+            print "Unable to time %s: %s" % (name, e)
+    stepTimes = sorted(algorithms.values() + problems.values())
+    table['stepTime'] = {
+        'algorithms': algorithms,
+        'problems': problems,
+        # unknown algorithms and problems
+        'default': stepTimes[len(stepTimes) // 2]
+    }
+    with open(resources.CALIBRATION_PATH, 'w') as f:
+        json.dump(table, f, indent=4, sort_keys=True,
+                  separators=(',', ': '))
+    print json.dumps(table, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
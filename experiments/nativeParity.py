@@ -0,0 +1,109 @@
+#! .env/bin/python
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import os
+import sys
+
+import gym
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from problems.cartPole import NativeCartPole
+from problems.mountainCar import NativeMountainCar
+
+# Checks that the native problems simulate exactly the gym environments
+# they re-implement: with the same seed and random actions, the states,
+# rewards and done flags should be bit-for-bit identical, for single
+# instances (`reset` / `step`) as well as for batches (`resetBatch` /
+# `stepBatch`). Run it again after any change to their physics.
+
+PROBLEMS = (NativeMountainCar, NativeCartPole)
+N_SEEDS = 20
+N_STEPS = 300
+BATCH_SIZE = 50
+
+
+def checkSingle(cls, seed):
+    """
+    Returns the step at which the problem and the gym environment first
+    differ, None if they never do.
+    """
+    problem = cls()
+    problem.setup()
+    problem.seed(seed)
+    env = gym.make(cls.GYM_ENVIRONMENT_NAME)
+    env.seed(seed)
+    actions = np.random.RandomState(seed).randint(
+        cls.NB_ACTIONS, size=N_STEPS)
+
+    if not (problem.reset() == env.reset()).all():
+        return 0
+    for iStep, action in enumerate(actions):
+        state, reward, done, _ = problem.step(action)
+        expected, expectedReward, expectedDone, _ = env.step(action)
+        if not ((state == expected).all() and reward == expectedReward and
+                done == expectedDone):
+            return iStep + 1
+        if done:
+            break
+    return None
+
+
+def checkBatch(cls, seed):
+    """
+    Returns the step at which the batch and the gym environment first
+    differ, None if they never do. Each instance of the batch is compared
+    with the gym environment started from the same state: drawing the
+    states of a batch consumes the generator as successive resets do.
+    """
+    problem = cls()
+    problem.setup()
+    problem.seed(seed)
+    env = gym.make(cls.GYM_ENVIRONMENT_NAME)
+    env.seed(seed)
+    actions = np.random.RandomState(seed).randint(
+        cls.NB_ACTIONS, size=(N_STEPS, BATCH_SIZE))
+
+    states = problem.resetBatch(BATCH_SIZE)
+    starts = np.array([env.reset() for _ in xrange(BATCH_SIZE)])
+    if not (states == starts).all():
+        return 0
+    steps = [problem.stepBatch(stepActions) for stepActions in actions]
+    for i in xrange(BATCH_SIZE):
+        env.reset()
+        env.unwrapped.state = starts[i].copy()
+        for iStep, (states, rewards, dones) in enumerate(steps):
+            expected, expectedReward, expectedDone, _ = env.step(
+                actions[iStep, i])
+            if not ((states[i] == expected).all() and
+                    rewards[i] == expectedReward and
+                    dones[i] == expectedDone):
+                return iStep + 1
+            if expectedDone:
+                break
+    return None
+
+
+def main():
+    ok = True
+    for cls in PROBLEMS:
+        for name, check in (('single', checkSingle), ('batch', checkBatch)):
+            failures = [(seed, step) for seed, step in (
+                (seed, check(cls, seed)) for seed in xrange(N_SEEDS))
+                if step is not None]
+            ok = ok and not failures
+            print "%s (%s): %s" % (
+                cls.__name__, name, "identical over %d seeds" % N_SEEDS
+                if not failures else "differs at " + ", ".join(
+                    "step %d of seed %d" % (step, seed)
+                    for seed, step in failures))
+    print "OK" if ok else "FAILED"
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#! .env/bin/python
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import os
+import sys
+
+import numpy as np
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+from agent import Agent
+from algorithms import Algorithms
+from inspectors.factory import InspectorsFactory
+from problems import Problems
+from problems.vector import VectorProblem
+import utils
+
+# Checks the batch interface of `VectorProblem` against copies of the gym
+# problem it wraps stepped one by one in this process: the states, rewards
+# and done flags of `resetBatch` / `stepBatch` should be exactly the same,
+# the copies ending at `maxSteps` at the latest. Then checks that
+# `Agent.evaluate` gives the same results through a vector of copies
+# (`nCopies` > 1) as through the pool of evaluation workers.
+
+PROBLEM = 'MountainCar'
+MAX_STEPS = 150
+N_COPIES = 4
+N_WORKERS = 2
+SEED = 7
+
+
+def checkBatch():
+    """
+    Returns the largest difference between the states and rewards of the
+    vector and of the reference copies, and whether their done flags always
+    matched.
+    """
+    vector = VectorProblem(Problems[PROBLEM](maxSteps=MAX_STEPS),
+                           nCopies=N_COPIES, nWorkers=N_WORKERS)
+    vector.setup()
+    # the copies of the vector are seeded with the values following the seed
+    vector.seed(SEED)
+    copies = []
+    for i in xrange(N_COPIES):
+        problem = Problems[PROBLEM](maxSteps=MAX_STEPS)
+        problem.setup()
+        problem.seed(SEED + 1 + i)
+        copies.append(problem)
+
+    states = vector.resetBatch(N_COPIES)
+    expected = np.array([problem.reset() for problem in copies])
+    maxDiff = np.abs(states - expected).max()
+    sameDones = True
+    done = np.zeros(N_COPIES, dtype=bool)
+    rng = np.random.RandomState(SEED)
+    nActions = len(vector.getActionsList())
+    for iStep in xrange(MAX_STEPS + 1):
+        if done.all():
+            break
+        actions = rng.randint(nActions, size=N_COPIES)
+        states, rewards, dones = vector.stepBatch(actions)
+        for i, problem in enumerate(copies):
+            if done[i]:
+                continue
+            state, reward, stepDone, _ = problem.step(actions[i])
+            done[i] = (stepDone or problem.episodeDone(stepI=iStep) or
+                       iStep + 1 >= MAX_STEPS)
+            maxDiff = max(maxDiff, np.abs(states[i] - state).max(),
+                          abs(rewards[i] - reward))
+        sameDones = sameDones and (dones == done).all()
+    vector.release()
+    for problem in copies:
+        problem.release()
+    return maxDiff, sameDones and done.all()
+
+
+def evaluate(nCopies):
+    """
+    Returns the summaries of the returns and steps of the evaluation
+    episodes of an agent trained on a few episodes.
+    """
+    results = []
+
+    class Factory(InspectorsFactory):
+        def dispatch(self, hook, **kwargs):
+            if 'returns' in kwargs:
+                results.append(kwargs)
+
+    utils.seed(SEED)
+    cls = Algorithms['RoundingSarsa']
+    agent = Agent(inspectorsFactory=Factory(lambda message: None),
+                  nEpisodes=3, renderFreq=-1, nEvalEpisodes=2 * N_COPIES,
+                  nEvalWorkers=N_WORKERS, nCopies=nCopies)
+    agent.setup(Problems[PROBLEM](maxSteps=MAX_STEPS),
+                cls(**cls.PARAMS_DEFAULT))
+    for _ in agent.train(yieldSteps=False):
+        pass
+    for _ in agent.evaluate():
+        pass
+    agent.release()
+    return results[-1]['returns'], results[-1]['steps']
+
+
+def main():
+    maxDiff, sameDones = checkBatch()
+    print "Batch of %d copies: largest difference %g, done flags %s" % (
+        N_COPIES, maxDiff, "match" if sameDones else "DIFFER")
+    pool = evaluate(1)
+    vector = evaluate(N_COPIES)
+    for name, (returns, steps) in (('workers', pool), ('copies', vector)):
+        print "Evaluation through %s: return %.2f, steps %.1f (max %d)" % (
+            name, returns['mean'], steps['mean'], steps['max'])
+    ok = (maxDiff == 0 and sameDones and vector[1]['max'] <= MAX_STEPS and
+          pool[0]['mean'] == vector[0]['mean'])
+    print "OK" if ok else "FAILED"
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#! .env/bin/python
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import json
+import time
+from collections import Counter
+
+import numpy as np
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.options import define, options, parse_command_line
+from tornado.websocket import websocket_connect
+
+# Load test of the server: opens many training websockets at once, each one
+# training a small agent and opening its control channel, and reports how
+# long the server took to answer and how the sessions were spread over the
+# server processes (by control port).
+# Start the server with e.g. `python src/server.py --processes=4` first.
+
+define('host', default='localhost:8888', help="Server to connect to.")
+define('clients', default=50, type=int, help="Number of concurrent clients.")
+define('episodes', default=200, type=int,
+       help="Number of training episodes of each client.")
+
+
+TRAIN_COMMAND = {
+    'command': 'train',
+    'algorithm': {'name': 'Sarsa', 'params': {'epsilon': 0.1}},
+    'problem': {'name': 'PresetGridWorld', 'params': {}},
+    'agent': {'params': {'renderFreq': -1, 'episodeDelay': 0}}
+}
+
+
+@gen.coroutine
+def client(iClient):
+    """
+    Run one training session. Returns the control port of the session, the
+    time to get the session, to open its control channel and to finish the
+    training.
+    """
+    startT = time.time()
+    conn = yield websocket_connect('ws://%s/subscribe/train' % options.host)
+    session = json.loads((yield conn.read_message()))
+    sessionT = time.time() - startT
+
+    control = yield websocket_connect('ws://%s:%d/subscribe/control/%s' % (
+        options.host.split(':')[0], session['port'], session['token']))
+    controlT = time.time() - startT
+
+    # positions in the job queue reported to the client
+    positions = []
+    command = dict(TRAIN_COMMAND)
+    command['agent'] = {'params': dict(
+        TRAIN_COMMAND['agent']['params'], nEpisodes=options.episodes)}
+    conn.write_message(json.dumps(command))
+    while True:
+        message = yield conn.read_message()
+        if message is None:
+            raise Exception("Client %d: connection closed" % iClient)
+        message = json.loads(message)
+        if message['route'] == 'queued':
+            positions.append(message['position'])
+        if message['route'] in ('success', 'error'):
+            break
+    doneT = time.time() - startT
+    if message['route'] == 'error':
+        print "Client %d: %s" % (iClient, message['message'])
+    control.close()
+    conn.close()
+    raise gen.Return((session['port'], sessionT, controlT, doneT,
+                      max(positions or [0])))
+
+
+def report(name, values):
+    print "%-10s mean %.3fs - p50 %.3fs - p95 %.3fs - max %.3fs" % (
+        name, np.mean(values), np.percentile(values, 50),
+        np.percentile(values, 95), np.max(values))
+
+
+@gen.coroutine
+def main():
+    startT = time.time()
+    results = yield [client(i) for i in xrange(options.clients)]
+    print "%d clients done in %.2fs" % (len(results), time.time() - startT)
+    ports, sessionT, controlT, doneT, positions = zip(*results)
+    report('session', sessionT)
+    report('control', controlT)
+    report('training', doneT)
+    print "%d clients queued, up to position %d" % (
+        sum(1 for p in positions if p), max(positions))
+    for port, count in sorted(Counter(ports).iteritems()):
+        print "port %d: %d sessions" % (port, count)
+
+
+if __name__ == '__main__':
+    parse_command_line()
+    IOLoop.current().run_sync(main)
@@ -5,9 +5,27 @@ from __future__ import unicode_literals
 import time
 import logging
 logger = logging.getLogger(__name__)
+import multiprocessing
+
+import numpy as np
 
 from parametizable import Parametizable
 from consts import ParamsTypes, Spaces, Hooks
+from convergence import Criteria
+import evaluation
+import swap
+from problems.vector import VectorProblem
+
+
+# agent parameters running the training at full speed: no rendering nor
+# delays, and a single seed (see `cli` and `sweep`)
+HEADLESS_PARAMS = {
+    'renderFreq': -1,
+    'stepDelay': 0,
+    'episodeDelay': 0,
+    'renderStepDelay': 0,
+    'nSeeds': 1
+}
 
 
 class AgentException(Exception):
@@ -21,7 +39,17 @@ class Agent(Parametizable):
         'renderFreq': ParamsTypes.Number,
         'stepDelay': ParamsTypes.Number,
         'episodeDelay': ParamsTypes.Number,
-        'renderStepDelay': ParamsTypes.Number
+        'renderStepDelay': ParamsTypes.Number,
+        'nEvalEpisodes': ParamsTypes.Number,
+        'nEvalWorkers': ParamsTypes.Number,
+        'stopCriterion': ParamsTypes.String,
+        'stopWindow': ParamsTypes.Number,
+        'stopTolerance': ParamsTypes.Number,
+        'checkpointEpisodes': ParamsTypes.Number,
+        'checkpointInterval': ParamsTypes.Number,
+        'actionRepeat': ParamsTypes.Number,
+        'nSeeds': ParamsTypes.Number,
+        'nCopies': ParamsTypes.Number
     }
 
     PARAMS_DOMAIN = {
@@ -44,6 +72,45 @@ class Agent(Parametizable):
         'episodeDelay': {
             'range': (0, 10000),
             'values': [0, 1, 100]
+        },
+        'nEvalEpisodes': {
+            'range': (0, float('inf')),
+            'values': [0, 10, 100, 1000]
+        },
+        'nEvalWorkers': {
+            'range': (1, 256),
+            'values': ['auto', 1, 2, 4, 8]
+        },
+        'stopCriterion': {
+            'values': ['none'] + sorted(Criteria.keys())
+        },
+        'stopWindow': {
+            'range': (1, float('inf')),
+            'values': [10, 100, 1000]
+        },
+        'stopTolerance': {
+            'range': (0, float('inf')),
+            'values': [0, 0.001, 0.01, 0.05]
+        },
+        'checkpointEpisodes': {
+            'range': (0, float('inf')),
+            'values': [0, 100, 1000, 10000]
+        },
+        'checkpointInterval': {
+            'range': (0, float('inf')),
+            'values': [0, 60, 300, 1800]
+        },
+        'actionRepeat': {
+            'range': (1, 1000),
+            'values': [1, 2, 4, 8]
+        },
+        'nSeeds': {
+            'range': (1, 64),
+            'values': [1, 3, 5, 10]
+        },
+        'nCopies': {
+            'range': (1, 100000),
+            'values': [1, 8, 32, 128]
         }
     }
 
@@ -52,7 +119,17 @@ class Agent(Parametizable):
         'renderFreq': 500,
         'stepDelay': 0,
         'episodeDelay': 1,
-        'renderStepDelay': 0
+        'renderStepDelay': 0,
+        'nEvalEpisodes': 0,
+        'nEvalWorkers': 'auto',
+        'stopCriterion': 'none',
+        'stopWindow': 100,
+        'stopTolerance': 0.01,
+        'checkpointEpisodes': 0,
+        'checkpointInterval': 0,
+        'actionRepeat': 1,
+        'nSeeds': 1,
+        'nCopies': 1
     }
 
     PARAMS_DESCRIPTION = {
@@ -68,7 +145,45 @@ Delay in ms between steps. Set to 0 will disable delaying.",
         'renderStepDelay': "Delay in ms between steps while rendering.",
         'episodeDelay': "\
 Delay in ms between episodes. Set to 0 will disable delaying. Note that server \
-will only reply to requests during delays."
+will only reply to requests during delays.",
+        'nEvalEpisodes': "\
+Number of greedy episodes the agent is evaluated over once trained, without \
+rendering. Set to 0 to disable.",
+        'nEvalWorkers': "\
+Number of processes the evaluation episodes are spread over, unless the \
+problem can simulate them all at once. 'auto' uses one per core.",
+        'stopCriterion': "\
+Stop the training early once it converged according to this criterion: \
+ReturnPlateau compares the mean return of successive windows of episodes, \
+ValueChange the action values of a sample of states, PolicyChange the greedy \
+actions in a sample of states.",
+        'stopWindow': "\
+Number of episodes between two checks of the convergence criterion.",
+        'stopTolerance': "\
+Change between two checks below which the training is considered converged: \
+relative change of the mean return for ReturnPlateau, absolute change of the \
+values for ValueChange, fraction of states whose action changed for \
+PolicyChange.",
+        'checkpointEpisodes': "\
+Save a checkpoint of the training every this number of episodes, so it can be \
+resumed if interrupted. Set to 0 to disable.",
+        'checkpointInterval': "\
+Save a checkpoint of the training every this number of seconds. Set to 0 to \
+disable.",
+        'actionRepeat': "\
+Number of steps each action picked is repeated for (frame skip). The \
+algorithm is trained once per action, on the discounted sum of the rewards \
+received over these steps.",
+        'nSeeds': "\
+Number of seeds the training is run over, the other seeds running in parallel \
+worker processes at full speed. EfficiencyInspector then shows the mean and \
+spread of the seeds rather than a single training. Runs resumed from a \
+checkpoint only train the agent.",
+        'nCopies': "\
+Number of copies of gym problems simulated at once, in nEvalWorkers worker \
+processes, to evaluate the agent: the evaluation episodes run in batches of \
+this size. Problems simulated natively always run all the episodes at once. \
+Set to 1 to disable."
     }
 
     def __init__(self, inspectorsFactory=None, **kwargs):
@@ -82,6 +197,20 @@ will only reply to requests during delays."
         self._minDuration = float('inf')
         self._iEpisode = 0
         self._isTesting = False
+        # why the last training stopped before `nEpisodes`, if it did
+        self.stopReason = None
+        # saves the checkpoints of the training, if any (see `checkpoint`)
+        self.checkpointer = None
+        self._lastCheckpointT = None
+        # episode the next training starts from, when resuming one
+        self.startEpisode = 0
+
+    @property
+    def iEpisode(self):
+        """
+        Number of training episodes done so far.
+        """
+        return self._iEpisode
 
     def _checkCompatibility(self, problem, algo):
         """
@@ -131,13 +260,15 @@ will only reply to requests during delays."
 
         self._algo.startEpisode(state)
 
+        repeat = int(self.actionRepeat)
         for iStep in xrange(self._problem.maxSteps):
             newState, reward, _, info = self._problem.step(action)
             episodeReturn += reward
 
             # no training this time
-            action = self._algo.pickAction(
-                newState, self.nEpisodes, optimize=True)
+            if (iStep + 1) % repeat == 0:
+                action = self._algo.pickAction(
+                    newState, self.nEpisodes, optimize=True)
 
             state = newState
 
@@ -170,6 +301,113 @@ will only reply to requests during delays."
             episodeDuration=duration if not didRender else self._minDuration)
         self._isTesting = False
 
+    def evaluate(self):
+        """
+        Returns an iterator that will run `nEvalEpisodes` episodes following
+        the greedy policy of the algorithm, without training it nor rendering.
+        Problems supporting batches simulate all the episodes at once. Gym
+        problems are simulated in batches of `nCopies` copies if it is set
+        (see `VectorProblem`), otherwise the episodes are spread over
+        `nEvalWorkers` worker processes. So are the episodes of algorithms
+        planning from the problem they were setup on, which can't act on
+        the copies of a batch.
+        It yields the same values as `train`, the episode number being the
+        number of evaluation episodes over so far. The episodes are never
+        reported as done.
+        Once the episodes are over, the statistics of their returns and
+        number of steps are dispatched to the inspectors.
+        """
+        nEpisodes = int(self.nEvalEpisodes)
+        if nEpisodes <= 0:
+            return
+        startT = time.time()
+        problem = self._problem
+        batchSize = nEpisodes
+        batch = not self._algo.PLANS_FROM_PROBLEM
+        if (batch and not problem.SUPPORTS_BATCH and
+                int(self.nCopies) > 1 and
+                problem.GYM_ENVIRONMENT_NAME is not None):
+            batchSize = min(int(self.nCopies), nEpisodes)
+            problem = VectorProblem(self._problem, nCopies=batchSize,
+                                    nWorkers=self.nEvalWorkers)
+            problem.setup()
+        if batch and problem.SUPPORTS_BATCH:
+            returns, steps = [], []
+            try:
+                for first in xrange(0, nEpisodes, batchSize):
+                    result = None
+                    for iStep, result in enumerate(evaluation.runBatch(
+                            problem, self._algo,
+                            min(batchSize, nEpisodes - first),
+                            self.nEpisodes)):
+                        yield 0, first + result.nDone, iStep, False
+                    if result is None:
+                        return
+                    returns.extend(result.returns)
+                    steps.extend(result.steps)
+            finally:
+                if problem is not self._problem:
+                    problem.releaseCopies()
+        else:
+            episodes = []
+            for episodes in self._runEvaluationEpisodes(nEpisodes):
+                yield 0, len(episodes), 0, False
+            returns, steps = zip(*episodes)
+        duration = time.time() - startT
+
+        logger.info(
+            "[Agent] Evaluated over %d episodes in %.2fs - return=%.2f ; "
+            "steps=%.1f", nEpisodes, duration, np.mean(returns),
+            np.mean(steps))
+        self._inspectorsFactory.dispatch(
+            hook=Hooks.evaluation,
+            nEpisodes=nEpisodes,
+            returns=evaluation.summarize(returns),
+            steps=evaluation.summarize(steps),
+            duration=duration)
+
+    def _runEvaluationEpisodes(self, nEpisodes):
+        """
+        Run the evaluation episodes one by one or in a pool of worker
+        processes. Yields the list of the returns and numbers of steps of the
+        episodes over so far.
+        """
+        nWorkers = (multiprocessing.cpu_count() if self.nEvalWorkers == 'auto'
+                    else int(self.nEvalWorkers))
+        nWorkers = min(nWorkers, nEpisodes)
+        if nWorkers <= 1:
+            episodes = []
+            for _ in xrange(nEpisodes):
+                episodes.append(evaluation.runEpisode(
+                    self._problem, self._algo, self.nEpisodes))
+                yield episodes
+            return
+
+        # a few tasks per worker so that results come in regularly
+        bounds = np.linspace(0, nEpisodes, nWorkers * 4 + 1).astype(int)
+        sizes = [size for size in np.diff(bounds) if size > 0]
+        seed = np.random.randint(2 ** 31 - len(sizes))
+        tasks = [(size, self.nEpisodes, seed + i)
+                 for i, size in enumerate(sizes)]
+        pool = multiprocessing.Pool(
+            nWorkers, evaluation._initWorker, (self._problem, self._algo))
+        try:
+            episodes = []
+            results = pool.imap_unordered(evaluation.runEpisodes, tasks)
+            while True:
+                # don't block the caller while the workers run the episodes
+                try:
+                    episodes.extend(results.next(timeout=0.005))
+                except multiprocessing.TimeoutError:
+                    pass
+                except StopIteration:
+                    break
+                yield episodes
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
     def shouldRender(self):
         # render if we are in testing and the renderFreq isn't -1
         shouldRender = self._isTesting and self.renderFreq != -1
@@ -182,53 +420,191 @@ will only reply to requests during delays."
                 (self._iEpisode - 1) % self.renderFreq == 0)))
         return shouldRender
 
-    def train(self):
+    def episodeStepDelay(self):
+        """
+        Delay in ms between the steps of the current episode.
+        """
+        return self.renderStepDelay if self.shouldRender() else self.stepDelay
+
+    def _episodeSteps(self, state, action, shouldRender):
+        """
+        Returns an iterator that will execute one step of the current training
+        episode each time its next() function is called. It yields the return
+        for the episode so far and the step number.
+        """
+        if int(self.actionRepeat) > 1:
+            for episodeReturn, iStep, _ in self._repeatedSteps(
+                    state, action, shouldRender):
+                yield episodeReturn, iStep
+            return
+        episodeReturn = 0
+        for iStep in xrange(self._problem.maxSteps):
+            newState, reward, _, info = self._problem.step(action)
+            episodeReturn += reward
+
+            action = self._algo.train(
+                oldState=state,
+                newState=newState,
+                action=action,
+                reward=reward,
+                episodeI=self._iEpisode,
+                stepI=iStep)
+
+            state = newState
+
+            if shouldRender:
+                self._problem.render()
+
+            done = self._problem.episodeDone(stepI=iStep)
+
+            yield episodeReturn, iStep
+
+            if done:
+                if shouldRender:
+                    self._problem.render(close=True)
+                break
+
+    def _runEpisode(self, state, action, shouldRender, chunkSteps=None):
+        """
+        Same as `_episodeSteps`, but only yields every `chunkSteps` steps (or
+        once the episode is over if `chunkSteps` is None). It yields the
+        return for the episode so far, the step number and whether the
+        episode is over.
+        This is the loop the agent spends most of its time in: attribute
+        lookups are hoisted out of it.
+        """
+        if int(self.actionRepeat) > 1:
+            for item in self._runRepeatedEpisode(
+                    state, action, shouldRender, chunkSteps):
+                yield item
+            return
+        problem = self._problem
+        step = problem.step
+        train = self._algo.train
+        episodeDone = problem.episodeDone
+        iEpisode = self._iEpisode
+        episodeReturn = 0
+        iStep = 0
+        nextYield = chunkSteps - 1 if chunkSteps else problem.maxSteps
+        for iStep in xrange(problem.maxSteps):
+            newState, reward, _, _ = step(action)
+            episodeReturn += reward
+            action = train(state, newState, action, reward, iEpisode, iStep)
+            state = newState
+            if shouldRender:
+                problem.render()
+            if episodeDone(iStep):
+                if shouldRender:
+                    problem.render(close=True)
+                break
+            if iStep == nextYield:
+                yield episodeReturn, iStep, False
+                nextYield += chunkSteps
+        yield episodeReturn, iStep, True
+
+    def _repeatedSteps(self, state, action, shouldRender):
+        """
+        Same as `_episodeSteps` when actions are repeated for `actionRepeat`
+        steps: yields after each action the return for the episode so far,
+        the number of the last step and whether the episode is over.
+        The algorithm is trained once per action, on the sum of the rewards
+        received while repeating it, discounted the way the algorithm
+        discounts them (see `BaseAlgo.discount`).
+        """
+        problem = self._problem
+        train = self._algo.train
+        iEpisode = self._iEpisode
+        lastStep = problem.maxSteps - 1
+        discounts = [self._algo.discount(i)
+                     for i in xrange(int(self.actionRepeat))]
+        episodeReturn = 0
+        iStep = -1
+        done = False
+        while not done and iStep < lastStep:
+            reward = 0
+            nSteps = 0
+            for discount in discounts:
+                iStep += 1
+                nSteps += 1
+                newState, stepReward, _, _ = problem.step(action)
+                episodeReturn += stepReward
+                reward += discount * stepReward
+                if shouldRender:
+                    problem.render()
+                done = problem.episodeDone(stepI=iStep)
+                if done or iStep == lastStep:
+                    break
+            action = train(state, newState, action, reward, iEpisode, iStep,
+                           nSteps)
+            state = newState
+            yield episodeReturn, iStep, done
+        if done and shouldRender:
+            problem.render(close=True)
+
+    def _runRepeatedEpisode(self, state, action, shouldRender, chunkSteps):
+        """
+        Same as `_runEpisode` when actions are repeated (see
+        `_repeatedSteps`).
+        """
+        episodeReturn = 0
+        iStep = 0
+        nextYield = chunkSteps - 1 if chunkSteps else self._problem.maxSteps
+        for episodeReturn, iStep, done in self._repeatedSteps(
+                state, action, shouldRender):
+            if iStep >= nextYield and not done:
+                yield episodeReturn, iStep, False
+                nextYield = iStep + chunkSteps
+        yield episodeReturn, iStep, True
+
+    def train(self, yieldSteps=True, chunkSteps=None):
         """
         Returns an iterator that will execute one step of the environment
         each time its next() function is called.
         After each step it yields the return for the episode (so far),
         the episode number, the step number and a boolean indicating whether
         the episode is terminated.
+        If `yieldSteps` is False, episodes that aren't delayed (see
+        `episodeStepDelay`) only yield every `chunkSteps` steps, or once done
+        if `chunkSteps` is None.
         Use inspectors and associated hook functions to gather more
         information about the execution of the environment.
+        Episodes the algorithm runs on its own (see
+        `BaseAlgo.collectEpisodes`) are counted and reported to the
+        inspectors as well.
+        The training stops early if it converged according to the
+        `stopCriterion`, `stopReason` telling why.
+        Checkpoints are saved every `checkpointEpisodes` episodes and every
+        `checkpointInterval` seconds if the agent has a `checkpointer`.
         """
-        for self._iEpisode in xrange(0, self.nEpisodes):
+        self._iEpisode = self.startEpisode
+        self._lastCheckpointT = time.time()
+        self.stopReason = None
+        self._algo.startTraining()
+        criterion = None
+        if self.stopCriterion in Criteria:
+            criterion = Criteria[self.stopCriterion](
+                self._problem, self._algo, self.stopWindow, self.stopTolerance)
+        while self._iEpisode < self.nEpisodes and self.stopReason is None:
             startT = time.time()
             timeSpentRendering = 0
             state = self._problem.reset()
             action = self._algo.pickAction(state, self._iEpisode)
             episodeReturn = 0
+            iStep = 0
             didRender = False
 
             self._algo.startEpisode(state)
 
-            for iStep in xrange(self._problem.maxSteps):
-                shouldRender = self.shouldRender()
-
-                newState, reward, _, info = self._problem.step(action)
-                episodeReturn += reward
-
-                action = self._algo.train(
-                    oldState=state,
-                    newState=newState,
-                    action=action,
-                    reward=reward,
-                    episodeI=self._iEpisode,
-                    stepI=iStep)
-
-                state = newState
-
-                if shouldRender:
-                    self._problem.render()
-
-                done = self._problem.episodeDone(stepI=iStep)
-
-                yield episodeReturn, self._iEpisode, iStep, False
-
-                if done:
-                    if shouldRender:
-                        self._problem.render(close=True)
-                    break
+            shouldRender = self.shouldRender()
+            if yieldSteps or self.episodeStepDelay() > 0:
+                for episodeReturn, iStep in self._episodeSteps(
+                        state, action, shouldRender):
+                    yield episodeReturn, self._iEpisode, iStep, False
+            else:
+                for episodeReturn, iStep, done in self._runEpisode(
+                        state, action, shouldRender, chunkSteps):
+                    if not done:
+                        yield episodeReturn, self._iEpisode, iStep, False
 
             duration = time.time() - startT - timeSpentRendering
             self._minDuration = min(self._minDuration, duration)
@@ -243,6 +619,70 @@ will only reply to requests during delays."
                 episodeSteps=iStep,
                 episodeDuration=(
                     duration if not didRender else self._minDuration))
+            self._episodeDone(criterion, episodeReturn)
+
+            for stats in self._algo.collectEpisodes():
+                if self._iEpisode >= self.nEpisodes or self.stopReason:
+                    break
+                self._inspectorsFactory.dispatch(
+                    hook=Hooks.trainingProgress,
+                    iEpisode=self._iEpisode,
+                    nEpisodes=self.nEpisodes,
+                    **stats)
+                self._episodeDone(criterion, stats['episodeReturn'])
+
+        self._algo.endTraining()
+
+    def _episodeDone(self, criterion, episodeReturn):
+        if criterion is not None:
+            reason = criterion.update(self._iEpisode, episodeReturn)
+            if reason is not None:
+                self.stopReason = "converged after %d episodes: %s" % (
+                    self._iEpisode + 1, reason)
+                logger.info("[Agent] Training %s", self.stopReason)
+        self._iEpisode += 1
+        self._checkpoint()
+
+    def _checkpoint(self):
+        if self.checkpointer is None:
+            return
+        every = int(self.checkpointEpisodes)
+        interval = float(self.checkpointInterval)
+        if ((every > 0 and self._iEpisode % every == 0) or
+                (interval > 0 and
+                 time.time() - self._lastCheckpointT >= interval)):
+            self._lastCheckpointT = time.time()
+            self.checkpointer.save(self.checkpointObjects(), self._iEpisode)
+
+    def checkpointObjects(self):
+        """
+        Objects whose state is saved in checkpoints and swapped out to disk,
+        by name.
+        """
+        return {'algo': self._algo, 'problem': self._problem}
+
+    def suspend(self):
+        """
+        Stop the background work of the algorithm while the agent isn't
+        running (see `BaseAlgo.suspend`).
+        """
+        if self._algo is not None:
+            self._algo.suspend()
+
+    def swapOut(self, path):
+        """
+        Swap the state of the algorithm and of the problem out to the file
+        `path`, along with the state of the random generators and the index
+        of the current episode (see `swap.Swap`). The agent can't be run
+        until it is swapped back in by `swapIn`, which is given the returned
+        swap.
+        """
+        self.suspend()
+        return swap.swapOut(path, self.checkpointObjects(),
+                            iEpisode=self._iEpisode)
+
+    def swapIn(self, swapped):
+        self._iEpisode = swapped.restore()['iEpisode']
 
     def release(self):
         """
@@ -254,3 +694,7 @@ will only reply to requests during delays."
             self._problem.release()
             if self.renderFreq != -1:
                 self._problem.render(close=True)
+        if self._algo is not None:
+            self._algo.release()
+        if self.checkpointer is not None:
+            self.checkpointer.wait()
@@ -4,7 +4,12 @@ from __future__ import unicode_literals
 
 import utils
 from sarsa import Sarsa, RoundingSarsa
+from hogwild import HogwildSarsa
 from monteCarlo import MonteCarlo, GlieMonteCarlo
+from knn import KnnTD
+from mcts import Mcts
+from cem import CrossEntropyMethod
 
 Algorithms = utils.makeMapping(
-    [GlieMonteCarlo, MonteCarlo, Sarsa, RoundingSarsa])
+    [GlieMonteCarlo, MonteCarlo, Sarsa, RoundingSarsa, HogwildSarsa, KnnTD,
+     Mcts, CrossEntropyMethod])
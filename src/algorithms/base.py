@@ -202,6 +202,11 @@ class BaseAlgo(Parametizable):
     """
     POLICY = Policies.EGreedy
 
+    # Override and set to True if `pickAction` plans from the current state
+    # of the problem the algorithm was setup on rather than from the state
+    # it is given: its episodes can't then be simulated in batches.
+    PLANS_FROM_PROBLEM = False
+
     def __init__(self, **kwargs):
         super(BaseAlgo, self).__init__(**kwargs)
 
@@ -215,6 +220,27 @@ class BaseAlgo(Parametizable):
         """
         logger.info("[%s] Algo setup" % self.__class__.__name__)
 
+    def estimateFootprint(self, shape):
+        """
+        Estimated memory footprint of the algorithm once setup on a problem of
+        the given shape (see `BaseProblem.estimateShape`), from its
+        parameters only. Returns the number of items of each kind the
+        algorithm allocates, by kind:
+        * float64: items of numpy arrays, 8 bytes each
+        * dictState: states of dict tables (the key and its dict of values)
+        * dictEntry: action values of dict tables
+        * indexEntry: entries of dicts indexing the states
+        The size of the items of each kind is calibrated (see `resources`).
+        """
+        return {}
+
+    def estimateStepCost(self, shape):
+        """
+        Cost of a step of the algorithm relative to the cost of a step with
+        the default parameters, calibrated by `resources`.
+        """
+        return 1.0
+
     def startEpisode(self, initState):
         """
         Called once at the beginning of each episode given the initial state
@@ -223,7 +249,8 @@ class BaseAlgo(Parametizable):
         """
         pass
 
-    def train(self, prevState, nextState, action, reward, episodeI, stepI):
+    def train(self, prevState, nextState, action, reward, episodeI, stepI,
+              nSteps=1):
         """
         Called once for each step of each episode.
         A working implementation of this function is required when subclassing.
@@ -234,6 +261,10 @@ class BaseAlgo(Parametizable):
         * reward: the reward associated with this action
         * episodeI: number of episodes run so far
         * stepI: number of steps run so far for the current episode
+        * nSteps: number of steps of the problem the action was repeated for
+          (see the agent's `actionRepeat`). `reward` is then the discounted
+          sum of the rewards received over these steps, and the value of
+          `nextState` should be discounted by `discount(nSteps)`.
         The function should return the next action the agent should take
         assuming the agent is currently in state `nextState`.
         Note: minial implementation for this function is to return a random
@@ -241,6 +272,14 @@ class BaseAlgo(Parametizable):
         """
         raise NotImplementedError()
 
+    def discount(self, nSteps=1):
+        """
+        Factor the value of a state reached `nSteps` steps later is
+        discounted by: `gamma` to the power of `nSteps` for algorithms with a
+        discount factor `gamma`, 1 for the others.
+        """
+        return getattr(self, 'gamma', 1.0) ** nSteps
+
     def endEpisode(self, totalReturn):
         """
         Called once at the end of each episode, given the total return received
@@ -248,6 +287,30 @@ class BaseAlgo(Parametizable):
         """
         pass
 
+    def collectEpisodes(self):
+        """
+        Algorithms may run episodes on their own, outside of the agent's
+        episode loop (e.g. in worker processes). This is called after each
+        episode of the agent and should return the statistics of the episodes
+        completed since the last call, as a list of dicts holding the fields
+        `episodeReturn`, `episodeSteps` and `episodeDuration`.
+        These episodes count towards the agent's number of episodes.
+        """
+        return []
+
+    def startTraining(self):
+        """
+        Called once the agent starts training, including when it resumes a
+        training restored from a checkpoint.
+        """
+        pass
+
+    def endTraining(self):
+        """
+        Called once the agent is done training, before it is tested.
+        """
+        pass
+
     def pickAction(self, state, episodeI, optimize=False):
         """
         Returns the best action to take in the given state according to the
@@ -263,6 +326,39 @@ class BaseAlgo(Parametizable):
         """
         return 0
 
+    def actionValues(self, states, actions):
+        """
+        Returns the values of each of the given actions in each of the given
+        states, as one row of action values per state.
+        Algorithms able to evaluate many states at once should override this,
+        the default implementation simply calls `actionValue` for each pair.
+        """
+        return [[self.actionValue(state, action) for action in actions]
+                for state in states]
+
+    def release(self):
+        """
+        Release resources (e.g. worker processes) held by the algorithm
+        before deletion.
+        """
+        pass
+
+    def suspend(self):
+        """
+        Stop the work the algorithm does in the background (e.g. in worker
+        processes) while the agent isn't running, e.g. when it is paused or
+        swapped out. The work resumes along with the next episode.
+        """
+        pass
+
+    def restored(self):
+        """
+        Called once the state of the algorithm has been restored from a
+        checkpoint or a swap (see `swap.load`), e.g. to move it back to
+        shared memory.
+        """
+        pass
+
     def dump(self):
         """
         Dump the algorithm into a data structure that can be later reloaded,
@@ -0,0 +1,260 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import multiprocessing
+import time
+
+import numpy as np
+
+import utils
+from consts import Spaces, ParamsTypes
+from algorithms.base import BaseAlgo, AlgoException
+from algorithms.policies import Policies
+
+
+class LinearPolicy(object):
+    """
+    Deterministic linear policy over a continuous state space: the action
+    picked is the one with the highest score, scores being a linear function
+    of the state rescaled to [0, 1] on each bounded dimension.
+    The policy is fully described by a flat weights vector of
+    `nActions * (nbDims + 1)` values (the extra one being a bias).
+    """
+    def __init__(self, low, high, actions):
+        super(LinearPolicy, self).__init__()
+        self.actions = actions
+        self.low = np.array(low, dtype=float)
+        span = np.array(high, dtype=float) - self.low
+        # unbounded dimensions cannot be rescaled - leave them as is
+        self.scale = np.where(
+            np.isfinite(span) & (span > 0) & (span < 1e6), span, 1.0)
+        self.nbWeights = len(actions) * (len(self.low) + 1)
+
+    def scores(self, weights, state):
+        features = np.append(
+            (np.asarray(state, dtype=float) - self.low) / self.scale, 1.0)
+        return weights.reshape(len(self.actions), -1).dot(features)
+
+    def pickAction(self, weights, state):
+        return self.actions[int(np.argmax(self.scores(weights, state)))]
+
+    def runEpisodes(self, problem, weights, nEpisodes):
+        """
+        Run `nEpisodes` episodes of the problem following this policy with
+        the given weights. Returns the sum of the returns and the total number
+        of steps.
+        """
+        totalReturn = 0
+        totalSteps = 0
+        for _ in xrange(nEpisodes):
+            state = problem.reset()
+            for iStep in xrange(problem.maxSteps):
+                state, reward, done, _ = problem.step(
+                    self.pickAction(weights, state))
+                totalReturn += reward
+                if done:
+                    break
+            totalSteps += iStep + 1
+        return totalReturn, totalSteps
+
+
+# state of the pool worker processes, see `_initWorker`.
+_worker = {}
+
+
+def _initWorker(problem, policy):
+    """
+    Pool workers are forked from the process that did setup the problem: they
+    all get their own copy of the exact same problem.
+    """
+    _worker['problem'] = problem
+    _worker['policy'] = policy
+
+
+def _evaluateCandidate(args):
+    weights, nEpisodes, seed = args
+    utils.seed(seed)
+    _worker['problem'].seed(seed)
+    return _worker['policy'].runEpisodes(
+        _worker['problem'], weights, nEpisodes)
+
+
+class CrossEntropyMethod(BaseAlgo):
+    """
+    Cross-entropy method: gradient-free search of the weights of a linear
+    policy. Each training episode of the agent is followed by one generation
+    of the search: a population of weight vectors is sampled from a gaussian
+    distribution, each candidate is evaluated over a few episodes in a pool of
+    worker processes, and the distribution is refit on the best candidates.
+    The episodes of the agent itself follow the mean of the distribution.
+    """
+    DOMAIN = {
+        'action': Spaces.Discrete,
+        'state': Spaces.Continuous
+    }
+
+    PARAMS = {
+        'populationSize': ParamsTypes.Number,
+        'eliteFraction': ParamsTypes.Number,
+        'episodesPerCandidate': ParamsTypes.Number,
+        'initialStd': ParamsTypes.Number,
+        'extraNoise': ParamsTypes.Number,
+        'nWorkers': ParamsTypes.Number
+    }
+
+    PARAMS_DOMAIN = {
+        'populationSize': {
+            'values': (20, 50, 100, 500),
+            'range': (2, 100000)
+        },
+        'eliteFraction': {
+            'values': (0.1, 0.2, 0.5),
+            'range': (0.001, 1)
+        },
+        'episodesPerCandidate': {
+            'values': (1, 3, 10),
+            'range': (1, 1000)
+        },
+        'initialStd': {
+            'values': (0.1, 1, 10),
+            'range': (0.0001, 10000)
+        },
+        'extraNoise': {
+            'values': (0, 0.01, 0.1, 1),
+            'range': (0, 1000)
+        },
+        'nWorkers': {
+            'values': ('auto', 1, 2, 4, 8),
+            'range': (1, 256)
+        }
+    }
+
+    PARAMS_DEFAULT = {
+        'populationSize': 50,
+        'eliteFraction': 0.2,
+        'episodesPerCandidate': 1,
+        'initialStd': 1,
+        'extraNoise': 0.1,
+        'nWorkers': 'auto'
+    }
+
+    PARAMS_DESCRIPTION = {
+        'populationSize': "Number of candidate weight vectors evaluated at \
+each generation.",
+        'eliteFraction': "Fraction of the best candidates the search \
+distribution is refit on.",
+        'episodesPerCandidate': "Number of episodes each candidate is \
+evaluated on. Their mean return is the candidate's score.",
+        'initialStd': "Initial standard deviation of the search distribution.",
+        'extraNoise': "Noise added to the standard deviation at each \
+generation, to prevent the search from collapsing too early.",
+        'nWorkers': "Number of worker processes evaluating the candidates. \
+'auto' uses one per core, 1 evaluates them in the server process."
+    }
+
+    POLICY = Policies.Greedy
+
+    def __init__(self, **kwargs):
+        super(CrossEntropyMethod, self).__init__(**kwargs)
+        self._problem = None
+        self._linearPolicy = None
+        self._mean = None
+        self._std = None
+        self._pool = None
+        self._iGeneration = 0
+
+    def setup(self, problem):
+        logger.info("[%s] Algo setup" % self.__class__.__name__)
+        self.release()
+        self._problem = problem
+        self._linearPolicy = LinearPolicy(
+            *problem.getStatesBounds(), actions=problem.getActionsList())
+        self._mean = np.zeros(self._linearPolicy.nbWeights)
+        self._std = np.ones(self._linearPolicy.nbWeights) * self.initialStd
+        self._iGeneration = 0
+
+        nWorkers = (multiprocessing.cpu_count() if self.nWorkers == 'auto'
+                    else int(self.nWorkers))
+        if nWorkers > 1:
+            self._pool = multiprocessing.Pool(
+                nWorkers, _initWorker, (problem, self._linearPolicy))
+
+    def estimateStepCost(self, shape):
+        # each episode of the agent is followed by a generation of the search
+        return (float(self.populationSize) * float(self.episodesPerCandidate) /
+                (self.PARAMS_DEFAULT['populationSize'] *
+                 self.PARAMS_DEFAULT['episodesPerCandidate']))
+
+    def _assertSetup(self):
+        if self._problem is None:
+            raise AlgoException("Algorithm hasn't been setup yet.")
+
+    def _evaluate(self, population):
+        nEpisodes = int(self.episodesPerCandidate)
+        tasks = [
+            (weights, nEpisodes, self._iGeneration * len(population) + i)
+            for i, weights in enumerate(population)]
+        if self._pool is not None:
+            return self._pool.map(_evaluateCandidate, tasks)
+
+        # evaluate in-process, on the agent's problem: its episode is over
+        # and the agent resets the problem before starting the next one.
+        results = []
+        for weights, nEpisodes, seed in tasks:
+            utils.seed(seed)
+            self._problem.seed(seed)
+            results.append(self._linearPolicy.runEpisodes(
+                self._problem, weights, nEpisodes))
+        return results
+
+    def endEpisode(self, totalReturn):
+        """
+        Run one generation of the search after each episode of the agent.
+        """
+        self._assertSetup()
+        startT = time.time()
+        population = self._mean + self._std * np.random.randn(
+            int(self.populationSize), len(self._mean))
+        returns, steps = zip(*self._evaluate(population))
+        scores = np.array(returns, dtype=float) / self.episodesPerCandidate
+
+        nElite = max(1, int(round(len(population) * self.eliteFraction)))
+        elite = population[np.argsort(scores)[-nElite:]]
+        self._mean = elite.mean(axis=0)
+        self._std = elite.std(axis=0) + self.extraNoise
+
+        duration = time.time() - startT
+        nEpisodes = len(population) * self.episodesPerCandidate
+        logger.info(
+            "[%s] Generation %d: mean score %.1f, best %.1f - %d episodes "
+            "(%d steps) at %.0f episodes/s", self.__class__.__name__,
+            self._iGeneration, scores.mean(), scores.max(), nEpisodes,
+            sum(steps), nEpisodes / (duration or 1e-6))
+        self._iGeneration += 1
+
+    def pickAction(self, state, episodeI=None, optimize=False):
+        self._assertSetup()
+        return self._linearPolicy.pickAction(self._mean, state)
+
+    def actionValue(self, state, action):
+        """
+        There is no value function - the policy scores are the closest thing.
+        """
+        self._assertSetup()
+        scores = self._linearPolicy.scores(self._mean, state)
+        return scores[self._linearPolicy.actions.index(action)]
+
+    def train(self, oldState, newState, action, reward, episodeI, stepI,
+              nSteps=1):
+        self._assertSetup()
+        return self.pickAction(newState, episodeI=episodeI)
+
+    def release(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,241 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import ctypes
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+import Queue
+import time
+
+import numpy as np
+
+import utils
+from consts import ParamsTypes
+from algorithms.sarsa import Sarsa
+
+
+def _runWorker(algo, problem, seed, stop, counter, episodes):
+    """
+    Entry point of the worker processes. Workers are forked from the process
+    that did setup the algorithm and the problem, and run Sarsa episodes on
+    their own copy of the problem until `stop` is set. The action value
+    table lives in shared memory: all updates are immediately visible to the
+    other processes.
+    """
+    # don't wait for the statistics of the last episodes to be consumed when
+    # exiting.
+    episodes.cancel_join_thread()
+    utils.seed(seed)
+    problem.seed(seed)
+    while not stop.is_set():
+        with counter.get_lock():
+            counter.value += 1
+            iEpisode = counter.value
+
+        startT = time.time()
+        state = problem.reset()
+        action = algo.pickAction(state, iEpisode)
+        episodeReturn = 0
+        iStep = 0
+        for iStep in xrange(problem.maxSteps):
+            newState, reward, _, _ = problem.step(action)
+            episodeReturn += reward
+            action = algo.train(
+                oldState=state,
+                newState=newState,
+                action=action,
+                reward=reward,
+                episodeI=iEpisode,
+                stepI=iStep)
+            state = newState
+            if problem.episodeDone(stepI=iStep):
+                break
+
+        episodes.put({
+            'episodeReturn': episodeReturn,
+            'episodeSteps': iStep,
+            'episodeDuration': time.time() - startT
+        })
+
+
+class HogwildSarsa(Sarsa):
+    """
+    Multi-process Sarsa. In addition to the agent's own episodes, worker
+    processes each run episodes on their own copy of the problem, all of them
+    updating the same action value table stored in shared memory, without any
+    locking (Hogwild! style). Conflicting updates are rare and harmless enough
+    for the speed-up to be worth it on large problems.
+    The episodes run by the workers count towards the number of episodes of
+    the agent, and are reported to inspectors like any other episode.
+    """
+    PARAMS = utils.extends({}, nWorkers=ParamsTypes.Number, **Sarsa.PARAMS)
+
+    PARAMS_DOMAIN = utils.extends({}, nWorkers={
+        'values': ('auto', 0, 1, 3, 7),
+        'range': (0, 256)
+    }, **Sarsa.PARAMS_DOMAIN)
+
+    PARAMS_DEFAULT = utils.extends(
+        {}, nWorkers='auto', **Sarsa.PARAMS_DEFAULT)
+
+    PARAMS_DESCRIPTION = utils.extends({}, nWorkers="""
+Number of worker processes training alongside the agent. 'auto' starts one
+per additional core, 0 makes this algorithm behave like Sarsa.""",
+                                       **Sarsa.PARAMS_DESCRIPTION)
+
+    def __init__(self, **kwargs):
+        super(HogwildSarsa, self).__init__(**kwargs)
+        self._problem = None
+        self._stateIndex = {}
+        self._actionIndex = {}
+        self._allActions = []
+        self._table = None
+
+        self._workers = []
+        self._stop = None
+        self._counter = None
+        self._episodes = None
+        self._trainingDone = False
+
+    def _setup(self, allStates, allActions):
+        """
+        The action value table is a (nStates x nActions) array of doubles in
+        shared memory rather than a dict, so it can be shared by forked
+        processes.
+        """
+        self._stateIndex = {state: i for i, state in enumerate(allStates)}
+        self._allActions = list(allActions)
+        self._actionIndex = {
+            action: i for i, action in enumerate(self._allActions)}
+        self._table = self._sharedTable(
+            np.zeros((len(self._stateIndex), len(self._allActions))))
+        self._isSetup = True
+
+    @staticmethod
+    def _sharedTable(values):
+        """
+        Returns a copy of the array `values` in shared memory.
+        """
+        shared = RawArray(ctypes.c_double, values.size)
+        table = np.frombuffer(shared).reshape(values.shape)
+        table[:] = values
+        return table
+
+    def restored(self):
+        """
+        Checkpoints and swaps restore the table as a private array: the
+        workers forked afterwards wouldn't share it.
+        """
+        if self._table is not None:
+            self._table = self._sharedTable(self._table)
+
+    def estimateFootprint(self, shape):
+        nStates = self._estimateStates(shape)
+        return {
+            'float64': nStates * shape['nActions'],
+            'indexEntry': nStates
+        }
+
+    def setup(self, problem):
+        self.release()
+        self._problem = problem
+        self._trainingDone = False
+        super(HogwildSarsa, self).setup(problem)
+
+    def _startWorkers(self):
+        nWorkers = (multiprocessing.cpu_count() - 1 if self.nWorkers == 'auto'
+                    else int(self.nWorkers))
+        if nWorkers <= 0:
+            return
+        logger.info("[%s] Starting %d workers",
+                    self.__class__.__name__, nWorkers)
+        self._stop = multiprocessing.Event()
+        # workers started again after being suspended go on counting
+        self._counter = multiprocessing.Value(
+            ctypes.c_long,
+            self._counter.value if self._counter is not None else 0)
+        self._episodes = multiprocessing.Queue()
+        seed = np.random.randint(2 ** 31)
+        for i in xrange(nWorkers):
+            worker = multiprocessing.Process(
+                target=_runWorker,
+                args=(self, self._problem, seed + i, self._stop,
+                      self._counter, self._episodes))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+
+    def startEpisode(self, initState):
+        # workers are started along with the first episode of the training
+        if not self._workers and not self._trainingDone:
+            self._startWorkers()
+
+    def collectEpisodes(self):
+        episodes = []
+        if self._episodes is None:
+            return episodes
+        try:
+            while True:
+                episodes.append(self._episodes.get_nowait())
+        except Queue.Empty:
+            pass
+        return episodes
+
+    def startTraining(self):
+        # a checkpoint saved once the training was over may be resumed
+        self._trainingDone = False
+
+    def endTraining(self):
+        self._trainingDone = True
+        self.release()
+
+    def suspend(self):
+        # started again along with the next episode
+        self.release()
+
+    def release(self):
+        if not self._workers:
+            return
+        self._stop.set()
+        for worker in self._workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._episodes = None
+
+    def pickAction(self, state, episodeI=None, optimize=False):
+        self._assertSetup()
+        return self._policy.pickAction(
+            dict(zip(self._allActions, self._table[self._stateIndex[state]])),
+            episodeI=episodeI, optimize=optimize)
+
+    def actionValue(self, state, action):
+        self._assertSetup()
+        state = tuple([s for s in state])
+        try:
+            return self._table[
+                self._stateIndex[state], self._actionIndex[action]]
+        except KeyError:
+            logger.error(
+                "Unable to read value function for state: %s, action: %s",
+                str(state), str(action))
+            return 0
+
+    def train(self, oldState, newState, action, reward, episodeI, stepI,
+              nSteps=1):
+        """
+        Same TD(0) update as Sarsa, on the shared table.
+        """
+        self._assertSetup()
+        newAction = self.pickAction(newState, episodeI=episodeI)
+        q = self._table
+        old = self._stateIndex[oldState], self._actionIndex[action]
+        new = self._stateIndex[newState], self._actionIndex[newAction]
+        g = self.gamma if nSteps == 1 else self.discount(nSteps)
+        q[old] += self.alpha * (reward + g * q[new] - q[old])
+        return newAction
@@ -0,0 +1,457 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+from consts import Spaces, ParamsTypes
+from algorithms.base import BaseAlgo, AlgoException
+from algorithms.policies import Policies
+from algorithms.hints import (
+    ALPHA_PARAMETER_HELP, EPSILON_PARAMETER_HELP, GAMMA_PARAMETER_HELP)
+
+
+# Maximum number of pairwise distances computed at once by a batched query.
+# This bounds the memory used by the temporary distance matrix.
+BATCH_CHUNK_ELEMENTS = 2 ** 20
+# Number of prototypes from which batched queries walk the k-d tree point by
+# point rather than scanning every prototype. Below it, the vectorized scan
+# is faster than the tree walks (the two cross at about 3000 prototypes in 2
+# dimensions).
+BATCH_TREE_SIZE = 4096
+
+
+def _nearest(d2, k):
+    """
+    Given a matrix of squared distances (one row per query point), returns the
+    column indices of the `k` smallest values of each row, sorted by
+    increasing distance.
+    """
+    if d2.shape[1] > k:
+        part = np.argpartition(d2, k - 1, axis=1)[:, :k]
+    else:
+        part = np.tile(np.arange(d2.shape[1]), (d2.shape[0], 1))
+    rows = np.arange(d2.shape[0])[:, None]
+    order = np.argsort(d2[rows, part], axis=1)
+    return part[rows, order]
+
+
+def bruteForceQuery(points, queries, k):
+    """
+    Exact k-nearest neighbours search of each of the `queries` among the given
+    `points` (both being 2D arrays with one point per row).
+    Distances are computed in chunks so that the temporary distance matrix
+    never grows larger than `BATCH_CHUNK_ELEMENTS`.
+    Returns a `(distances, indices)` pair of arrays of shape
+    `(len(queries), min(k, len(points)))`.
+    """
+    k = min(k, len(points))
+    distances = np.empty((len(queries), k))
+    indices = np.empty((len(queries), k), dtype=int)
+    if k == 0:
+        return distances, indices
+
+    pp = (points ** 2).sum(axis=1)
+    chunk = max(1, BATCH_CHUNK_ELEMENTS // len(points))
+    for start in xrange(0, len(queries), chunk):
+        q = queries[start:start + chunk]
+        # |q - p|^2 = |q|^2 - 2 q.p + |p|^2
+        d2 = (q ** 2).sum(axis=1)[:, None] - 2 * q.dot(points.T) + pp[None, :]
+        np.maximum(d2, 0, out=d2)
+        best = _nearest(d2, k)
+        rows = np.arange(len(q))[:, None]
+        distances[start:start + chunk] = np.sqrt(d2[rows, best])
+        indices[start:start + chunk] = best
+    return distances, indices
+
+
+class KDTree(object):
+    """
+    Static k-d tree built over a set of points.
+
+    The tree is entirely array-backed: nodes are stored in flat arrays
+    (split dimension, split value, children and point range) and the points
+    are never copied, only their indices are permuted so that the points of
+    each leaf are contiguous in `self._index`.
+    Leaves hold up to `leafSize` points which are scanned with vectorized
+    operations, so the python-level traversal only visits O(log n) nodes for
+    well distributed points.
+    """
+    def __init__(self, points, leafSize=16):
+        super(KDTree, self).__init__()
+        self.points = points
+        self.leafSize = leafSize
+        self._index = np.arange(len(points))
+
+        splitDims, splitVals, lefts, rights, starts, ends = (
+            [], [], [], [], [], [])
+
+        def newNode(start, end):
+            splitDims.append(-1)
+            splitVals.append(0.0)
+            lefts.append(-1)
+            rights.append(-1)
+            starts.append(start)
+            ends.append(end)
+            return len(splitDims) - 1
+
+        stack = [newNode(0, len(points))]
+        while stack:
+            node = stack.pop()
+            start, end = starts[node], ends[node]
+            if end - start <= leafSize:
+                continue
+            idx = self._index[start:end]
+            subset = points[idx]
+            # split along the dimension of largest spread, at the median
+            dim = int(np.argmax(subset.max(axis=0) - subset.min(axis=0)))
+            mid = (end - start) // 2
+            order = np.argpartition(subset[:, dim], mid)
+            self._index[start:end] = idx[order]
+            splitDims[node] = dim
+            splitVals[node] = points[self._index[start + mid], dim]
+            lefts[node] = newNode(start, start + mid)
+            rights[node] = newNode(start + mid, end)
+            stack.append(lefts[node])
+            stack.append(rights[node])
+
+        self._splitDim = np.array(splitDims, dtype=int)
+        self._splitVal = np.array(splitVals, dtype=float)
+        self._left = np.array(lefts, dtype=int)
+        self._right = np.array(rights, dtype=int)
+        self._start = np.array(starts, dtype=int)
+        self._end = np.array(ends, dtype=int)
+
+    def __len__(self):
+        return len(self.points)
+
+    def query(self, point, k):
+        """
+        Exact k-nearest neighbours search of the given point.
+        Returns a `(distances, indices)` pair of arrays sorted by increasing
+        distance.
+        """
+        bestD2 = np.empty(0)
+        bestIdx = np.empty(0, dtype=int)
+        # (lower bound of the squared distance to the node, node)
+        stack = [(0.0, 0)]
+        while stack:
+            bound, node = stack.pop()
+            if len(bestD2) == k and bound >= bestD2[-1]:
+                continue
+            dim = self._splitDim[node]
+            if dim < 0:
+                idx = self._index[self._start[node]:self._end[node]]
+                d2 = ((self.points[idx] - point) ** 2).sum(axis=1)
+                d2 = np.concatenate((bestD2, d2))
+                idx = np.concatenate((bestIdx, idx))
+                order = np.argsort(d2)[:k]
+                bestD2, bestIdx = d2[order], idx[order]
+                continue
+            diff = point[dim] - self._splitVal[node]
+            near, far = self._left[node], self._right[node]
+            if diff >= 0:
+                near, far = far, near
+            # visit the nearest child first: it is pushed last.
+            stack.append((max(bound, diff * diff), far))
+            stack.append((bound, near))
+        return np.sqrt(bestD2), bestIdx
+
+
+class PrototypeIndex(object):
+    """
+    Growable set of prototypes indexed for nearest neighbours search.
+
+    Prototypes are stored in a preallocated array of `capacity` rows. The
+    first `self._treeSize` prototypes are indexed by a `KDTree`, the ones
+    added since the last rebuild are scanned linearly. The tree is rebuilt
+    every time `rebuildFreq` new prototypes have been added, which keeps both
+    the linear scan and the rebuild cost bounded.
+    """
+    def __init__(self, nbDims, capacity, rebuildFreq=100):
+        super(PrototypeIndex, self).__init__()
+        self.capacity = capacity
+        self.rebuildFreq = rebuildFreq
+        self.points = np.zeros((capacity, nbDims))
+        self._count = 0
+        self._tree = None
+        self._treeSize = 0
+
+    def __len__(self):
+        return self._count
+
+    def isFull(self):
+        return self._count >= self.capacity
+
+    def add(self, point):
+        """
+        Store a new prototype and return its index.
+        """
+        if self.isFull():
+            raise AlgoException("Prototypes capacity exceeded.")
+        self.points[self._count] = point
+        self._count += 1
+        if self._count - self._treeSize >= self.rebuildFreq:
+            self.rebuild()
+        return self._count - 1
+
+    def rebuild(self):
+        self._tree = KDTree(self.points[:self._count])
+        self._treeSize = self._count
+
+    def query(self, point, k):
+        """
+        Returns the distances and indices of the `k` prototypes nearest to
+        the given point, sorted by increasing distance.
+        """
+        if self._tree is not None:
+            distances, indices = self._tree.query(point, k)
+        else:
+            distances, indices = np.empty(0), np.empty(0, dtype=int)
+
+        if self._count > self._treeSize:
+            pending = self.points[self._treeSize:self._count]
+            d = np.sqrt(((pending - point) ** 2).sum(axis=1))
+            distances = np.concatenate((distances, d))
+            indices = np.concatenate((
+                indices, np.arange(self._treeSize, self._count)))
+            order = np.argsort(distances)[:k]
+            distances, indices = distances[order], indices[order]
+        return distances, indices
+
+    def queryBatch(self, points, k):
+        """
+        Same as `query`, for many points at once. Returns two arrays with one
+        row per given point. Only small sets of prototypes (see
+        `BATCH_TREE_SIZE`) are scanned linearly.
+        """
+        if self._count < BATCH_TREE_SIZE:
+            return bruteForceQuery(self.points[:self._count], points, k)
+        k = min(k, self._count)
+        distances = np.empty((len(points), k))
+        indices = np.empty((len(points), k), dtype=int)
+        for i, point in enumerate(points):
+            distances[i], indices[i] = self.query(point, k)
+        return distances, indices
+
+
+class KnnTD(BaseAlgo):
+    """
+    k-nearest neighbours TD learning (kNN-TD) on continuous state spaces.
+    Visited states are stored as prototypes, each holding its own action
+    values. The action value of any state is the weighted average of the
+    action values of its k nearest prototypes, and TD(0) updates are spread
+    over these neighbours according to the same weights. No discretization
+    grid is needed: the prototypes only cover the visited part of the space.
+    """
+    DOMAIN = {
+        'action': Spaces.Discrete,
+        'state': Spaces.Continuous
+    }
+
+    PARAMS = {
+        'epsilon': ParamsTypes.Number,
+        'alpha': ParamsTypes.Number,
+        'gamma': ParamsTypes.Number,
+        'k': ParamsTypes.Number,
+        'maxPrototypes': ParamsTypes.Number,
+        'radius': ParamsTypes.Number,
+        'rebuildFreq': ParamsTypes.Number
+    }
+
+    PARAMS_DOMAIN = {
+        'epsilon': {
+            'values': ('1/k', '1/log(k)', '1/log(log(k))'),
+            'range': (0, 1)
+        },
+        'alpha': {
+            'values': (1.0, 0.1, 0.01, 0.001, 0.0001),
+            'range': (0.00001, 1.0)
+        },
+        'gamma': {
+            'values': (0, 0.1, 0.5, 0.9, 1.0),
+            'range': (0, 1)
+        },
+        'k': {
+            'values': (1, 4, 8, 16),
+            'range': (1, 64)
+        },
+        'maxPrototypes': {
+            'values': (1000, 5000, 20000),
+            'range': (10, 1000000)
+        },
+        'radius': {
+            'values': (0.01, 0.02, 0.05, 0.1),
+            'range': (0.0001, 1)
+        },
+        'rebuildFreq': {
+            'values': (50, 100, 500),
+            'range': (1, 100000)
+        }
+    }
+
+    PARAMS_DEFAULT = {
+        'epsilon': '1/k',
+        'alpha': 0.1,
+        'gamma': 1.0,
+        'k': 8,
+        'maxPrototypes': 5000,
+        'radius': 0.02,
+        'rebuildFreq': 100
+    }
+
+    PARAMS_DESCRIPTION = {
+        'epsilon': EPSILON_PARAMETER_HELP,
+        'gamma': GAMMA_PARAMETER_HELP,
+        'alpha': ALPHA_PARAMETER_HELP,
+        'k': "Number of neighbouring prototypes used to estimate the value of \
+a state.",
+        'maxPrototypes': "Maximum number of prototypes stored. Once reached, \
+visited states are not added anymore and learning only refines the values of \
+existing prototypes.",
+        'radius': "A visited state becomes a new prototype when its nearest \
+prototype is further than this distance. Distances are measured after scaling \
+each dimension of the state space to [0, 1]. This also scales the weight \
+given to each neighbour.",
+        'rebuildFreq': "Number of prototypes added between two rebuilds of \
+the spatial index. Prototypes added since the last rebuild are scanned \
+linearly."
+    }
+
+    POLICY = Policies.EGreedy
+
+    def __init__(self, **kwargs):
+        super(KnnTD, self).__init__(**kwargs)
+        self._allActions = []
+        self._index = None
+        self._Q = None
+        self._low = None
+        self._scale = None
+        # (state, neighbour indices, neighbour weights) of the last query
+        self._cached = None
+
+    def setup(self, problem):
+        logger.info("[%s] Algo setup" % self.__class__.__name__)
+        self._allActions = problem.getActionsList()
+        low, high = problem.getStatesBounds()
+        self._low = np.array(low, dtype=float)
+        span = np.array(high, dtype=float) - self._low
+        # unbounded dimensions (e.g. velocities bounded by float max) cannot
+        # be rescaled to [0, 1] - leave them as is.
+        self._scale = np.where(
+            np.isfinite(span) & (span > 0) & (span < 1e6), span, 1.0)
+        self._index = PrototypeIndex(
+            len(self._low), int(self.maxPrototypes), int(self.rebuildFreq))
+        self._Q = np.zeros((int(self.maxPrototypes), len(self._allActions)))
+        self._cached = None
+
+    def estimateFootprint(self, shape):
+        # action values and coordinates of the prototypes
+        return {'float64': int(self.maxPrototypes) * (
+            shape['nActions'] + shape['statesDim'])}
+
+    def estimateStepCost(self, shape):
+        return float(self.k) / self.PARAMS_DEFAULT['k']
+
+    def _assertSetup(self):
+        if self._index is None:
+            raise AlgoException("Algorithm hasn't been setup yet.")
+
+    def _normalize(self, states):
+        return (np.asarray(states, dtype=float) - self._low) / self._scale
+
+    def _weights(self, distances):
+        w = 1.0 / (1.0 + (distances / self.radius) ** 2)
+        return w / w.sum(axis=-1, keepdims=True)
+
+    def _neighbours(self, state):
+        """
+        Returns the indices of the prototypes nearest to the given state and
+        their normalized weights.
+        """
+        key = tuple(state)
+        if self._cached is not None and self._cached[0] == key:
+            return self._cached[1], self._cached[2]
+        distances, indices = self._index.query(
+            self._normalize(state), int(self.k))
+        weights = self._weights(distances)
+        self._cached = (key, indices, weights)
+        return indices, weights
+
+    def _values(self, state):
+        indices, weights = self._neighbours(state)
+        if len(indices) == 0:
+            return np.zeros(len(self._allActions))
+        return weights.dot(self._Q[indices])
+
+    def _visit(self, state):
+        """
+        Add the given state as a new prototype if no prototype is close
+        enough, unless the prototypes capacity is exhausted.
+        """
+        if self._index.isFull():
+            return
+        point = self._normalize(state)
+        distances, _ = self._index.query(point, 1)
+        if len(distances) and distances[0] <= self.radius:
+            return
+        # the new prototype starts with the current estimate so that adding
+        # it does not change the value function
+        values = self._values(state)
+        self._Q[self._index.add(point)] = values
+        self._cached = None
+
+    def startEpisode(self, initState):
+        self._assertSetup()
+        self._visit(initState)
+
+    def pickAction(self, state, episodeI=None, optimize=False):
+        self._assertSetup()
+        values = self._values(state)
+        return self._policy.pickAction(
+            dict(zip(self._allActions, values)),
+            episodeI=episodeI, optimize=optimize)
+
+    def actionValue(self, state, action):
+        self._assertSetup()
+        if len(self._index) == 0:
+            return 0
+        distances, indices = self._index.query(
+            self._normalize(state), int(self.k))
+        return self._weights(distances).dot(
+            self._Q[indices, self._allActions.index(action)])
+
+    def actionValues(self, states, actions):
+        self._assertSetup()
+        if len(self._index) == 0:
+            return np.zeros((len(states), len(actions)))
+        distances, indices = self._index.queryBatch(
+            self._normalize(states), int(self.k))
+        weights = self._weights(distances)
+        columns = [self._allActions.index(a) for a in actions]
+        # weighted sum over the neighbours of each state
+        return (weights[:, :, None] * self._Q[indices][:, :, columns]).sum(
+            axis=1)
+
+    def train(self, oldState, newState, action, reward, episodeI, stepI,
+              nSteps=1):
+        """
+        TD(0) update spread over the neighbours of `oldState`, in proportion
+        of their weights.
+        """
+        self._assertSetup()
+        indices, weights = self._neighbours(oldState)
+        iAction = self._allActions.index(action)
+        oldValue = weights.dot(self._Q[indices, iAction])
+
+        self._visit(newState)
+        newAction = self.pickAction(newState, episodeI=episodeI)
+        newValue = self._values(newState)[
+            self._allActions.index(newAction)]
+
+        delta = reward + self.discount(nSteps) * newValue - oldValue
+        self._Q[indices, iAction] += self.alpha * delta * weights
+        return newAction
@@ -0,0 +1,226 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import math
+
+import numpy as np
+
+from consts import Spaces, ParamsTypes
+from algorithms.base import BaseAlgo, AlgoException
+from algorithms.policies import Policies
+from algorithms.hints import GAMMA_PARAMETER_HELP
+
+
+class Mcts(BaseAlgo):
+    """
+    UCT Monte Carlo Tree Search.
+    This is a planning algorithm rather than a learning one: before each
+    decision, it runs a number of simulations from the current state of the
+    problem, using the problem snapshots (`getState` / `setState`) to rewind
+    the environment after each of them. Simulations descend the search tree
+    following the UCB1 rule, expand one node and finish with a random
+    rollout. The action whose subtree was visited the most is picked.
+    Nothing is learnt from one decision to the next.
+    """
+    DOMAIN = {
+        'action': Spaces.Discrete,
+        'state': Spaces.Continuous
+    }
+
+    PARAMS = {
+        'nSimulations': ParamsTypes.Number,
+        'maxDepth': ParamsTypes.Number,
+        'exploration': ParamsTypes.Number,
+        'gamma': ParamsTypes.Number
+    }
+
+    PARAMS_DOMAIN = {
+        'nSimulations': {
+            'values': (100, 1000, 5000),
+            'range': (1, 100000)
+        },
+        'maxDepth': {
+            'values': (20, 50, 100, 200),
+            'range': (1, 10000)
+        },
+        'exploration': {
+            'values': (0.5, 1.41, 2, 10),
+            'range': (0, 1000)
+        },
+        'gamma': {
+            'values': (0.9, 0.99, 1.0),
+            'range': (0, 1)
+        }
+    }
+
+    PARAMS_DEFAULT = {
+        'nSimulations': 1000,
+        'maxDepth': 50,
+        'exploration': 1.41,
+        'gamma': 0.99
+    }
+
+    PARAMS_DESCRIPTION = {
+        'nSimulations': "Number of simulations run before each decision.",
+        'maxDepth': "Maximum number of steps of each simulation, including \
+the random rollout that follows the tree descent.",
+        'exploration': "Exploration constant of the UCB1 rule. The higher, \
+the more the search favors rarely visited actions over the best ones. Should \
+be of the order of magnitude of the returns.",
+        'gamma': GAMMA_PARAMETER_HELP
+    }
+
+    POLICY = Policies.Greedy
+
+    PLANS_FROM_PROBLEM = True
+
+    def __init__(self, **kwargs):
+        super(Mcts, self).__init__(**kwargs)
+        self._problem = None
+        self._allActions = []
+
+        # search tree, preallocated. The children of an expanded node are
+        # allocated as one contiguous block of `len(self._allActions)` nodes
+        # starting at `_firstChild[node]`, in the order of `_allActions`.
+        self._visits = None
+        self._valueSums = None
+        self._rewards = None
+        self._terminal = None
+        self._firstChild = None
+        self._nNodes = 0
+
+    def setup(self, problem):
+        logger.info("[%s] Algo setup" % self.__class__.__name__)
+        self._problem = problem
+        self._allActions = problem.getActionsList()
+        # every simulation expands at most one node
+        capacity = 1 + len(self._allActions) * (int(self.nSimulations) + 1)
+        self._visits = np.zeros(capacity, dtype=int)
+        self._valueSums = np.zeros(capacity)
+        self._rewards = np.zeros(capacity)
+        self._terminal = np.zeros(capacity, dtype=bool)
+        self._firstChild = np.full(capacity, -1, dtype=int)
+        self._nNodes = 0
+
+    def estimateFootprint(self, shape):
+        capacity = shape['nActions'] * (int(self.nSimulations) + 1)
+        # visits, value sums, rewards and first children, plus one byte for
+        # the terminal flags
+        return {'float64': capacity * 4.125}
+
+    def estimateStepCost(self, shape):
+        return (float(self.nSimulations) * float(self.maxDepth) / (
+            self.PARAMS_DEFAULT['nSimulations'] *
+            self.PARAMS_DEFAULT['maxDepth']))
+
+    def _assertSetup(self):
+        if self._problem is None:
+            raise AlgoException("Algorithm hasn't been setup yet.")
+
+    def _resetTree(self):
+        n = self._nNodes
+        self._visits[:n] = 0
+        self._valueSums[:n] = 0
+        self._rewards[:n] = 0
+        self._terminal[:n] = False
+        self._firstChild[:n] = -1
+        self._nNodes = 1
+
+    def _expand(self, node):
+        self._firstChild[node] = self._nNodes
+        self._nNodes += len(self._allActions)
+
+    def _selectChild(self, node):
+        """
+        Returns the index (in `self._allActions`) of the action to take from
+        the given expanded node following the UCB1 rule. Unvisited children
+        are always tried first.
+        """
+        first = self._firstChild[node]
+        visits = self._visits[first:first + len(self._allActions)]
+        unvisited = np.flatnonzero(visits == 0)
+        if len(unvisited):
+            return unvisited[np.random.randint(len(unvisited))]
+        values = self._valueSums[first:first + len(visits)] / visits
+        ucb = values + self.exploration * np.sqrt(
+            math.log(self._visits[node]) / visits)
+        return int(np.argmax(ucb))
+
+    def _simulate(self, rootState):
+        """
+        Run one simulation from the snapshot `rootState` and back-propagate
+        its return along the visited path.
+        """
+        problem = self._problem
+        problem.setState(rootState)
+        nActions = len(self._allActions)
+        maxDepth = int(self.maxDepth)
+
+        # tree descent
+        node = 0
+        path = [0]
+        depth = 0
+        done = False
+        while self._firstChild[node] >= 0 and depth < maxDepth:
+            iAction = self._selectChild(node)
+            child = self._firstChild[node] + iAction
+            _, reward, done, _ = problem.step(self._allActions[iAction])
+            # problems are assumed deterministic: the last outcome wins
+            self._rewards[child] = reward
+            self._terminal[child] = done
+            node = child
+            path.append(node)
+            depth += 1
+            if done or self._visits[node] == 0:
+                break
+
+        if (not done and depth < maxDepth and self._firstChild[node] < 0 and
+                self._nNodes + nActions <= len(self._visits)):
+            self._expand(node)
+
+        # random rollout
+        rolloutReturn = 0
+        discount = 1.0
+        if not done and depth < maxDepth:
+            for iAction in np.random.randint(nActions, size=maxDepth - depth):
+                _, reward, done, _ = problem.step(self._allActions[iAction])
+                rolloutReturn += discount * reward
+                discount *= self.gamma
+                if done:
+                    break
+
+        # back-propagation: the value of a node is the return obtained when
+        # taking the action leading to it from its parent.
+        ret = rolloutReturn
+        for node in reversed(path):
+            ret = self._rewards[node] + self.gamma * ret
+            self._visits[node] += 1
+            self._valueSums[node] += ret
+
+    def pickAction(self, state, episodeI=None, optimize=False):
+        """
+        Plan from the current state of the problem. The given `state` is
+        expected to be that current state.
+        """
+        self._assertSetup()
+        rootState = self._problem.getState()
+        self._resetTree()
+        self._expand(0)
+        for _ in xrange(int(self.nSimulations)):
+            self._simulate(rootState)
+        self._problem.setState(rootState)
+
+        first = self._firstChild[0]
+        visits = self._visits[first:first + len(self._allActions)]
+        return self._policy.pickAction(
+            dict(zip(self._allActions, visits)),
+            episodeI=episodeI, optimize=optimize)
+
+    def train(self, oldState, newState, action, reward, episodeI, stepI,
+              nSteps=1):
+        self._assertSetup()
+        return self.pickAction(newState, episodeI=episodeI)
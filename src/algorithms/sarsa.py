@@ -93,6 +93,16 @@ class Sarsa(BaseAlgo):
         logger.info("[%s] Algo setup" % self.__class__.__name__)
         self._setup(problem.getStatesList(), problem.getActionsList())
 
+    def _estimateStates(self, shape):
+        return shape['nStates'] or 0
+
+    def estimateFootprint(self, shape):
+        nStates = self._estimateStates(shape)
+        return {
+            'dictState': nStates,
+            'dictEntry': nStates * shape['nActions']
+        }
+
     def _assertSetup(self):
         if not self._isSetup:
             raise AlgoException("Algorithm hasn't been setup yet.")
@@ -132,7 +142,8 @@ class Sarsa(BaseAlgo):
                 return 0
             return v
 
-    def train(self, oldState, newState, action, reward, episodeI, stepI):
+    def train(self, oldState, newState, action, reward, episodeI, stepI,
+              nSteps=1):
         """
         TD(0) policy improvement
         Returns the next action to take
@@ -150,7 +161,7 @@ class Sarsa(BaseAlgo):
         # Increase a little bit ( = learning rate) the value of Q for the old
         #  state / action pair  ...
         a = self.alpha
-        g = self.gamma
+        g = self.gamma if nSteps == 1 else self.discount(nSteps)
         self._Q[oldState][action] = self._Q[oldState][action] + a *\
             (reward -  # ... in the direction of the error between the
              # reward we got and what we thought the reward would be
@@ -202,6 +213,9 @@ problem's observation space hold a high number dimensions.""",
 
         self._discretizer = None
 
+    def _estimateStates(self, shape):
+        return int(self.precision) ** shape['statesDim']
+
     def setup(self, problem):
         logger.info("[%s] Algo setup" % self.__class__.__name__)
         # expect a continuous state space
@@ -236,14 +250,15 @@ problem's observation space hold a high number dimensions.""",
             logger.exception(e)
             return 0
 
-    def train(self, oldState, newState, action, reward, episodeI, stepI):
+    def train(self, oldState, newState, action, reward, episodeI, stepI,
+              nSteps=1):
         # simply calls SARSA's `step` function with rounded state values.
         self._assertSetup()
         try:
             return super(RoundingSarsa, self).train(
                 self._discretizer.round(oldState),
                 self._discretizer.round(newState),
-                action, reward, episodeI, stepI)
+                action, reward, episodeI, stepI, nSteps)
         except KeyError:
             if all(o < self._oshigh[dim] and o > self._oslow[dim]
                    for dim, o in enumerate(newState)):
@@ -0,0 +1,174 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import cPickle as pickle
+import glob
+import os
+import re
+import time
+import uuid
+
+from tornado.options import define, options
+
+import swap
+
+define('checkpointDir', default='checkpoints', type=str,
+       help="Directory the checkpoints of the training runs are saved to.")
+
+EXTENSION = '.ckpt'
+
+# run ids are the hex of a uuid4 (see `newRunId`)
+RUN_ID = re.compile(r'^[0-9a-f]{32}\Z')
+
+
+class CheckpointException(Exception):
+    pass
+
+
+def newRunId():
+    return uuid.uuid4().hex
+
+
+def checkpointPath(runId):
+    """
+    Returns the path of the checkpoint of the run `runId`. Anything else than
+    a run id is refused: it would be joined into a path to unpickle.
+    """
+    if not isinstance(runId, basestring) or not RUN_ID.match(runId):
+        raise CheckpointException("Invalid run id: %r." % runId)
+    return os.path.join(options.checkpointDir, runId + EXTENSION)
+
+
+def find(runId, allowLatest=False):
+    """
+    Returns the path of the checkpoint of the run `runId`, or of the latest
+    checkpoint saved if `runId` is 'latest' and `allowLatest` is set. The
+    latter is only meant for the command line: clients of the server can
+    only resume the runs they know the id of.
+    """
+    if allowLatest and runId == 'latest':
+        paths = glob.glob(os.path.join(options.checkpointDir, '*' + EXTENSION))
+        if not paths:
+            raise CheckpointException("No checkpoint to resume from.")
+        return max(paths, key=os.path.getmtime)
+    path = checkpointPath(runId)
+    if not os.path.exists(path):
+        raise CheckpointException("No checkpoint for the run %s." % runId)
+    return path
+
+
+def readHeader(path):
+    """
+    Returns the header of the checkpoint saved at `path`: the id of the run
+    (`runId`), its `config` and the number of episodes done (`iEpisode`).
+    """
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def restore(path, objects):
+    """
+    Restore the state saved in the checkpoint at `path` into `objects`
+    (see `swap.load`). The objects should be setup the same way the ones
+    that were saved were. Returns the header of the checkpoint.
+    """
+    with open(path, 'rb') as f:
+        header = pickle.load(f)
+        swap.load(f, objects)
+    logger.info("[Checkpoint] Run %s restored at episode %d",
+                header['runId'], header['iEpisode'])
+    return header
+
+
+class Checkpointer(object):
+    """
+    Saves checkpoints of a training run in the background: the process
+    forks, and the child writes the checkpoint from its copy of the memory
+    while the parent goes on training. A checkpoint holds the header of the
+    run (its configuration, so it can be setup again, and the number of
+    episodes done) followed by the state of the algorithm and of the problem
+    and the state of the random generators (see `swap.dump`).
+    Checkpoints are written to a temporary file first, then renamed, so a
+    crash while writing leaves the previous checkpoint intact. Only one
+    checkpoint is written at a time: checkpoints due while the previous one
+    is still being written are skipped.
+    """
+    def __init__(self, runId, config):
+        """
+        `config` is a function returning the configuration of the run, as
+        the fields of the train command setting it up (see
+        `TrainingSession._trainCommand`).
+        """
+        super(Checkpointer, self).__init__()
+        self.runId = runId
+        self.path = checkpointPath(runId)
+        self._config = config
+        # pid of the process writing the checkpoint, if any
+        self._writer = None
+
+    def writing(self):
+        if self._writer is None:
+            return False
+        pid, status = os.waitpid(self._writer, os.WNOHANG)
+        if pid == 0:
+            return True
+        if status != 0:
+            logger.error("[Checkpoint] Failed to write the checkpoint of %s",
+                         self.runId)
+        self._writer = None
+        return False
+
+    def save(self, objects, iEpisode):
+        """
+        Save a checkpoint of `objects` (a dict of objects by name) after
+        `iEpisode` episodes. Returns False if it was skipped.
+        """
+        if self.writing():
+            logger.info("[Checkpoint] Previous checkpoint of %s still being "
+                        "written, skipped the one of episode %d",
+                        self.runId, iEpisode)
+            return False
+        header = {
+            'runId': self.runId,
+            'config': self._config(),
+            'iEpisode': iEpisode,
+            'time': time.time()
+        }
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        pid = os.fork()
+        if pid != 0:
+            self._writer = pid
+            return True
+        # child: write the checkpoint and exit, without running anything
+        # the parent registered to run at exit
+        status = 1
+        tmpPath = '%s.%d.tmp' % (self.path, os.getpid())
+        try:
+            startT = time.time()
+            with open(tmpPath, 'wb') as f:
+                pickle.dump(header, f, pickle.HIGHEST_PROTOCOL)
+                swap.dump(f, objects)
+            os.rename(tmpPath, self.path)
+            logger.info("[Checkpoint] Saved %s at episode %d in %.3fs",
+                        self.path, iEpisode, time.time() - startT)
+            status = 0
+        except Exception:
+            logger.exception("[Checkpoint] Unable to write %s", self.path)
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+        finally:
+            os._exit(status)
+
+    def wait(self):
+        """
+        Wait for the checkpoint being written, if any.
+        """
+        if self._writer is not None:
+            os.waitpid(self._writer, 0)
+            self._writer = None
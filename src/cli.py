@@ -0,0 +1,301 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+
+import log
+
+import gym  # import gym before initializing the logs
+log.init()
+
+logger = logging.getLogger('cli')
+
+import json
+import os
+import time
+
+import numpy as np
+import tornado.options
+from tornado.options import define, options
+
+from agent import Agent, HEADLESS_PARAMS
+from algorithms import Algorithms
+from problems import Problems
+from inspectors import Inspectors
+from inspectors.factory import InspectorsFactory
+from inspectors.recorders import EpisodesLog, EvaluationLog
+import checkpoint
+import resources
+import sweep
+
+define('config', default='', type=str,
+       help="JSON file holding the training to run, in the format of the "
+       "'train' command of the websocket: algorithm.name, algorithm.params, "
+       "problem.name, problem.params, agent.params and optionally "
+       "inspectors (a list of name, uid and params). The other options "
+       "override it.")
+define('algorithm', default='', type=str, help="Name of the algorithm.")
+define('algorithmParams', default='', type=str,
+       help="Parameters of the algorithm, in JSON.")
+define('problem', default='', type=str, help="Name of the problem.")
+define('problemParams', default='', type=str,
+       help="Parameters of the problem, in JSON.")
+define('agentParams', default='', type=str,
+       help="Parameters of the agent, in JSON. Rendering and delays are "
+       "always disabled.")
+define('inspectors', default='', type=str,
+       help="Inspectors to run, in JSON: a list of name and params. Their "
+       "messages are written to inspectors.jsonl.")
+define('resume', default='', type=str,
+       help="Id of a run to resume from its latest checkpoint, or 'latest'. "
+       "The run keeps its configuration, but for the agentParams option, "
+       "e.g. to train it for more episodes.")
+define('output', default='runs', type=str,
+       help="Directory the results of the runs are written to, one "
+       "sub-directory per run.")
+define('sweep', default='', type=str,
+       help="JSON file holding a sweep to run rather than a single training "
+       "(see `sweep.expand`). The algorithm, problem and params options "
+       "override it, e.g. --algorithmParams='{\"alpha\": [0.1, 0.5]}'.")
+
+# number of last episodes the mean return of the summary is computed over
+SUMMARY_EPISODES = 100
+
+
+class CliException(Exception):
+    pass
+
+
+def _loadJson(value, name):
+    try:
+        return json.loads(value)
+    except ValueError as e:
+        raise CliException("Invalid JSON for %s: %s" % (name, e))
+
+
+def _readOptions(path):
+    """
+    Returns the fields of the JSON file `path` (if any) overridden by the
+    algorithm, problem and params options.
+    """
+    config = {
+        'algorithm': {'name': None, 'params': {}},
+        'problem': {'name': None, 'params': {}},
+        'agent': {'params': {}},
+        'inspectors': []
+    }
+    if path:
+        with open(path) as f:
+            config.update(json.load(f))
+    for key in ('algorithm', 'problem'):
+        if getattr(options, key):
+            config[key]['name'] = getattr(options, key)
+        if getattr(options, key + 'Params'):
+            config[key]['params'].update(
+                _loadJson(getattr(options, key + 'Params'), key + 'Params'))
+    if options.agentParams:
+        config['agent']['params'].update(
+            _loadJson(options.agentParams, 'agentParams'))
+    if options.inspectors:
+        config['inspectors'] = [
+            dict(inspector, uid=inspector.get('uid', '%s-%d' % (
+                inspector['name'], i)))
+            for i, inspector in enumerate(
+                _loadJson(options.inspectors, 'inspectors'))]
+    return config
+
+
+def readConfig():
+    """
+    Returns the training to run, as the fields of the 'train' command of the
+    websocket (see `TrainingSession._trainCommand`), from the options.
+    """
+    config = _readOptions(options.config)
+    for key, registry in (('algorithm', Algorithms), ('problem', Problems)):
+        name = config[key]['name']
+        if name not in registry:
+            raise CliException("Unknown %s %s, choose from: %s" % (
+                key, name, ", ".join(sorted(registry))))
+        config[key]['params'] = dict(registry[name].PARAMS_DEFAULT,
+                                     **config[key]['params'])
+    for inspector in config['inspectors']:
+        if inspector['name'] not in Inspectors:
+            raise CliException("Unknown inspector %s, choose from: %s" % (
+                inspector['name'], ", ".join(sorted(Inspectors))))
+        inspector['params'] = dict(
+            Inspectors[inspector['name']].PARAMS_DEFAULT,
+            **inspector.get('params', {}))
+    config['agent']['params'].update(HEADLESS_PARAMS)
+    return config
+
+
+def run(config, runId, startEpisode=0, checkpointPath=None):
+    """
+    Train the agent `config` describes at full speed, writing the metrics
+    of each episode, the messages of its inspectors and the summary of the
+    run to its output directory, and saving a final checkpoint. Returns the
+    summary.
+    """
+    outputDir = os.path.join(options.output, runId)
+    if not os.path.isdir(outputDir):
+        os.makedirs(outputDir)
+
+    messages = open(os.path.join(outputDir, 'inspectors.jsonl'), 'a')
+    factory = InspectorsFactory(
+        lambda message: messages.write(json.dumps(message) + '\n'))
+    episodesLog = EpisodesLog(
+        os.path.join(outputDir, 'episodes.csv'), None, 'episodes')
+    evaluationLog = EvaluationLog(None, 'evaluation')
+    factory.addInspector(episodesLog)
+    factory.addInspector(evaluationLog)
+    for inspector in config['inspectors']:
+        factory.registerInspector(
+            inspector['name'], inspector['uid'], inspector['params'])
+
+    algo = Algorithms[config['algorithm']['name']](
+        **config['algorithm']['params'])
+    problem = Problems[config['problem']['name']](
+        **config['problem']['params'])
+    agent = Agent(inspectorsFactory=factory, **config['agent']['params'])
+    resources.check(problem, algo, agent)
+    agent.setup(problem, algo)
+    if checkpointPath is not None:
+        agent.startEpisode = checkpoint.restore(
+            checkpointPath, agent.checkpointObjects())['iEpisode']
+    factory.setup(problem, algo, agent)
+    agent.checkpointer = checkpoint.Checkpointer(runId, lambda: config)
+
+    logger.info("[Cli] Run %s: %s on %s, episodes %d to %d", runId,
+                config['algorithm']['name'], config['problem']['name'],
+                agent.startEpisode, agent.nEpisodes)
+    stopReason = None
+    startT = time.time()
+    try:
+        for _ in agent.train(yieldSteps=False):
+            pass
+        stopReason = agent.stopReason
+    except KeyboardInterrupt:
+        stopReason = "interrupted"
+        logger.warning("[Cli] Interrupted at episode %d", agent.iEpisode)
+    duration = time.time() - startT
+
+    # the final checkpoint mustn't be skipped for a periodic one
+    agent.checkpointer.wait()
+    agent.checkpointer.save(agent.checkpointObjects(), agent.iEpisode)
+    agent.checkpointer.wait()
+    if stopReason != "interrupted":
+        for _ in agent.evaluate():
+            pass
+
+    summary = {
+        'runId': runId,
+        'config': config,
+        'startEpisode': startEpisode,
+        'iEpisode': agent.iEpisode,
+        'nEpisodes': episodesLog.nEpisodes,
+        'nSteps': episodesLog.nSteps,
+        'duration': duration,
+        'stepsPerSecond': episodesLog.nSteps / duration if duration else 0,
+        'meanReturn': float(np.mean(
+            episodesLog.returns[-SUMMARY_EPISODES:] or [0])),
+        'stopReason': stopReason,
+        'evaluation': evaluationLog.result,
+        'checkpoint': agent.checkpointer.path
+    }
+    with open(os.path.join(outputDir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=4, sort_keys=True,
+                  separators=(',', ': '))
+
+    for uid in [episodesLog.uid, evaluationLog.uid] + [
+            inspector['uid'] for inspector in config['inspectors']]:
+        factory.removeInspector(uid)
+    agent.release()
+    messages.close()
+    return summary
+
+
+def runSweep():
+    """
+    Run the sweep of the `sweep` option, printing the result of each run as
+    it arrives. The results are written to the output directory as they
+    arrive, and their ranking once the sweep is over.
+    """
+    spec = _readOptions(options.sweep)
+    runs = sweep.Sweep(spec)
+    outputDir = os.path.join(options.output, 'sweep-' + checkpoint.newRunId())
+    os.makedirs(outputDir)
+    runs.start(spec.get('nWorkers', 0))
+    try:
+        with open(os.path.join(outputDir, 'results.jsonl'), 'w') as f:
+            for result in runs.stream():
+                f.write(json.dumps(result) + '\n')
+                f.flush()
+                params = ", ".join("%s=%s" % item for item in sorted(
+                    result['swept'].iteritems()))
+                if result.get('error'):
+                    print "[%d/%d] %s: failed, %s" % (
+                        len(runs.results), len(runs.runs), params,
+                        result['error'])
+                else:
+                    print "[%d/%d] %s: %s=%.3f" % (
+                        len(runs.results), len(runs.runs), params,
+                        runs.metric, result['metrics'][runs.metric])
+    except KeyboardInterrupt:
+        logger.warning("[Cli] Sweep interrupted")
+    finally:
+        runs.stop()
+
+    ranking = runs.ranking()
+    with open(os.path.join(outputDir, 'ranking.json'), 'w') as f:
+        json.dump({'metric': runs.metric, 'ranking': ranking}, f, indent=4,
+                  sort_keys=True, separators=(',', ': '))
+    print "Best runs by %s:" % runs.metric
+    for rank, result in enumerate(ranking[:10]):
+        print "%2d. %.3f - %s (seed %d)" % (
+            rank + 1, result['metrics'][runs.metric], ", ".join(
+                "%s=%s" % item for item in sorted(
+                    result['swept'].iteritems())), result['seed'])
+    print "Results in %s" % outputDir
+
+
+def main():
+    """
+    Run a training from the command line, without the server: e.g.
+    `python src/cli.py --algorithm=Sarsa --problem=PresetGridWorld
+    --agentParams='{"nEpisodes": 10000}'`, or a sweep with the `sweep`
+    option.
+    """
+    # logs are already set up by `log.init`
+    options.logging = None
+    tornado.options.parse_command_line()
+    if options.sweep:
+        return runSweep()
+    startEpisode = 0
+    checkpointPath = None
+    if options.resume:
+        checkpointPath = checkpoint.find(options.resume, allowLatest=True)
+        header = checkpoint.readHeader(checkpointPath)
+        runId = header['runId']
+        config = header['config']
+        startEpisode = header['iEpisode']
+        if options.agentParams:
+            config['agent']['params'].update(
+                _loadJson(options.agentParams, 'agentParams'),
+                **HEADLESS_PARAMS)
+    else:
+        runId = checkpoint.newRunId()
+        config = readConfig()
+    summary = run(config, runId, startEpisode, checkpointPath)
+    print ("Run %s: %d episodes, %d steps in %.2fs - %.0f steps/s - mean "
+           "return %.2f over the last %d episodes%s" % (
+               runId, summary['nEpisodes'], summary['nSteps'],
+               summary['duration'], summary['stepsPerSecond'],
+               summary['meanReturn'], SUMMARY_EPISODES,
+               " - stopped: %s" % summary['stopReason']
+               if summary['stopReason'] else ""))
+    print "Results in %s, checkpoint %s" % (
+        os.path.join(options.output, runId), summary['checkpoint'])
+
+if __name__ == "__main__":
+    main()
@@ -21,4 +21,24 @@ Hooks = utils.enum(
     #   If the episode is rendered, a number that is consistent with previous
     #   measurements will be returned instead of the real duration to avoid
     #   ridiculous outliners.
-    'trainingProgress')
+    'trainingProgress',
+    # Called once the agent has been evaluated over several greedy episodes
+    # (see `Agent.evaluate`).
+    # Provided parameters are:
+    # * nEpisodes: number of evaluation episodes
+    # * returns: statistics of the returns of the episodes
+    # * steps: statistics of the number of steps of the episodes
+    # * duration: time it took to run the episodes, in number of seconds
+    # Statistics are given as dicts (see `evaluation.summarize`).
+    'evaluation',
+    # Called when episodes of the other seeds of a training run over several
+    # seeds (see the `nSeeds` agent parameter) have run, the agent's own
+    # training being the first seed, reported on `trainingProgress`.
+    # Provided parameters are:
+    # * seed: number of the seed, from 0 (the agent's own training)
+    # * episodes: list of dicts holding the parameters of `trainingProgress`
+    #   for each episode (iEpisode, nEpisodes, episodeReturn, episodeSteps
+    #   and episodeDuration)
+    # * done: True once the training of this seed is over, no episodes
+    #   following
+    'seedProgress')
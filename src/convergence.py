@@ -0,0 +1,160 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import random
+
+import numpy as np
+
+from consts import Spaces
+import utils
+
+
+# number of states the value function and policy are probed on
+N_SAMPLE_STATES = 200
+
+
+def sampleStates(problem, n=N_SAMPLE_STATES):
+    """
+    Pick `n` states of the problem the value function and policy of the
+    algorithm are probed on. States of discrete problems are picked among
+    all the states, states of continuous problems are drawn uniformly within
+    the bounds of the state space. Dimensions without sensible bounds (e.g.
+    velocities) are drawn within [-1, 1].
+    """
+    if problem.DOMAIN['state'] == Spaces.Discrete:
+        states = problem.getStatesList()
+        return random.sample(states, min(n, len(states)))
+    low, high = problem.getStatesBounds()
+    low = np.asarray(low, dtype=float)
+    high = np.asarray(high, dtype=float)
+    unbounded = ~np.isfinite(high - low) | (high - low > 1e6)
+    low = np.where(unbounded, -1, low)
+    high = np.where(unbounded, 1, high)
+    return list(np.random.uniform(low, high, size=(n, len(low))))
+
+
+class ConvergenceCriterion(object):
+    """
+    Base class for the convergence criteria training can be stopped early
+    on. Criteria are updated after each episode and checked every `window`
+    episodes, comparing the current window against the previous one: the
+    training is considered converged when the change is below `tolerance`.
+    """
+    def __init__(self, problem, algo, window, tolerance):
+        super(ConvergenceCriterion, self).__init__()
+        self._problem = problem
+        self._algo = algo
+        self.window = int(window)
+        self.tolerance = float(tolerance)
+        self._nEpisodes = 0
+
+    def update(self, iEpisode, episodeReturn):
+        """
+        Called after each episode of the training. Returns the reason why
+        the training converged if it did, None otherwise.
+        """
+        self._episodeDone(episodeReturn)
+        self._nEpisodes += 1
+        if self._nEpisodes % self.window:
+            return None
+        change = self._change(iEpisode)
+        if change is None or change > self.tolerance:
+            return None
+        return self._reason(change, iEpisode)
+
+    def _episodeDone(self, episodeReturn):
+        pass
+
+    def _change(self, iEpisode):
+        """
+        Returns the change since the end of the previous window, or None if
+        there is nothing to compare against yet.
+        """
+        raise NotImplementedError()
+
+    def _reason(self, change, iEpisode):
+        raise NotImplementedError()
+
+
+class ReturnPlateau(ConvergenceCriterion):
+    """
+    The mean return over the last window of episodes changed by less than
+    `tolerance` (relative to the previous window's mean return).
+    """
+    def __init__(self, *args, **kwargs):
+        super(ReturnPlateau, self).__init__(*args, **kwargs)
+        self._returns = []
+        self._previousMean = None
+
+    def _episodeDone(self, episodeReturn):
+        self._returns.append(episodeReturn)
+
+    def _change(self, iEpisode):
+        mean = np.mean(self._returns)
+        self._returns = []
+        previousMean, self._previousMean = self._previousMean, mean
+        if previousMean is None:
+            return None
+        return abs(mean - previousMean) / max(1.0, abs(previousMean))
+
+    def _reason(self, change, iEpisode):
+        return ("mean return over the last %d episodes (%.2f) changed by "
+                "%.2f%%" % (self.window, self._previousMean, change * 100))
+
+
+class ValueChange(ConvergenceCriterion):
+    """
+    The values of the actions in a sample of states (see `sampleStates`)
+    changed by at most `tolerance` over the last window of episodes.
+    """
+    def __init__(self, *args, **kwargs):
+        super(ValueChange, self).__init__(*args, **kwargs)
+        self._states = sampleStates(self._problem)
+        self._actions = self._problem.getActionsList()
+        self._values = None
+
+    def _change(self, iEpisode):
+        values = np.asarray(
+            self._algo.actionValues(self._states, self._actions), dtype=float)
+        previousValues, self._values = self._values, values
+        if previousValues is None:
+            return None
+        return np.abs(values - previousValues).max()
+
+    def _reason(self, change, iEpisode):
+        return ("action values changed by at most %g over the last %d "
+                "episodes" % (change, self.window))
+
+
+class PolicyChange(ConvergenceCriterion):
+    """
+    The greedy action changed in at most a fraction `tolerance` of a sample
+    of states (see `sampleStates`) over the last window of episodes.
+    """
+    def __init__(self, *args, **kwargs):
+        super(PolicyChange, self).__init__(*args, **kwargs)
+        self._states = sampleStates(self._problem)
+        self._actions = None
+
+    def _change(self, iEpisode):
+        actions = [self._algo.pickAction(state, iEpisode, optimize=True)
+                   for state in self._states]
+        previousActions, self._actions = self._actions, actions
+        if previousActions is None:
+            return None
+        return np.mean([a != b for a, b in zip(actions, previousActions)])
+
+    def _reason(self, change, iEpisode):
+        return ("greedy policy changed in %.1f%% of the sampled states over "
+                "the last %d episodes" % (change * 100, self.window))
+
+
+Criteria = utils.makeMapping([
+    ReturnPlateau,
+    ValueChange,
+    PolicyChange
+])
@@ -0,0 +1,121 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import numpy as np
+
+import utils
+
+# percentiles of the metrics reported by `summarize`
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# z-score bounding the 95% confidence interval of a normal distribution
+Z_95 = 1.96
+
+
+def summarize(values):
+    """
+    Statistics of the values of a metric over several episodes: `mean`,
+    `std`, `min`, `max`, the percentiles (`p5`, `p25`, `p50`...) and the
+    bounds of the 95% confidence interval of the mean (`ciLow`, `ciHigh`),
+    assuming the mean is normally distributed.
+    """
+    values = np.asarray(values, dtype=float)
+    mean = values.mean()
+    std = values.std(ddof=1) if len(values) > 1 else 0.0
+    halfWidth = Z_95 * std / np.sqrt(len(values))
+    stats = {
+        'mean': mean,
+        'std': std,
+        'min': values.min(),
+        'max': values.max(),
+        'ciLow': mean - halfWidth,
+        'ciHigh': mean + halfWidth
+    }
+    for percentile, value in zip(
+            PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats['p%d' % percentile] = value
+    return {key: float(value) for key, value in stats.iteritems()}
+
+
+def runEpisode(problem, algo, episodeI):
+    """
+    Run one episode of the problem following the greedy policy of the
+    algorithm, without training it. Returns the return of the episode and its
+    number of steps.
+    """
+    state = problem.reset()
+    algo.startEpisode(state)
+    episodeReturn = 0
+    iStep = 0
+    for iStep in xrange(problem.maxSteps):
+        action = algo.pickAction(state, episodeI, optimize=True)
+        state, reward, _, _ = problem.step(action)
+        episodeReturn += reward
+        if problem.episodeDone(stepI=iStep):
+            break
+    return episodeReturn, iStep + 1
+
+
+class BatchResult(object):
+    """
+    Returns and numbers of steps of a batch of episodes, as they run.
+    """
+    def __init__(self, nEpisodes):
+        super(BatchResult, self).__init__()
+        self.returns = np.zeros(nEpisodes)
+        self.steps = np.zeros(nEpisodes, dtype=int)
+        # number of episodes over
+        self.nDone = 0
+
+
+def runBatch(problem, algo, nEpisodes, episodeI):
+    """
+    Run `nEpisodes` greedy episodes at once through the batch interface of
+    the problem. Returns an iterator running one step of the batch each time
+    its next() function is called, and yielding the `BatchResult` of the
+    episodes (the same object every time, updated in place).
+    """
+    states = problem.resetBatch(nEpisodes)
+    result = BatchResult(nEpisodes)
+    done = np.zeros(nEpisodes, dtype=bool)
+    actions = np.zeros(nEpisodes, dtype=int)
+    for _ in xrange(problem.maxSteps):
+        running = np.flatnonzero(~done)
+        if len(running) == 0:
+            break
+        for i in running:
+            actions[i] = algo.pickAction(states[i], episodeI, optimize=True)
+        states, rewards, done = problem.stepBatch(actions)
+        result.returns += rewards
+        result.steps[running] += 1
+        result.nDone = int(done.sum())
+        yield result
+
+
+# state of the pool worker processes, see `_initWorker`.
+_worker = {}
+
+
+def _initWorker(problem, algo):
+    """
+    Pool workers are forked from the process that trained the algorithm: they
+    all get their own copy of the trained algorithm and of the problem.
+    """
+    _worker['problem'] = problem
+    _worker['algo'] = algo
+
+
+def runEpisodes(args):
+    """
+    Run greedy episodes in a pool worker. Returns the list of the return and
+    number of steps of each episode.
+    """
+    nEpisodes, episodeI, seed = args
+    utils.seed(seed)
+    _worker['problem'].seed(seed)
+    return [runEpisode(_worker['problem'], _worker['algo'], episodeI)
+            for _ in xrange(nEpisodes)]
@@ -22,6 +22,9 @@ class Base(Parametizable):
     # Declare which hook this inspector should use. The hook defines when
     # the inspector will be called and which parameters will be provided.
     HOOK = None
+    # Additional hooks the inspector is bound to, mapped to the name of the
+    # method called on them.
+    EXTRA_HOOKS = {}
 
     def __init__(self, send, uid, **kwargs):
         """
@@ -25,6 +25,8 @@ class InspectorsFactory(object):
         # event -> inspector callable
         self._hookedUp = defaultdict(dict)
         self._inspectorsByUid = {}
+        # uid -> name and parameters the inspector was registered with
+        self._registrations = {}
 
         self._agent = None
         self._problem = None
@@ -39,9 +41,8 @@ class InspectorsFactory(object):
         self._agent = agent
         self._problem = problem
         self._algo = algo
-        for hook, inspectors in self._hookedUp.iteritems():
-            for inspector in inspectors:
-                inspector.setup(problem, algo, agent)
+        for inspector in self._inspectorsByUid.itervalues():
+            inspector.setup(problem, algo, agent)
 
     def dispatch(self, hook, *args, **kwargs):
         """
@@ -50,7 +51,7 @@ class InspectorsFactory(object):
         if len(self._hookedUp[hook]) == 0:
             return
 
-        for inspector in self._hookedUp[hook]:
+        for inspector in self._hookedUp[hook].itervalues():
             inspector(*args, **kwargs)
 
     def registerInspector(self, name, uid, params):
@@ -61,14 +62,32 @@ class InspectorsFactory(object):
         prototype for the declared hook. See inspectors documentation for more
         details as to which inspector should be bound to which hook
         """
-        inspector = Inspectors[name](self.send, uid, **params)
+        self.addInspector(Inspectors[name](self.send, uid, **params))
+        self._registrations[uid] = {'name': name, 'uid': uid, 'params': params}
+
+    def addInspector(self, inspector):
+        """
+        Hook up an inspector that was already created, e.g. one that isn't
+        part of the `Inspectors` offered to the client.
+        """
         if self._agent is not None:
             # setup the inspector no if we can..
             inspector.setup(self._problem, self._algo, self._agent)
-        self._hookedUp[inspector.HOOK][uid] = inspector
-        self._inspectorsByUid[uid] = inspector
+        self._hookedUp[inspector.HOOK][inspector.uid] = inspector
+        for hook, method in inspector.EXTRA_HOOKS.iteritems():
+            self._hookedUp[hook][inspector.uid] = getattr(inspector, method)
+        self._inspectorsByUid[inspector.uid] = inspector
+
+    def registrations(self):
+        """
+        Returns the name, uid and parameters of the inspectors registered.
+        """
+        return self._registrations.values()
 
     def removeInspector(self, uid):
-        inspector = self._inspectorsByUid[uid]
+        inspector = self._inspectorsByUid.pop(uid)
         inspector.cleanUp()
         del self._hookedUp[inspector.HOOK][uid]
+        for hook in inspector.EXTRA_HOOKS:
+            del self._hookedUp[hook][uid]
+        self._registrations.pop(uid, None)
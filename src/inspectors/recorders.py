@@ -0,0 +1,96 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import csv
+import os
+import time
+
+from inspectors.base import Base
+from consts import Hooks
+
+# Inspectors recording the runs that aren't driven by a client (see `cli`
+# and `sweep`). They aren't part of the `Inspectors` offered to the client:
+# hook them up with `InspectorsFactory.addInspector`.
+
+
+class EpisodesLog(Base):
+    """
+    Records the return and number of steps of each training episode, and
+    writes the metrics of each episode as a row of the CSV file `path` if
+    given. Resumed runs append to the file.
+    """
+    HOOK = Hooks.trainingProgress
+
+    COLUMNS = ['iEpisode', 'episodeReturn', 'episodeSteps', 'episodeDuration']
+
+    def __init__(self, path, *args, **kwargs):
+        super(EpisodesLog, self).__init__(*args, **kwargs)
+        self._f = None
+        self._writer = None
+        if path is not None:
+            exists = os.path.exists(path)
+            self._f = open(path, 'ab')
+            self._writer = csv.writer(self._f)
+            if not exists:
+                self._writer.writerow(self.COLUMNS)
+        self.nEpisodes = 0
+        self.nSteps = 0
+        self.returns = []
+
+    def __call__(self, iEpisode, nEpisodes, episodeReturn, episodeSteps,
+                 episodeDuration):
+        if self._writer is not None:
+            self._writer.writerow(
+                [iEpisode, episodeReturn, episodeSteps, episodeDuration])
+        self.nEpisodes += 1
+        self.nSteps += episodeSteps + 1
+        self.returns.append(episodeReturn)
+
+    def cleanUp(self):
+        if self._f is not None:
+            self._f.close()
+
+
+class EpisodesFeed(Base):
+    """
+    Sends the metrics of the training episodes in batches, as lists of dicts
+    holding the parameters of the `trainingProgress` hook, e.g. to stream
+    them out of a worker process. A batch is sent once it holds `batchSize`
+    episodes or `period` seconds after the previous one, and the last one
+    on `flush`.
+    """
+    HOOK = Hooks.trainingProgress
+
+    def __init__(self, batchSize, period, *args, **kwargs):
+        super(EpisodesFeed, self).__init__(*args, **kwargs)
+        self._batchSize = batchSize
+        self._period = period
+        self._episodes = []
+        self._lastSendT = time.time()
+
+    def __call__(self, **kwargs):
+        self._episodes.append(kwargs)
+        if (len(self._episodes) >= self._batchSize or
+                time.time() - self._lastSendT >= self._period):
+            self.flush()
+
+    def flush(self):
+        if self._episodes:
+            self.send(self._episodes)
+            self._episodes = []
+        self._lastSendT = time.time()
+
+
+class EvaluationLog(Base):
+    """
+    Keeps the statistics of the last evaluation of the agent.
+    """
+    HOOK = Hooks.evaluation
+
+    def __init__(self, *args, **kwargs):
+        super(EvaluationLog, self).__init__(*args, **kwargs)
+        self.result = None
+
+    def __call__(self, **kwargs):
+        self.result = kwargs
@@ -1,11 +1,15 @@
 # -*- coding: utf8 -*-
 
-from __future__ import unicode_literals
+from __future__ import absolute_import, unicode_literals
 
 from inspectors.base import Base
+import evaluation
 import utils
 from consts import ParamsTypes, Hooks
 
+# metrics of the episodes aggregated over the seeds of a training
+METRICS = ('episodeReturn', 'episodeSteps', 'episodeDuration')
+
 
 class EfficiencyInspector(Base):
     """
@@ -15,6 +19,10 @@ class EfficiencyInspector(Base):
     If its 'reset' parameter is False (the default) it will not reset when
     starting a new training, but rather show the new data on the same plot as
     the old one for comparison purposes.
+    Trainings run over several seeds (see the `nSeeds` agent parameter) are
+    shown as the mean and percentiles of the seeds at each episode: the
+    statistics of an episode are sent once every seed reached it, or is
+    over.
     """
     PARAMS = {
         'frequency': ParamsTypes.Number,
@@ -48,12 +56,28 @@ Steps shows the number of steps per episode.",
     }
 
     HOOK = Hooks.trainingProgress
+    EXTRA_HOOKS = {Hooks.seedProgress: 'seedProgress'}
 
     def __init__(self, *args, **kwargs):
         super(EfficiencyInspector, self).__init__(*args, **kwargs)
 
         self._notifyIfNotTooFrequent = utils.makeProgress(
             0, self.frequency, self._notify)
+        self._sampleIfNotTooFrequent = utils.makeProgress(
+            0, self.frequency, self._sample)
+
+        self._nSeeds = 1
+        # episodes sampled but not sent yet, by number: the number of
+        # episodes and the metrics of the episode for each seed that ran it
+        self._pending = {}
+        # seeds whose training is over
+        self._doneSeeds = set()
+
+    def setup(self, problem, algo, agent):
+        super(EfficiencyInspector, self).setup(problem, algo, agent)
+        self._nSeeds = int(agent.nSeeds)
+        self._pending = {}
+        self._doneSeeds = set()
 
     def _notify(self, pcVal, iEpisode, nEpisodes, episodeReturn,
                 episodeSteps, episodeDuration):
@@ -78,6 +102,46 @@ Steps shows the number of steps per episode.",
             'episodeDuration': episodeDuration
         })
 
+    def _sample(self, pcVal, iEpisode, nEpisodes, seed, metrics):
+        self._pending.setdefault(iEpisode, (nEpisodes, {}))[1][seed] = metrics
+
+    def _notifyBands(self):
+        """
+        Send the statistics of the episodes sampled that every seed reached,
+        or is over, in order.
+        """
+        while self._pending:
+            iEpisode = min(self._pending)
+            nEpisodes, samples = self._pending[iEpisode]
+            if any(seed not in samples and seed not in self._doneSeeds
+                   for seed in xrange(self._nSeeds)):
+                return
+            del self._pending[iEpisode]
+            message = {
+                'route': 'inspect',
+                'uid': self.uid,
+                'iEpisode': iEpisode,
+                'nEpisodes': nEpisodes,
+                'nSeeds': len(samples)
+            }
+            for metric in METRICS:
+                message[metric] = evaluation.summarize(
+                    [sample[metric] for sample in samples.itervalues()])
+            self.send(message)
+
+    def seedProgress(self, seed, episodes, done):
+        """
+        Gather the episodes of a seed of the training, and send the
+        statistics of the episodes every seed reached.
+        """
+        for episode in episodes:
+            self._sampleIfNotTooFrequent(
+                episode['iEpisode'], episode['nEpisodes'], seed,
+                {metric: episode[metric] for metric in METRICS})
+        if done:
+            self._doneSeeds.add(seed)
+        self._notifyBands()
+
     def __call__(self, iEpisode, nEpisodes, episodeReturn, episodeSteps,
                  episodeDuration, *args, **kwargs):
         """
@@ -85,6 +149,17 @@ Steps shows the number of steps per episode.",
         Depending on the number of episodes. some calls will be ignored
         to follow user-defined frequency.
         """
+        if self._nSeeds > 1:
+            # the final test episode comes once the training is over
+            if 0 not in self._doneSeeds:
+                self.seedProgress(0, [{
+                    'iEpisode': iEpisode,
+                    'nEpisodes': nEpisodes,
+                    'episodeReturn': episodeReturn,
+                    'episodeSteps': episodeSteps,
+                    'episodeDuration': episodeDuration
+                }], False)
+            return
         self._notifyIfNotTooFrequent(
             iEpisode, nEpisodes, episodeReturn=episodeReturn,
             episodeSteps=episodeSteps, episodeDuration=episodeDuration)
@@ -0,0 +1,37 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+from inspectors.base import Base
+from consts import Hooks
+
+
+class EvaluationInspector(Base):
+    """
+    Reports the results of the evaluation of the agent over several greedy
+    episodes once trained: mean, percentiles and 95% confidence interval of
+    the mean of the return and number of steps of the episodes.
+    Set the agent's `nEvalEpisodes` parameter to have it evaluated.
+    """
+    HOOK = Hooks.evaluation
+
+    def __call__(self, nEpisodes, returns, steps, duration, *args, **kwargs):
+        """
+        Report the statistics of the evaluation episodes.
+        """
+        logger.info(
+            "Evaluation over %d episodes: return=%.2f [%.2f, %.2f] ; "
+            "steps=%.1f [%.1f, %.1f]", nEpisodes, returns['mean'],
+            returns['ciLow'], returns['ciHigh'], steps['mean'],
+            steps['ciLow'], steps['ciHigh'])
+        self.send({
+            'route': 'inspect',
+            'uid': self.uid,
+            'nEpisodes': nEpisodes,
+            'returns': returns,
+            'steps': steps,
+            'duration': duration
+        })
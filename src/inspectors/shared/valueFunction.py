@@ -134,15 +134,18 @@ function, we need a way to reduce all action-values to a single values."
         allActions = self._problem.getActionsList()
         reducer = max if self.reducer == 'max' else mean
 
+        # evaluate the whole grid at once, algorithms may batch the queries
+        allParams = list(allParams)
+        values = self._algo.actionValues(
+            [_round(state) for state in allParams], allActions)
+
         # returns a list
         data = [
             utils.extends({
                 key: state[k]
                 for k, key in enumerate(self.getKeys(nbDims))
-            }, z=reducer([
-                self._algo.actionValue(_round(state), action)
-                for action in allActions]))
-            for state in allParams
+            }, z=reducer(list(actionValues)))
+            for state, actionValues in zip(allParams, values)
         ]
         if retstep:
             return data, stepSizes
@@ -0,0 +1,207 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+import logging
+logger = logging.getLogger(__name__)
+import time
+
+from tornado.options import define, options
+
+from agent import Agent
+from algorithms import Algorithms
+from problems import Problems
+import checkpoint
+import resources
+import sweep
+from trainingWorker import WorkerPool
+
+define('concurrentJobs', default=0, type=int,
+       help="Number of trainings run at once, the others waiting in the "
+       "queue. 0 runs one per training worker, local or remote.")
+define('maxQueuedJobs', default=100, type=int,
+       help="Number of trainings that can wait in the queue. Trainings "
+       "submitted while the queue is full are rejected.")
+define('maxJobCost', default=0, type=float,
+       help="Trainings estimated to last longer (in seconds) are rejected. "
+       "0 disables the limit.")
+
+
+class JobQueueException(Exception):
+    pass
+
+
+def estimateCost(message):
+    """
+    Estimated cost of the train command `message`: the number of seconds it
+    will run for at most (see `resources.estimate`). Resumed trainings only
+    count the episodes left. Sweeps (the 'sweep' command) cost the sum of
+    the costs of their runs, spread over their workers.
+    """
+    if message.get('command') == 'sweep':
+        return _sweepCost(message)
+    iEpisode = 0
+    try:
+        if message.get('resume'):
+            header = checkpoint.readHeader(checkpoint.find(message['resume']))
+            message = header['config']
+            iEpisode = header['iEpisode']
+        algo = Algorithms[message['algorithm']['name']](
+            **message['algorithm'].get('params', {}))
+        problem = Problems[message['problem']['name']](
+            **message['problem'].get('params', {}))
+        agent = Agent(**message['agent'].get('params', {}))
+        estimate = resources.estimate(problem, algo, agent)
+    except Exception:
+        # the session will report it
+        logger.exception("[JobQueue] Unable to estimate the cost of a job")
+        return 0
+    return estimate.duration * max(
+        0, 1 - float(iEpisode) / max(1, agent.nEpisodes))
+
+
+def _sweepCost(message):
+    try:
+        runs = sweep.expand(message)
+    except Exception:
+        # the session will report it
+        logger.exception("[JobQueue] Unable to expand a sweep")
+        return 0
+    return sum(estimateCost(run) for run in runs) / sweep.workersCount(
+        len(runs), message.get('nWorkers', 0))
+
+
+class Job(object):
+    """
+    A training or a sweep waiting in the `JobQueue`, then running. `start`
+    is called once the job is admitted to run, and `send` to let the client
+    know its position in the queue.
+    """
+    def __init__(self, message, start, send):
+        super(Job, self).__init__()
+        self.message = message
+        self.priority = int(message.get('priority', 0))
+        self.cost = estimateCost(message)
+        self.start = start
+        self.send = send
+        # position in the queue last sent to the client
+        self.position = None
+        self.submitT = time.time()
+
+
+class JobQueue(object):
+    """
+    Queue of the trainings and sweeps of the server process. At most
+    `concurrentJobs` of them run at once: the others wait, jobs of higher
+    priority first and in the order they were submitted otherwise, their
+    clients being told their position in the queue on the route 'queued'
+    whenever it changes.
+    A job runs until its session reports it is over (see `done`).
+    Jobs are rejected (`submit` raising a `JobQueueException`) when the
+    queue is full or when their estimated cost is above `maxJobCost`, so an
+    overloaded server makes clients wait rather than slowing every training
+    down.
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            # `trainInProcess` is defined along the handler
+            if options.concurrentJobs or options.trainInProcess:
+                cls._instance = cls(options.concurrentJobs or 1)
+            else:
+                cls._instance = cls(WorkerPool.instance().capacity)
+                WorkerPool.instance().capacityListeners.append(
+                    cls._instance._update)
+        return cls._instance
+
+    def __init__(self, concurrency):
+        """
+        `concurrency` is the number of jobs run at once, or a function
+        returning it if it changes.
+        """
+        super(JobQueue, self).__init__()
+        self._concurrency = concurrency
+        # heap of (-priority, submission number, job)
+        self._waiting = []
+        self._running = set()
+        self._counter = itertools.count()
+
+    @property
+    def concurrency(self):
+        if callable(self._concurrency):
+            return self._concurrency()
+        return self._concurrency
+
+    def submit(self, job):
+        if options.maxJobCost > 0 and job.cost > options.maxJobCost:
+            raise JobQueueException(
+                "Training too long: about %ds, the limit is %ds." % (
+                    job.cost, options.maxJobCost))
+        if len(self._waiting) >= options.maxQueuedJobs:
+            raise JobQueueException(
+                "The server is busy (%d trainings waiting), try again later."
+                % len(self._waiting))
+        heapq.heappush(
+            self._waiting, (-job.priority, next(self._counter), job))
+        self._update()
+
+    def isRunning(self, job):
+        return job in self._running
+
+    def done(self, job):
+        """
+        Called once a running job is over.
+        """
+        self._running.discard(job)
+        self._update()
+
+    def cancel(self, job):
+        """
+        Remove a job from the queue, or stop counting it if it was running.
+        """
+        if job in self._running:
+            return self.done(job)
+        self._waiting = [item for item in self._waiting if item[2] is not job]
+        heapq.heapify(self._waiting)
+        self._update()
+
+    def stats(self):
+        return {
+            'running': len(self._running),
+            'waiting': len(self._waiting),
+            'waitingCost': sum(job.cost for _, _, job in self._waiting)
+        }
+
+    def _update(self):
+        """
+        Start the jobs that can run, and send the other jobs their position
+        in the queue if it changed.
+        """
+        while self._waiting and len(self._running) < self.concurrency:
+            _, _, job = heapq.heappop(self._waiting)
+            self._running.add(job)
+            logger.info("[JobQueue] Starting job (priority %d, cost %d) "
+                        "after %.1fs", job.priority, job.cost,
+                        time.time() - job.submitT)
+            if job.position is not None:
+                job.send({
+                    'route': 'jobStarted',
+                    'waited': time.time() - job.submitT
+                })
+            job.start()
+
+        costAhead = 0
+        for position, (_, _, job) in enumerate(sorted(self._waiting)):
+            if job.position != position + 1:
+                job.position = position + 1
+                job.send({
+                    'route': 'queued',
+                    'position': job.position,
+                    'queueLength': len(self._waiting),
+                    'costAhead': costAhead
+                })
+            costAhead += job.cost
@@ -2,13 +2,16 @@
 
 from __future__ import unicode_literals
 
-from mountainCar import MountainCar, MountainCarCustom
+from mountainCar import MountainCar, MountainCarCustom, NativeMountainCar
+from cartPole import NativeCartPole
 from gridWorld import PresetGridWorld, RandomGridWorld
 import utils
 
 Problems = utils.makeMapping([
     MountainCar,
     MountainCarCustom,
+    NativeMountainCar,
+    NativeCartPole,
     RandomGridWorld,
     PresetGridWorld
 ])
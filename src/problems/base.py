@@ -70,10 +70,17 @@ class BaseProblem(Parametizable):
     # of the state space (dimension 1 in first position, etc...)
     STATE_DIMENSION_NAMES = []
 
+    # Override and set to True if the problem implements `resetBatch` and
+    # `stepBatch`, to simulate many independent instances of the problem at
+    # once.
+    SUPPORTS_BATCH = False
+
     def __init__(self, **kwargs):
         super(BaseProblem, self).__init__(**kwargs)
         self._done = False
         self._env = None
+        # seed given before the environment was setup, if any
+        self._seed = None
         self.observationSpace = None
         self.actionSpace = None
 
@@ -85,6 +92,11 @@ class BaseProblem(Parametizable):
         self._done = True
 
     def episodeDone(self, stepI):
+        if self.EPISODE_TERMINATION_CRITERIA is \
+                BaseProblem.EPISODE_TERMINATION_CRITERIA:
+            # called at every step: skip the generic evaluation of the
+            # criteria when they are the default ones.
+            return self._done or stepI >= self.maxSteps
         return any(
             crit(self, stepI=stepI)
             for crit in self.EPISODE_TERMINATION_CRITERIA)
@@ -99,9 +111,27 @@ class BaseProblem(Parametizable):
         if self.GYM_ENVIRONMENT_NAME is None:
             raise NotImplementedError()
         self._env = gym.make(self.GYM_ENVIRONMENT_NAME)
+        if self._seed is not None:
+            self._env.seed(self._seed)
         self.observationSpace = self._env.observation_space
         self.actionSpace = self._env.action_space
 
+    def estimateShape(self):
+        """
+        Estimated shape of the problem, from its parameters only: the problem
+        doesn't need to be setup. Returns the number of states (`nStates`,
+        None if it isn't known or if the state space is continuous), the
+        number of dimensions of the state space (`statesDim`), the number of
+        actions (`nActions`) and the memory the problem uses, in bytes
+        (`memory`). See `resources`.
+        """
+        return {
+            'nStates': None,
+            'statesDim': len(self.STATE_DIMENSION_NAMES) or 1,
+            'nActions': len(self.ACTION_NAMES) or 2,
+            'memory': 0
+        }
+
     ###
     # Some helper function to retrieve information about the environment.
     # These are pre-implemented for any gym environment, and should
@@ -174,6 +204,60 @@ class BaseProblem(Parametizable):
         self._done = False
         return self._env.reset()
 
+    def seed(self, seed):
+        """
+        Seed the random number generator of the environment, if it has its
+        own. Problems relying on the global generators are seeded through
+        `utils.seed` instead. Problems seeded before being setup are seeded
+        as their environment is setup.
+        """
+        self._seed = seed
+        if self._env is not None:
+            self._env.seed(seed)
+
+    def getState(self):
+        """
+        Returns a snapshot of the current state of the environment that can
+        later be given to `setState` to bring the environment back to this
+        exact state. Lookahead planning algorithms take many snapshots per
+        decision, which should thus be as cheap as possible.
+        The default implementation supports gym environments storing their
+        whole state in a `state` attribute (e.g. classic control ones).
+        Override this function if you're not defining such an environment.
+        """
+        if self._env is None or not hasattr(self._env.unwrapped, 'state'):
+            raise NotImplementedError()
+        return tuple(self._env.unwrapped.state), self._done
+
+    def setState(self, state):
+        """
+        Restore the environment in the state given by a snapshot previously
+        returned by `getState`.
+        """
+        if self._env is None or not hasattr(self._env.unwrapped, 'state'):
+            raise NotImplementedError()
+        envState, self._done = state
+        self._env.unwrapped.state = envState
+
+    def resetBatch(self, n):
+        """
+        Reset `n` independent instances of the problem, separate from the
+        one driven by `reset` and `step`. Returns their initial states as a
+        (n x nbDims) array.
+        Only implemented by problems having `SUPPORTS_BATCH` set.
+        """
+        raise NotImplementedError()
+
+    def stepBatch(self, actions):
+        """
+        Take one action in each of the instances created by the last call to
+        `resetBatch`. Returns the new states, the rewards and whether each
+        instance is done, as arrays. Instances that are done are left as is
+        and receive a reward of 0.
+        Only implemented by problems having `SUPPORTS_BATCH` set.
+        """
+        raise NotImplementedError()
+
     def render(self, close=False):
         """
         Render the environment (server-side)
@@ -0,0 +1,117 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import math
+
+import numpy as np
+
+from problems.native import NativeProblem
+
+
+class NativeCartPole(NativeProblem):
+    """
+    Re-implementation of Gym's CartPole-v0 environment, simulating the cart
+    without going through gym. Also supports simulating batches of carts.
+    """
+    GYM_ENVIRONMENT_NAME = 'CartPole-v0'
+
+    GRAVITY = 9.8
+    MASS_CART = 1.0
+    MASS_POLE = 0.1
+    TOTAL_MASS = MASS_POLE + MASS_CART
+    # actually half the pole's length
+    LENGTH = 0.5
+    POLEMASS_LENGTH = MASS_POLE * LENGTH
+    FORCE_MAG = 10.0
+    # seconds between state updates
+    TAU = 0.02
+
+    # angle and position at which the episode fails
+    THETA_THRESHOLD = 12 * 2 * math.pi / 360
+    X_THRESHOLD = 2.4
+
+    # the angle limit is set to twice the threshold so the failing
+    # observation is still within bounds
+    STATES_HIGH = (
+        X_THRESHOLD * 2,
+        float(np.finfo(np.float32).max),
+        THETA_THRESHOLD * 2,
+        float(np.finfo(np.float32).max))
+    STATES_LOW = tuple(-bound for bound in STATES_HIGH)
+
+    NB_ACTIONS = 2
+
+    ACTION_NAMES = ['left', 'right']
+
+    STATE_DIMENSION_NAMES = [
+        'position', 'velocity', 'angle', 'angularVelocity']
+
+    def __init__(self, **kwargs):
+        super(NativeCartPole, self).__init__(**kwargs)
+        # number of steps taken since the pole fell, if it did
+        self._stepsBeyondDone = None
+
+    def _resetMany(self, n):
+        return self._rng.uniform(low=-0.05, high=0.05, size=(n, 4))
+
+    def reset(self):
+        self._stepsBeyondDone = None
+        return super(NativeCartPole, self).reset()
+
+    def _stepOne(self, state, action):
+        x, xDot, theta, thetaDot = state
+        force = self.FORCE_MAG if action == 1 else -self.FORCE_MAG
+        cosTheta = math.cos(theta)
+        sinTheta = math.sin(theta)
+        temp = (force + self.POLEMASS_LENGTH * thetaDot * thetaDot *
+                sinTheta) / self.TOTAL_MASS
+        thetaAcc = (self.GRAVITY * sinTheta - cosTheta * temp) / (
+            self.LENGTH * (4.0 / 3.0 - self.MASS_POLE * cosTheta * cosTheta /
+                           self.TOTAL_MASS))
+        xAcc = temp - self.POLEMASS_LENGTH * thetaAcc * cosTheta / \
+            self.TOTAL_MASS
+        x = x + self.TAU * xDot
+        xDot = xDot + self.TAU * xAcc
+        theta = theta + self.TAU * thetaDot
+        thetaDot = thetaDot + self.TAU * thetaAcc
+        done = (x < -self.X_THRESHOLD or x > self.X_THRESHOLD or
+                theta < -self.THETA_THRESHOLD or theta > self.THETA_THRESHOLD)
+
+        # same as gym: the step on which the pole falls is still rewarded
+        reward = 1.0
+        if done:
+            if self._stepsBeyondDone is None:
+                self._stepsBeyondDone = 0
+            else:
+                self._stepsBeyondDone += 1
+                reward = 0.0
+        return (x, xDot, theta, thetaDot), reward, done
+
+    def _stepMany(self, states, actions):
+        x, xDot, theta, thetaDot = states.T
+        force = np.where(actions == 1, self.FORCE_MAG, -self.FORCE_MAG)
+        cosTheta = np.cos(theta)
+        sinTheta = np.sin(theta)
+        temp = (force + self.POLEMASS_LENGTH * thetaDot * thetaDot *
+                sinTheta) / self.TOTAL_MASS
+        thetaAcc = (self.GRAVITY * sinTheta - cosTheta * temp) / (
+            self.LENGTH * (4.0 / 3.0 - self.MASS_POLE * cosTheta * cosTheta /
+                           self.TOTAL_MASS))
+        xAcc = temp - self.POLEMASS_LENGTH * thetaAcc * cosTheta / \
+            self.TOTAL_MASS
+        x = x + self.TAU * xDot
+        xDot = xDot + self.TAU * xAcc
+        theta = theta + self.TAU * thetaDot
+        thetaDot = thetaDot + self.TAU * thetaAcc
+        done = ((x < -self.X_THRESHOLD) | (x > self.X_THRESHOLD) |
+                (theta < -self.THETA_THRESHOLD) |
+                (theta > self.THETA_THRESHOLD))
+        # instances already done are left as is by `stepBatch`: only the step
+        # on which the pole falls is ever computed, and it is rewarded.
+        return (
+            np.column_stack((x, xDot, theta, thetaDot)),
+            np.ones(len(states)), done)
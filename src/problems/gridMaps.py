@@ -0,0 +1,150 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from problems.base import ProblemException
+
+# Directory map files are loaded from. A map file describes a grid the same
+# way `PREDEFINED_GRIDS` do: one line of cells per row, the first line being
+# the top of the grid, all lines having the same length and no indentation.
+MAPS_DIR = os.path.abspath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'maps'))
+MAPS_EXTENSION = '.map'
+
+# loaded maps, by (path, memoryMap), along with the modification time of the
+# file when it was loaded
+_cache = {}
+
+
+class GridMap(object):
+    """
+    A grid loaded from a map file or a string.
+    `grid` is a (width x height) array of uint8 holding the ASCII code of the
+    type of each cell (see `CASE_TYPES`), indexed by [x, y] with y = 0 at the
+    bottom. It usually is a view on the bytes of the file: no copy is made.
+    """
+    def __init__(self, grid):
+        super(GridMap, self).__init__()
+        self.grid = grid
+        self.width, self.height = grid.shape
+
+
+def _findFirstNewline(data):
+    chunk = 4096
+    while True:
+        pos = data[:chunk].tostring().find(b'\n')
+        if pos >= 0 or chunk >= len(data):
+            return pos
+        chunk *= 16
+
+
+def parseGrid(data, validCodes):
+    """
+    Parse the bytes of a map (1d array of uint8) into a `GridMap` without
+    copying them: the grid is a strided view skipping the end of line
+    characters, flipped so the first line is the top of the grid.
+    The position of the end of lines and the cells (against `validCodes`) are
+    only checked if `data` is in memory already, so memory mapped maps can be
+    opened without reading them.
+    """
+    first = _findFirstNewline(data)
+    if first < 0:
+        # single line map
+        width, eol = len(data), 0
+    else:
+        eol = 2 if first > 0 and data[first - 1] == ord('\r') else 1
+        width = first + 1 - eol
+    stride = width + eol
+    if width <= 0:
+        raise ProblemException("Empty map")
+
+    # the last line may or may not end with a new line
+    if len(data) % stride == 0:
+        height = len(data) // stride
+    elif (len(data) + eol) % stride == 0:
+        height = (len(data) + eol) // stride
+    else:
+        raise ProblemException(
+            "All the lines of a map should have the same length (%d)" % width)
+    # reading one byte per line would still load one page per line of a
+    # memory mapped file: only the last line is checked then.
+    lineEnds = slice(
+        first if not isinstance(data, np.memmap) else (height - 2) * stride +
+        first, len(data), stride)
+    if eol and height > 1 and not (data[lineEnds] == ord('\n')).all():
+        raise ProblemException(
+            "All the lines of a map should have the same length (%d)" % width)
+
+    rows = as_strided(data, shape=(height, width), strides=(stride, 1))
+    if not isinstance(data, np.memmap):
+        valid = np.zeros(256, dtype=bool)
+        valid[list(validCodes)] = True
+        if not valid[rows].all():
+            raise ProblemException("Unknown cell type in map")
+    return GridMap(rows[::-1].T)
+
+
+def listMaps():
+    """
+    Returns the names of the maps available in `MAPS_DIR`.
+    """
+    if not os.path.isdir(MAPS_DIR):
+        return []
+    return sorted(
+        name[:-len(MAPS_EXTENSION)] for name in os.listdir(MAPS_DIR)
+        if name.endswith(MAPS_EXTENSION))
+
+
+def mapSize(name):
+    """
+    Returns the width and height of the map `name` without parsing it: the
+    width is the length of its first line, the height its number of lines.
+    """
+    path = os.path.join(MAPS_DIR, name + MAPS_EXTENSION)
+    if not os.path.isfile(path):
+        raise ProblemException("Unknown map: %s" % name)
+    height, last = 0, b'\n'
+    with open(path, 'rb') as f:
+        width = len(f.readline().rstrip(b'\r\n'))
+        f.seek(0)
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            height += chunk.count(b'\n')
+            last = chunk[-1:]
+    # the last line may or may not end with a new line
+    if last != b'\n':
+        height += 1
+    return width, height
+
+
+def loadMap(name, validCodes, memoryMap=False):
+    """
+    Load the map `name` from `MAPS_DIR`. Maps are cached until their file
+    changes.
+    With `memoryMap`, the file is mapped in memory rather than read: only
+    the parts of the grid that are used are ever loaded, and processes
+    loading the same map share the memory.
+    """
+    path = os.path.join(MAPS_DIR, name + MAPS_EXTENSION)
+    if not os.path.isfile(path):
+        raise ProblemException("Unknown map: %s" % name)
+    mtime = os.path.getmtime(path)
+    key = (path, memoryMap)
+    if key in _cache and _cache[key][0] == mtime:
+        return _cache[key][1]
+
+    if memoryMap:
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        data = np.fromfile(path, dtype=np.uint8)
+    gridMap = parseGrid(data, validCodes)
+    logger.info("Loaded map %s (%dx%d)", name, gridMap.width, gridMap.height)
+    _cache[key] = (mtime, gridMap)
+    return gridMap
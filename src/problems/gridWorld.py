@@ -11,6 +11,7 @@ import random
 import numpy as np
 
 from problems.base import BaseProblem
+from problems import gridMaps
 from consts import Spaces, ParamsTypes
 import utils
 
@@ -30,6 +31,8 @@ CASE_TYPES = utils.enum(
     # terminate the episode
     Trap='!')
 
+CASE_CODES = [ord(getattr(CASE_TYPES, f)) for f in CASE_TYPES._fields]
+
 CASE_COLORS = {
     CASE_TYPES.Water: (0, 0, 0.7),
     CASE_TYPES.Sand: (0.7, 0.7, 0),
@@ -102,6 +105,37 @@ WWWWWWWWWWWWXXXXXX!XX......X.!..........
 }
 
 
+def floodFill(passable, seeds):
+    """
+    Returns the boolean mask of the cells of the grid that can be reached from
+    the `seeds` cells ((n x 2) array of coordinates) moving up, down, left or
+    right through `passable` cells only. Seeds are always reached, passable or
+    not.
+    This is a breadth-first search that only ever looks at the neighbours of
+    the frontier, so the whole search costs O(number of reached cells)
+    whatever the shape of the grid.
+    """
+    width, height = passable.shape
+    # cells are indexed in a grid padded with a non-passable border, so the
+    # neighbours of any cell can be found without bound checks.
+    stride = height + 2
+    padded = np.zeros((width + 2, stride), dtype=bool)
+    padded[1:-1, 1:-1] = passable
+    padded = padded.ravel()
+    reached = np.zeros_like(padded)
+    offsets = np.array([1, -1, stride, -stride])
+
+    seeds = np.asarray(seeds, dtype=int).reshape(-1, 2)
+    frontier = np.unique((seeds[:, 0] + 1) * stride + seeds[:, 1] + 1)
+    reached[frontier] = True
+    while len(frontier):
+        neighbours = (frontier[:, np.newaxis] + offsets).ravel()
+        neighbours = neighbours[padded[neighbours] & ~reached[neighbours]]
+        frontier = np.unique(neighbours)
+        reached[frontier] = True
+    return reached.reshape(width + 2, stride)[1:-1, 1:-1]
+
+
 class GridWorld(BaseProblem):
     """
     Custom GridWorld problem implementation
@@ -199,6 +233,9 @@ all the steps just got consumed.",
         self._grid = None
         self._currentPos = None
         self._initState = None
+        # optional: (n x 2) array of the cells the 'random' and
+        # 'episodeRandom' start schemes pick from. Any cell if left to None.
+        self._startCells = None
         self._viewer = None
         self._trajectory = []
 
@@ -223,6 +260,19 @@ all the steps just got consumed.",
         self._currentPos = self.reset(setup=True)
         self._initState = self._currentPos
 
+    def _estimateSize(self):
+        """
+        Returns the width and height the grid will have once setup.
+        """
+        raise NotImplementedError()
+
+    def estimateShape(self):
+        width, height = self._estimateSize()
+        shape = super(GridWorld, self).estimateShape()
+        # one byte per cell
+        shape.update(nStates=width * height, memory=width * height)
+        return shape
+
     def getStatesList(self):
         return [tuple(float(x) for x in v) for v in itertools.product(
             range(self._width), range(self._height))]
@@ -317,33 +367,70 @@ all the steps just got consumed.",
         self._done = False
         self._nbSteps = 0
 
-        x = None
-        if (self.startPosX == 'random' and setup) or (
-                self.startPosX == 'episodeRandom'):
+        randomX = self._isRandomStart(self.startPosX, setup)
+        randomY = self._isRandomStart(self.startPosY, setup)
+        x = None if randomX else self._startCoordinate(self.startPosX, 0)
+        y = None if randomY else self._startCoordinate(self.startPosY, 1)
+        if self._startCells is not None and (randomX or randomY):
+            # only start from cells a termination state can be reached from,
+            # on the row or column of the fixed coordinate if any.
+            cells = self._startCells
+            if not randomX:
+                cells = cells[cells[:, 0] == x]
+            if not randomY:
+                cells = cells[cells[:, 1] == y]
+            if len(cells):
+                x, y = cells[random.randint(0, len(cells) - 1)]
+                x, y = int(x), int(y)
+        if x is None:
             x = random.randint(0, self._width - 1)
-        elif (self.startPosX == 'random' and not setup):
-            x = self._initState[0]
-        elif self.startPosX == 'center':
-            x = self._width - 1
-        else:
-            x = int(self.startPosX)
-
-        y = None
-        if (self.startPosX == 'random' and setup) or (
-                self.startPosX == 'episodeRandom'):
+        if y is None:
             y = random.randint(0, self._height - 1)
-        elif (self.startPosY == 'random' and not setup):
-            y = self._initState[1]
-        elif self.startPosX == 'center':
-            y = self._height - 1
-        else:
-            y = int(self.startPosX)
 
         self._currentPos = (x, y)
         self._trajectory = [(x, y)]
 
         return (x, y)
 
+    @staticmethod
+    def _isRandomStart(startPos, setup):
+        """
+        Whether a new random coordinate is picked for the start position
+        along an axis whose parameter is `startPos` (see `reset`).
+        """
+        return startPos == 'episodeRandom' or (
+            startPos == 'random' and setup)
+
+    def _startCoordinate(self, startPos, axis):
+        """
+        Returns the coordinate of the start position along `axis` (0 for X,
+        1 for Y) when it isn't picked at random, `startPos` being the
+        parameter of this axis.
+        """
+        if startPos == 'random':
+            return self._initState[axis]
+        if startPos == 'center':
+            return (self._width, self._height)[axis] - 1
+        return int(startPos)
+
+    def getState(self):
+        """
+        The state of a grid world is the position of the agent plus the
+        progression of the current episode. The trajectory isn't copied: the
+        snapshot only records its length.
+        """
+        return (self._currentPos, self._nbSteps, self._done,
+                len(self._trajectory))
+
+    def setState(self, state):
+        """
+        Restore a snapshot taken by `getState`. The trajectory is truncated
+        back to its length at the time of the snapshot, which assumes the
+        snapshot was taken earlier during the same episode.
+        """
+        self._currentPos, self._nbSteps, self._done, trajectoryLen = state
+        del self._trajectory[trajectoryLen:]
+
     def _renderTrajectory(self):
         from gym.envs.classic_control import rendering
         points = [(
@@ -439,41 +526,74 @@ all the steps just got consumed.",
 class PresetGridWorld(GridWorld):
     """
     A gridworld implementation that offers a set of predefined grids for
-    your agent to train on.
+    your agent to train on, as well as the grids of the map files found in the
+    maps directory.
     """
 
     PARAMS = utils.extends(
         {},
         predefinedGrid=ParamsTypes.String,
+        memoryMap=ParamsTypes.Boolean,
         **GridWorld.PARAMS)
 
     PARAMS_DOMAIN = utils.extends(
         {},
         predefinedGrid={
-            'values': PREDEFINED_GRIDS.keys()
+            'values': PREDEFINED_GRIDS.keys() + gridMaps.listMaps()
+        },
+        memoryMap={
+            'values': [True, False]
         },
         **GridWorld.PARAMS_DOMAIN)
 
     PARAMS_DEFAULT = utils.extends(
         {},
         predefinedGrid='complex2',
+        memoryMap=False,
         **GridWorld.PARAMS_DEFAULT)
 
     PARAMS_DESCRIPTION = utils.extends(
         {},
         predefinedGrid="Pick a predefined grid",
+        memoryMap="""
+Map the file of the grid in memory instead of reading it. Only the parts of
+the grid the agent goes through are then loaded, which is much faster and
+lighter for very large maps.""",
         **GridWorld.PARAMS_DESCRIPTION)
 
-    def _setupGrid(self):
-        rep = PREDEFINED_GRIDS[self.predefinedGrid]
-        lines = [l.strip() for l in rep.split('\n') if len(l.strip()) > 0]
-        self._height = len(lines)
-        self._width = len(lines[0])  # all lines should have the same length
-        self._grid = np.zeros([self._width, self._height], dtype=int)
+    def __init__(self, **kwargs):
+        super(PresetGridWorld, self).__init__(**kwargs)
+        self._gridMap = None
+
+    def _estimateSize(self):
+        if self.predefinedGrid in PREDEFINED_GRIDS:
+            lines = [l.strip() for l in
+                     PREDEFINED_GRIDS[self.predefinedGrid].split('\n')
+                     if len(l.strip()) > 0]
+            return len(lines[0]), len(lines)
+        return gridMaps.mapSize(self.predefinedGrid)
+
+    def estimateShape(self):
+        shape = super(PresetGridWorld, self).estimateShape()
+        if self.memoryMap:
+            # only the parts of the grid that are used get loaded
+            shape['memory'] = 0
+        return shape
 
-        for x in xrange(self._width):
-            for y in xrange(self._height):
-                self._grid[x, self._height - y - 1] = ord(lines[y][x])
+    def _setupGrid(self):
+        if self.predefinedGrid in PREDEFINED_GRIDS:
+            rep = PREDEFINED_GRIDS[self.predefinedGrid]
+            lines = [l.strip() for l in rep.split('\n') if len(l.strip()) > 0]
+            self._gridMap = gridMaps.parseGrid(
+                np.frombuffer('\n'.join(lines).encode('ascii'),
+                              dtype=np.uint8),
+                CASE_CODES)
+        else:
+            self._gridMap = gridMaps.loadMap(
+                self.predefinedGrid, CASE_CODES, memoryMap=self.memoryMap)
+        self._grid = self._gridMap.grid
+        self._width = self._gridMap.width
+        self._height = self._gridMap.height
 
 
 class RandomGridWorld(GridWorld):
@@ -487,6 +607,10 @@ class RandomGridWorld(GridWorld):
         height=ParamsTypes.Number,
         nbTermStates=ParamsTypes.Number,
         nbTraps=ParamsTypes.Number,
+        wallDensity=ParamsTypes.Number,
+        waterDensity=ParamsTypes.Number,
+        sandDensity=ParamsTypes.Number,
+        gridSeed=ParamsTypes.Number,
         **GridWorld.PARAMS)
 
     PARAMS_DOMAIN = utils.extends(
@@ -507,6 +631,22 @@ class RandomGridWorld(GridWorld):
             'values': (0, 10, 100),
             'range': (0, 10000)
         },
+        wallDensity={
+            'values': (0, 0.1, 0.2, 0.3),
+            'range': (0, 0.9)
+        },
+        waterDensity={
+            'values': (0, 0.05, 0.1),
+            'range': (0, 0.9)
+        },
+        sandDensity={
+            'values': (0, 0.05, 0.1),
+            'range': (0, 0.9)
+        },
+        gridSeed={
+            'values': ('random', 0, 42),
+            'range': (0, 2 ** 32 - 1)
+        },
         **GridWorld.PARAMS_DOMAIN)
 
     PARAMS_DEFAULT = utils.extends(
@@ -515,6 +655,10 @@ class RandomGridWorld(GridWorld):
         height=20,
         nbTermStates=1,
         nbTraps=100,
+        wallDensity=0,
+        waterDensity=0,
+        sandDensity=0,
+        gridSeed='random',
         **GridWorld.PARAMS_DEFAULT)
 
     PARAMS_DESCRIPTION = utils.extends(
@@ -523,29 +667,97 @@ class RandomGridWorld(GridWorld):
         height="Controls the generated grid's height",
         nbTermStates="""Controls the number of termination states.""",
         nbTraps="""Controls the number of traps to generate.""",
+        wallDensity="Fraction of the cells that are walls.",
+        waterDensity="Fraction of the cells that are water.",
+        sandDensity="Fraction of the cells that are sand.",
+        gridSeed="""
+Seed of the grid generation: the same seed always generates the same grid.
+'random' generates a new grid each time.""",
         **GridWorld.PARAMS_DESCRIPTION)
 
+    def _fixedStartCell(self):
+        """
+        Returns the start cell if it doesn't depend on the random generator,
+        None otherwise (see `reset`).
+        """
+        if (self.startPosX in ('random', 'episodeRandom') or
+                self.startPosY in ('random', 'episodeRandom')):
+            return None
+        return (self._startCoordinate(self.startPosX, 0),
+                self._startCoordinate(self.startPosY, 1))
+
+    def _carve(self, start, end):
+        """
+        Clear the walls and traps along an L-shaped path from `start` to
+        `end`, so the latter can be reached from the former.
+        """
+        (x0, y0), (x1, y1) = start, end
+        xs = slice(min(x0, x1), max(x0, x1) + 1)
+        ys = slice(min(y0, y1), max(y0, y1) + 1)
+        for path in (self._grid[xs, y0], self._grid[x1, ys]):
+            path[(path == ord(CASE_TYPES.Wall)) |
+                 (path == ord(CASE_TYPES.Trap))] = ord(CASE_TYPES.Open)
+
+    def _estimateSize(self):
+        return int(self.width), int(self.height)
+
     def _setupGrid(self):
-        self._width = self.width
-        self._height = self.height
-        self._grid = np.zeros([self._width, self._height], dtype=int)
-
-        for x in xrange(self._width):
-            for y in xrange(self._height):
-                self._grid[x, self._height - y - 1] = ord(CASE_TYPES.Open)
-
-        traps = [(
-            random.randint(0, self.width - 1),
-            random.randint(0, self.height - 1))
-            for x in xrange(self.nbTraps)
-        ]
-        for term in traps:
-            self._grid[term[0], term[1]] = ord(CASE_TYPES.Trap)
-
-        termStates = [(
-            random.randint(0, self.width - 1),
-            random.randint(0, self.height - 1))
-            for x in xrange(self.nbTermStates)
-        ]
-        for term in termStates:
-            self._grid[term[0], term[1]] = ord(CASE_TYPES.Termination)
+        """
+        Generate the grid with array operations, then make sure at least one
+        termination state can be reached from the start position(s).
+        """
+        self._width = width = int(self.width)
+        self._height = height = int(self.height)
+        rng = np.random.RandomState(
+            None if self.gridSeed == 'random' else int(self.gridSeed))
+
+        # each cell is turned into a wall, water or sand depending on which
+        # density slice of [0, 1) a uniform draw falls into
+        thresholds = np.cumsum(
+            [self.wallDensity, self.waterDensity, self.sandDensity])
+        codes = np.array([ord(c) for c in (
+            CASE_TYPES.Wall, CASE_TYPES.Water, CASE_TYPES.Sand,
+            CASE_TYPES.Open)], dtype=np.uint8)
+        self._grid = codes[np.searchsorted(
+            thresholds, rng.random_sample((width, height)), side='right')]
+
+        self._grid[rng.randint(0, width, int(self.nbTraps)),
+                   rng.randint(0, height, int(self.nbTraps))] = ord(
+            CASE_TYPES.Trap)
+        terminals = np.column_stack((
+            rng.randint(0, width, int(self.nbTermStates)),
+            rng.randint(0, height, int(self.nbTermStates))))
+        self._grid[terminals[:, 0], terminals[:, 1]] = ord(
+            CASE_TYPES.Termination)
+
+        start = self._fixedStartCell()
+        if start is not None:
+            self._grid[start] = ord(CASE_TYPES.Open)
+            terminals = terminals[
+                (terminals[:, 0] != start[0]) | (terminals[:, 1] != start[1])]
+
+        # the episode ends on termination states and traps: paths can only
+        # go through the other cells.
+        passable = (
+            (self._grid != ord(CASE_TYPES.Wall)) &
+            (self._grid != ord(CASE_TYPES.Trap)) &
+            (self._grid != ord(CASE_TYPES.Termination)))
+        if not len(terminals):
+            self._startCells = np.argwhere(passable)
+            return
+
+        # moves are symmetric: the cells a termination state can be reached
+        # from are the ones reached searching backward from the terminations.
+        reachable = floodFill(passable, terminals) & passable
+        if start is None and not reachable.any():
+            candidates = np.argwhere(passable)
+            start = tuple(candidates[rng.randint(len(candidates))]) if len(
+                candidates) else (0, 0)
+        if start is not None and not reachable[start]:
+            logger.info("[%s] Carving a path from %s to %s",
+                        self.__class__.__name__, start, tuple(terminals[0]))
+            self._carve(start, terminals[0])
+            self._grid[start] = ord(CASE_TYPES.Open)
+            passable[self._grid == ord(CASE_TYPES.Open)] = True
+            reachable = floodFill(passable, terminals) & passable
+        self._startCells = np.argwhere(reachable)
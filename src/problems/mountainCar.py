@@ -2,7 +2,12 @@
 
 from __future__ import unicode_literals
 
+import math
+
+import numpy as np
+
 from problems.base import BaseProblem
+from problems.native import NativeProblem
 from consts import Spaces, ParamsTypes
 import utils
 
@@ -76,3 +81,52 @@ start ramping up left if receives a lower negative reward.
             reward = exceedent * 100.0 / self._env.observation_space.low[0]
             reward = int(round(reward))
         return newObservation, reward, self._done, info
+
+
+class NativeMountainCar(NativeProblem):
+    """
+    Re-implementation of Gym's MountainCar-v0 environment, simulating the car
+    without going through gym. Also supports simulating batches of cars.
+    """
+    GYM_ENVIRONMENT_NAME = 'MountainCar-v0'
+
+    MIN_POSITION = -1.2
+    MAX_POSITION = 0.6
+    MAX_SPEED = 0.07
+    GOAL_POSITION = 0.5
+
+    STATES_LOW = (MIN_POSITION, -MAX_SPEED)
+    STATES_HIGH = (MAX_POSITION, MAX_SPEED)
+
+    NB_ACTIONS = 3
+
+    ACTION_NAMES = ['left', 'neutral', 'right']
+
+    STATE_DIMENSION_NAMES = ['position', 'velocity']
+
+    def _resetMany(self, n):
+        return np.column_stack((
+            self._rng.uniform(low=-0.6, high=-0.4, size=n), np.zeros(n)))
+
+    def _stepOne(self, state, action):
+        position, velocity = state
+        velocity += (action - 1) * 0.001 + math.cos(3 * position) * (-0.0025)
+        velocity = min(max(velocity, -self.MAX_SPEED), self.MAX_SPEED)
+        position += velocity
+        position = min(max(position, self.MIN_POSITION), self.MAX_POSITION)
+        if position == self.MIN_POSITION and velocity < 0:
+            velocity = 0.0
+        return (position, velocity), -1.0, position >= self.GOAL_POSITION
+
+    def _stepMany(self, states, actions):
+        position = states[:, 0]
+        velocity = states[:, 1] + (
+            (actions - 1) * 0.001 + np.cos(3 * position) * (-0.0025))
+        velocity = np.clip(velocity, -self.MAX_SPEED, self.MAX_SPEED)
+        position = np.clip(
+            position + velocity, self.MIN_POSITION, self.MAX_POSITION)
+        velocity[(position == self.MIN_POSITION) & (velocity < 0)] = 0
+        return (
+            np.column_stack((position, velocity)),
+            np.full(len(states), -1.0),
+            position >= self.GOAL_POSITION)
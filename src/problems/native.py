@@ -0,0 +1,132 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import gym
+from gym.utils import seeding
+import numpy as np
+
+from problems.base import BaseProblem
+from consts import Spaces
+
+
+class NativeProblem(BaseProblem):
+    """
+    Base class for re-implementations of gym's classic control environments.
+    Going through gym costs several function calls, an assertion and a few
+    array allocations per step, which dominates the cost of simulating these
+    problems. Subclasses implement the dynamics twice, sharing the same
+    constants and operations so the results are the exact same as gym's:
+    * `_stepOne` on the plain floats of a single instance, for `step`,
+    * `_stepMany` on arrays of states, for `stepBatch`.
+    The random number generator is seeded the same way gym does, so a native
+    problem and its gym counterpart seeded with the same value go through the
+    exact same episodes.
+    The gym environment is only created for rendering, the state of the
+    native problem being copied in it every frame.
+    """
+    # Override: lower and upper bounds of the state space
+    STATES_LOW = ()
+    STATES_HIGH = ()
+
+    # Override: number of (discrete) actions
+    NB_ACTIONS = 0
+
+    DOMAIN = {
+        'action': Spaces.Discrete,
+        'state': Spaces.Continuous
+    }
+
+    SUPPORTS_BATCH = True
+
+    def __init__(self, **kwargs):
+        super(NativeProblem, self).__init__(**kwargs)
+        self._rng = None
+        self._state = None
+        self._batchStates = None
+        self._batchDone = None
+
+    def setup(self):
+        logger.info("[%s] Problem setup" % self.__class__.__name__)
+        self._rng, _ = seeding.np_random(self._seed)
+
+    def seed(self, seed):
+        self._seed = seed
+        self._rng, _ = seeding.np_random(seed)
+
+    def getStatesDim(self):
+        return len(self.STATES_LOW)
+
+    def getStatesBounds(self):
+        return np.array(self.STATES_LOW), np.array(self.STATES_HIGH)
+
+    def getActionsList(self):
+        return range(self.NB_ACTIONS)
+
+    def _resetMany(self, n):
+        """
+        Returns a (n x nbDims) array of initial states. Drawing the `n`
+        states at once has to consume the random number generator the same
+        way as `n` successive resets of the gym environment.
+        """
+        raise NotImplementedError()
+
+    def _stepOne(self, state, action):
+        """
+        Returns the new state (as a tuple of floats), the reward and whether
+        the instance is done after taking `action` in `state`.
+        """
+        raise NotImplementedError()
+
+    def _stepMany(self, states, actions):
+        """
+        Vectorized `_stepOne`: returns the (n x nbDims) array of new states,
+        and the arrays of rewards and done flags.
+        """
+        raise NotImplementedError()
+
+    def reset(self):
+        self._done = False
+        self._state = tuple(self._resetMany(1)[0])
+        return np.array(self._state)
+
+    def step(self, action):
+        self._state, reward, self._done = self._stepOne(self._state, action)
+        return np.array(self._state), reward, self._done, {}
+
+    def resetBatch(self, n):
+        self._batchStates = self._resetMany(n)
+        self._batchDone = np.zeros(n, dtype=bool)
+        return self._batchStates.copy()
+
+    def stepBatch(self, actions):
+        states, rewards, done = self._stepMany(
+            self._batchStates, np.asarray(actions))
+        frozen = self._batchDone
+        self._batchStates = np.where(
+            frozen[:, np.newaxis], self._batchStates, states)
+        rewards[frozen] = 0
+        self._batchDone = frozen | done
+        return self._batchStates.copy(), rewards, self._batchDone.copy()
+
+    def getState(self):
+        return self._state, self._done
+
+    def setState(self, state):
+        self._state, self._done = state
+
+    def render(self, close=False):
+        if self._env is None:
+            if close:
+                return
+            self._env = gym.make(self.GYM_ENVIRONMENT_NAME)
+        self._env.unwrapped.state = np.array(self._state)
+        return self._env.render(close=close)
+
+    def release(self):
+        if self._env is not None:
+            self._env.render(close=True)
+            self._env = None
@@ -0,0 +1,271 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import copy
+import ctypes
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+import traceback
+
+import numpy as np
+
+from problems.base import BaseProblem, ProblemException
+from consts import ParamsTypes
+
+
+def _sharedArray(ctype, shape):
+    """
+    Allocate an array in shared memory. Processes forked afterwards see the
+    exact same memory through the returned numpy view.
+    """
+    return np.frombuffer(
+        RawArray(ctype, int(np.prod(shape))), dtype=ctype).reshape(shape)
+
+
+def _runWorker(problem, first, count, seed, conn, shared):
+    """
+    Entry point of the worker processes. Each worker owns the instances
+    `first` to `first + count` of the vector, copies of the problem it was
+    forked with, and waits for commands on its end of the pipe. Results are
+    written in the shared arrays, the pipe only carrying the commands and the
+    acknowledgements. Instances are done once their problem says so, or
+    after `maxSteps` steps.
+    """
+    states, rewards, dones, actions = shared
+    problems = [copy.deepcopy(problem) for _ in xrange(count)]
+    for i, p in enumerate(problems):
+        p.seed(seed + i)
+    # number of steps of the current episode of each instance
+    nSteps = np.zeros(count, dtype=int)
+
+    while True:
+        command = conn.recv_bytes()
+        try:
+            if command == b'step':
+                for i, p in enumerate(problems, first):
+                    if dones[i]:
+                        continue
+                    states[i], rewards[i], done, _ = p.step(actions[i])
+                    nSteps[i - first] += 1
+                    dones[i] = (
+                        done or p.episodeDone(stepI=nSteps[i - first] - 1) or
+                        0 <= p.maxSteps <= nSteps[i - first])
+            elif command.startswith(b'reset'):
+                n = int(command[5:])
+                for i, p in enumerate(problems, first):
+                    if i < n:
+                        states[i] = p.reset()
+                        dones[i] = False
+                    else:
+                        dones[i] = True
+                    rewards[i] = 0
+                    nSteps[i - first] = 0
+            elif command.startswith(b'seed'):
+                seed = int(command[4:])
+                for i, p in enumerate(problems, first):
+                    p.seed(seed + i)
+            elif command == b'close':
+                for p in problems:
+                    p.release()
+                conn.send_bytes(b'ok')
+                return
+            conn.send_bytes(b'ok')
+        except Exception:
+            conn.send_bytes(b'error' + traceback.format_exc().encode('utf8'))
+
+
+class VectorProblem(BaseProblem):
+    """
+    Run `nCopies` copies of a problem in worker processes, to simulate them in
+    parallel through the batch interface (`resetBatch` / `stepBatch`).
+    States, rewards, done flags and actions are exchanged through arrays in
+    shared memory, the pipe to each worker only carrying short commands.
+    This is meant for gym environments, too slow to be simulated natively as a
+    batch: the agent evaluates them through a vector of `nCopies` copies (see
+    its `nCopies` parameter).
+    Apart from the batch interface, the vector behaves exactly like the problem
+    it wraps (`reset`, `step`, bounds...), which runs in the current process.
+    The wrapped problem is only setup if it wasn't already.
+    """
+    PARAMS = {
+        'nCopies': ParamsTypes.Number,
+        'nWorkers': ParamsTypes.Number
+    }
+
+    PARAMS_DOMAIN = {
+        'nCopies': {
+            'values': (4, 8, 16, 64),
+            'range': (1, 100000)
+        },
+        'nWorkers': {
+            'values': ('auto', 1, 2, 4, 8),
+            'range': (1, 256)
+        }
+    }
+
+    PARAMS_DEFAULT = {
+        'nCopies': 8,
+        'nWorkers': 'auto'
+    }
+
+    PARAMS_DESCRIPTION = {
+        'nCopies': "Number of copies of the problem simulated in parallel.",
+        'nWorkers': "Number of worker processes the copies are spread over. \
+'auto' uses one per core."
+    }
+
+    SUPPORTS_BATCH = True
+
+    def __init__(self, problem, **kwargs):
+        super(VectorProblem, self).__init__(**kwargs)
+        self._problem = problem
+        self.DOMAIN = problem.DOMAIN
+        self.ACTION_NAMES = problem.ACTION_NAMES
+        self.STATE_DIMENSION_NAMES = problem.STATE_DIMENSION_NAMES
+
+        self._workers = []
+        self._conns = []
+        self._states = None
+        self._rewards = None
+        self._dones = None
+        self._actions = None
+
+    @property
+    def maxSteps(self):
+        return self._problem.maxSteps
+
+    @property
+    def env(self):
+        return self._problem.env
+
+    def setup(self):
+        logger.info("[%s] Problem setup" % self.__class__.__name__)
+        self.releaseCopies()
+        if self._problem.env is None:
+            self._problem.setup()
+
+        nCopies = int(self.nCopies)
+        self._states = _sharedArray(
+            ctypes.c_double, (nCopies, self._problem.getStatesDim()))
+        self._rewards = _sharedArray(ctypes.c_double, (nCopies,))
+        self._dones = _sharedArray(ctypes.c_bool, (nCopies,))
+        self._dones[:] = True
+        self._actions = _sharedArray(ctypes.c_long, (nCopies,))
+
+        nWorkers = (multiprocessing.cpu_count() if self.nWorkers == 'auto'
+                    else int(self.nWorkers))
+        nWorkers = min(nWorkers, nCopies)
+        seed = np.random.randint(2 ** 31 - nCopies)
+        bounds = np.linspace(0, nCopies, nWorkers + 1).astype(int)
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            conn, workerConn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_runWorker,
+                args=(self._problem, first, last - first, seed + first,
+                      workerConn, (self._states, self._rewards, self._dones,
+                                   self._actions)))
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+            self._conns.append(conn)
+        logger.info("[%s] %d copies of %s over %d workers",
+                    self.__class__.__name__, nCopies,
+                    self._problem.__class__.__name__, nWorkers)
+
+    def _broadcast(self, command):
+        """
+        Send the command to all workers, then wait for all of them to be done
+        with it.
+        """
+        for conn in self._conns:
+            conn.send_bytes(command)
+        replies = [conn.recv_bytes() for conn in self._conns]
+        errors = [reply for reply in replies if reply.startswith(b'error')]
+        if errors:
+            raise ProblemException(
+                "Worker failed to execute '%s':\n%s" % (
+                    command, errors[0][5:].decode('utf8')))
+
+    def resetBatch(self, n):
+        if n > len(self._states):
+            raise ProblemException(
+                "Cannot simulate %d instances with %d copies." % (
+                    n, len(self._states)))
+        self._broadcast(b'reset%d' % n)
+        return self._states[:n].copy()
+
+    def stepBatch(self, actions):
+        n = len(actions)
+        self._actions[:n] = actions
+        self._broadcast(b'step')
+        return (self._states[:n].copy(), self._rewards[:n].copy(),
+                self._dones[:n].copy())
+
+    def seed(self, seed):
+        """
+        Seed the problem with `seed` and the copies with the following values.
+        """
+        self._problem.seed(seed)
+        if self._conns:
+            self._broadcast(b'seed%d' % (seed + 1))
+
+    def releaseCopies(self):
+        """
+        Stop the workers simulating the copies, leaving the wrapped problem
+        as is.
+        """
+        if self._conns:
+            try:
+                self._broadcast(b'close')
+            except (IOError, EOFError, ProblemException):
+                logger.warning("[%s] Workers did not close cleanly",
+                               self.__class__.__name__)
+        for worker in self._workers:
+            worker.join(1)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._conns = []
+
+    def release(self):
+        self.releaseCopies()
+        self._problem.release()
+
+    # the vector otherwise behaves like the problem it wraps
+
+    def terminate(self):
+        self._problem.terminate()
+
+    def episodeDone(self, stepI):
+        return self._problem.episodeDone(stepI=stepI)
+
+    def getStatesList(self):
+        return self._problem.getStatesList()
+
+    def getStatesDim(self):
+        return self._problem.getStatesDim()
+
+    def getStatesBounds(self):
+        return self._problem.getStatesBounds()
+
+    def getActionsList(self):
+        return self._problem.getActionsList()
+
+    def step(self, action):
+        return self._problem.step(action)
+
+    def reset(self):
+        return self._problem.reset()
+
+    def getState(self):
+        return self._problem.getState()
+
+    def setState(self, state):
+        self._problem.setState(state)
+
+    def render(self, close=False):
+        return self._problem.render(close=close)
@@ -0,0 +1,117 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import json
+import logging
+logger = logging.getLogger(__name__)
+import os
+
+from tornado.options import define, options
+
+define('maxTrainingMemory', default=2048, type=float,
+       help="Megabytes of memory a training may use, according to its "
+       "estimate. Trainings estimated to use more are rejected before being "
+       "setup. 0 disables the limit.")
+
+# Sizes of the items the algorithms allocate (see
+# `BaseAlgo.estimateFootprint`) and time of a step of each algorithm and
+# problem, as measured by `experiments/calibrate.py`.
+CALIBRATION_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'calibration.json')
+
+# loaded calibration table, see `calibration`
+_calibration = {}
+
+
+class ResourceException(Exception):
+    pass
+
+
+def calibration():
+    if not _calibration:
+        with open(CALIBRATION_PATH) as f:
+            _calibration.update(json.load(f))
+    return _calibration
+
+
+def formatBytes(nBytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if nBytes < 1024:
+            return "%.1f%s" % (nBytes, unit)
+        nBytes /= 1024.0
+    return "%.1fTB" % nBytes
+
+
+class Estimate(object):
+    """
+    Estimated resources a training needs: the memory used by its algorithm
+    and problem (`memory`, in bytes), the time of a step (`stepTime`, in
+    seconds) and the number of steps it runs at most (`nSteps`).
+    """
+    def __init__(self, memory, stepTime, nSteps, footprint):
+        super(Estimate, self).__init__()
+        self.memory = memory
+        self.stepTime = stepTime
+        self.nSteps = nSteps
+        # number of items allocated by the algorithm, by kind
+        self.footprint = footprint
+
+    @property
+    def duration(self):
+        return self.stepTime * self.nSteps
+
+    def __unicode__(self):
+        return "%s of memory, %.1fus per step, %d steps (%.0fs)" % (
+            formatBytes(self.memory), self.stepTime * 1e6, self.nSteps,
+            self.duration)
+
+
+def estimate(problem, algo, agent):
+    """
+    Estimate the resources needed by `agent` to train `algo` on `problem`,
+    from their parameters only: none of them needs to be setup.
+    """
+    table = calibration()
+    shape = problem.estimateShape()
+    footprint = algo.estimateFootprint(shape)
+    memory = shape['memory'] + sum(
+        count * table['bytes'][kind] for kind, count in footprint.iteritems())
+
+    # the algorithm only runs once per repeated action
+    stepTimes = table['stepTime']
+    stepTime = (
+        stepTimes['algorithms'].get(
+            algo.__class__.__name__, stepTimes['default']) *
+        algo.estimateStepCost(shape) / max(1, int(agent.actionRepeat)) +
+        stepTimes['problems'].get(
+            problem.__class__.__name__, stepTimes['default']))
+
+    maxSteps = float(problem.maxSteps)
+    if maxSteps < 0:
+        maxSteps = problem.PARAMS_DEFAULT['maxSteps']
+    nSteps = float(agent.nEpisodes) * maxSteps
+    return Estimate(memory, stepTime, nSteps, footprint)
+
+
+def check(problem, algo, agent):
+    """
+    Raise a `ResourceException` if training `algo` on `problem` is estimated
+    to need more memory than the `maxTrainingMemory` option allows. Returns
+    the estimate otherwise.
+    """
+    result = estimate(problem, algo, agent)
+    logger.info("[Resources] %s on %s: %s", algo.__class__.__name__,
+                problem.__class__.__name__, unicode(result))
+    limit = options.maxTrainingMemory * 1024 * 1024
+    if limit > 0 and result.memory > limit:
+        raise ResourceException(
+            "%s on %s would need about %s of memory (%s), the limit is %s. "
+            "Lower the parameters sizing the problem or the algorithm's "
+            "tables." % (
+                algo.__class__.__name__, problem.__class__.__name__,
+                formatBytes(result.memory),
+                ", ".join("%d %s" % (count, kind) for kind, count in
+                          sorted(result.footprint.iteritems())),
+                formatBytes(limit)))
+    return result
@@ -11,15 +11,32 @@ log.init()
 
 logger = logging.getLogger('server')
 
+import multiprocessing
+
+import tornado.autoreload
 import tornado.ioloop
+import tornado.options
 import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.options import define, options
+from tornado.process import fork_processes
 from tornado.web import RequestHandler, StaticFileHandler
 
 from algorithms import Algorithms
 from problems import Problems
 from inspectors import Inspectors
 from agent import Agent
-from agentTrainingHandler import AgentTrainingHandler
+from agentTrainingHandler import AgentTrainingHandler, SessionControlHandler
+from trainingWorker import WorkerPool
+import sweep
+
+define('port', default=8888, type=int, help="Port the server listens on.")
+define('processes', default=1, type=int,
+       help="Number of server processes sharing the port. 0 forks one per "
+       "core. With several processes, each one also listens on its own "
+       "port (port + 1 + index of the process), the sessions it hosts being "
+       "controlled through this port.")
 
 
 class MainHandler(tornado.web.RequestHandler):
@@ -60,7 +77,8 @@ class TemplateHandler(RequestHandler):
             agentParams=Agent.PARAMS,
             agentParamsDefault=Agent.PARAMS_DEFAULT,
             agentParamsDomain=Agent.PARAMS_DOMAIN,
-            agentParamsDescription=Agent.PARAMS_DESCRIPTION
+            agentParamsDescription=Agent.PARAMS_DESCRIPTION,
+            sweepMetrics=sorted(sweep.METRICS)
         )
 
     def get(self, file=None):
@@ -79,16 +97,53 @@ class TemplateHandler(RequestHandler):
             '%s.html' % file, active=file)
 
 
-def make_app():
+def make_app(controlPort=None, debug=True):
+    """
+    `controlPort` is the port of the server process the control channels of
+    the sessions it hosts should be opened on (see `AgentTrainingHandler`).
+    """
     return tornado.web.Application([
         (r"/", TemplateHandler),
         (r"/tool/(.*)/?", TemplateHandler),
         (r"/static/(.*)/?", StaticFileHandler, {"path": "./static/"}),
-        (r"/subscribe/train/?", AgentTrainingHandler)
-    ], template_path='./templates', debug=True)
+        (r"/subscribe/train/?", AgentTrainingHandler),
+        (r"/subscribe/control/(\w+)/?", SessionControlHandler)
+    ], template_path='./templates', debug=debug,
+        controlPort=controlPort or options.port)
+
+
+def main():
+    # logs are already set up by `log.init`
+    options.logging = None
+    tornado.options.parse_command_line()
+    nProcesses = options.processes or multiprocessing.cpu_count()
+    sockets = bind_sockets(options.port)
+    controlPort = None
+    if nProcesses > 1:
+        # the cores are shared between the server processes' worker pools
+        if not options.trainingWorkers:
+            options.trainingWorkers = max(
+                1, multiprocessing.cpu_count() // nProcesses)
+        # returns in the forked processes only
+        taskId = fork_processes(nProcesses)
+        controlPort = options.port + 1 + taskId
+    if not options.trainInProcess:
+        # the public port is bound before forking the server processes, so
+        # the workers forked from them inherit it: they close it on start.
+        WorkerPool.instance().listeningSockets.extend(sockets)
+        WorkerPool.instance().start()
+        tornado.autoreload.add_reload_hook(WorkerPool.instance().stop)
+    # autoreload doesn't support several processes
+    server = HTTPServer(make_app(controlPort, debug=nProcesses == 1))
+    server.add_sockets(sockets)
+    if controlPort is not None:
+        controlSockets = bind_sockets(controlPort)
+        # for the workers started again once one died
+        WorkerPool.instance().listeningSockets.extend(controlSockets)
+        server.add_sockets(controlSockets)
+    logger.info("Starting server - port: %d, control port: %d",
+                options.port, controlPort or options.port)
+    tornado.ioloop.IOLoop.current().start()
 
 if __name__ == "__main__":
-    app = make_app()
-    app.listen(8888)
-    logger.info("Starting server - port: 8888")
-    tornado.ioloop.IOLoop.current().start()
+    main()
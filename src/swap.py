@@ -0,0 +1,162 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import logging
+logger = logging.getLogger(__name__)
+
+import cPickle as pickle
+import os
+import random
+import time
+
+import numpy as np
+
+
+def _persistentId(objects, kept):
+    """
+    Objects that aren't pickled but referenced by name: the objects whose
+    attributes are dumped, and their attributes that are kept in memory.
+    """
+    ids = {id(obj): name for name, obj in objects.iteritems()}
+    for name, keys in kept.iteritems():
+        for key in keys:
+            ids[id(objects[name].__dict__[key])] = '%s.%s' % (name, key)
+    return lambda obj: ids.get(id(obj))
+
+
+def _persistentLoad(objects):
+    def persistentLoad(pid):
+        name, _, key = pid.partition('.')
+        return objects[name].__dict__[key] if key else objects[name]
+    return persistentLoad
+
+
+def _unpicklable(objects, obj):
+    """
+    Returns the names of the attributes of `obj` that can't be pickled.
+    """
+    names = []
+    persistentId = _persistentId(objects, {})
+    with open(os.devnull, 'wb') as devnull:
+        for key, value in obj.__dict__.iteritems():
+            pickler = pickle.Pickler(devnull, pickle.HIGHEST_PROTOCOL)
+            pickler.persistent_id = persistentId
+            try:
+                pickler.dump(value)
+            except Exception:
+                names.append(key)
+    return names
+
+
+def dump(f, objects, **extra):
+    """
+    Pickle the attributes of `objects` (a dict of objects by name) to the
+    file `f`, along with the state of the global random generators and the
+    additional values given as keyword arguments.
+    References between the objects (e.g. the algorithm's reference to the
+    problem) are kept as references, to be restored by `load`. Attributes
+    that can't be pickled are left out, references to them being kept as
+    well.
+    Returns the names of the attributes dumped, by object name.
+    """
+    attributes = {name: dict(obj.__dict__)
+                  for name, obj in objects.iteritems()}
+    state = {
+        'attributes': attributes,
+        'random': random.getstate(),
+        'numpy': np.random.get_state(),
+        'extra': extra
+    }
+    start = f.tell()
+    kept = {}
+    while True:
+        pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = _persistentId(objects, kept)
+        try:
+            pickler.dump(state)
+            break
+        except Exception:
+            if kept:
+                raise
+            f.seek(start)
+            f.truncate()
+            kept = {name: _unpicklable(objects, obj)
+                    for name, obj in objects.iteritems()}
+            logger.info("[Swap] Attributes left out: %s", kept)
+            for name, keys in kept.iteritems():
+                for key in keys:
+                    del attributes[name][key]
+    return {name: attributes[name].keys() for name in attributes}
+
+
+def load(f, objects):
+    """
+    Restore the attributes dumped by `dump` from the file `f` into
+    `objects`, and the state of the random generators. References to the
+    objects and to the attributes left out are resolved against the given
+    `objects`. Returns the additional values given to `dump`.
+    """
+    unpickler = pickle.Unpickler(f)
+    unpickler.persistent_load = _persistentLoad(objects)
+    state = unpickler.load()
+    for name, attributes in state['attributes'].iteritems():
+        objects[name].__dict__.update(attributes)
+    for obj in objects.itervalues():
+        # e.g. `BaseAlgo.restored`
+        if hasattr(obj, 'restored'):
+            obj.restored()
+    random.setstate(state['random'])
+    np.random.set_state(state['numpy'])
+    return state['extra']
+
+
+class Swap(object):
+    """
+    Attributes of a set of objects moved to a file to free the memory they
+    use, until they are restored in place by `restore`.
+    The objects themselves stay in memory, emptied, so references to them
+    remain valid. Attributes that can't be pickled stay in memory.
+    """
+    def __init__(self, path, objects):
+        super(Swap, self).__init__()
+        self.path = path
+        # name -> object whose attributes are swapped
+        self._objects = objects
+
+    def swapOut(self, **extra):
+        startT = time.time()
+        with open(self.path, 'wb') as f:
+            swapped = dump(f, self._objects, **extra)
+        for name, obj in self._objects.iteritems():
+            for key in swapped[name]:
+                del obj.__dict__[key]
+        logger.info("[Swap] Swapped out to %s (%d bytes) in %.3fs", self.path,
+                    os.path.getsize(self.path), time.time() - startT)
+
+    def restore(self):
+        """
+        Put the swapped attributes back in place and restore the state of the
+        random generators. Returns the additional values given to `swapOut`.
+        """
+        startT = time.time()
+        with open(self.path, 'rb') as f:
+            extra = load(f, self._objects)
+        self.discard()
+        logger.info("[Swap] Restored from %s in %.3fs", self.path,
+                    time.time() - startT)
+        return extra
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def swapOut(path, objects, **extra):
+    """
+    Swap the attributes of `objects` (a dict of objects by name) out to the
+    file `path`. Returns the `Swap` to restore them from.
+    """
+    swap = Swap(path, objects)
+    swap.swapOut(**extra)
+    return swap
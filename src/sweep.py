@@ -0,0 +1,463 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import itertools
+import logging
+logger = logging.getLogger(__name__)
+import math
+import multiprocessing
+import Queue
+import random
+import time
+
+import numpy as np
+from tornado.options import define, options
+
+import utils
+from agent import Agent, HEADLESS_PARAMS
+from algorithms import Algorithms
+from problems import Problems
+from consts import ParamsTypes
+from inspectors.factory import InspectorsFactory
+from inspectors.recorders import EpisodesLog, EpisodesFeed, EvaluationLog
+import resources
+
+define('sweepWorkers', default=0, type=int,
+       help="Number of processes the runs of a sweep are spread over, and "
+       "the most a sweep can ask for. 0 starts one per core.")
+define('maxSweepRuns', default=1000, type=int,
+       help="Largest number of runs a sweep can expand to.")
+
+# metrics the runs of a sweep can be ranked by, and whether higher values
+# are better:
+# * meanReturn: mean return of the last `RETURN_EPISODES` episodes
+# * evaluationReturn: mean return of the evaluation episodes (see the
+#   `nEvalEpisodes` agent parameter)
+# * nEpisodes: number of episodes the training ran, to rank how fast runs
+#   converge (see the `stopCriterion` agent parameter)
+# * duration: time the training took, in seconds
+# * stepsPerSecond: number of training steps run per second
+METRICS = {
+    'meanReturn': True,
+    'evaluationReturn': True,
+    'nEpisodes': False,
+    'duration': False,
+    'stepsPerSecond': True
+}
+RETURN_EPISODES = 100
+
+# sections of a sweep whose parameters can be swept
+SECTIONS = ('algorithm', 'problem', 'agent')
+
+# ratio between the bounds of a range above which random samples are drawn
+# on a log scale, e.g. learning rates
+LOG_SCALE_RATIO = 100
+
+# messages of the sweep workers
+STARTED = 'started'
+EPISODES = 'episodes'
+DONE = 'done'
+
+# largest number of episodes, and seconds, between two batches of episodes
+# streamed by the runs (see `seedRuns`)
+EPISODES_BATCH_SIZE = 100
+EPISODES_BATCH_PERIOD = 0.2
+
+
+class SweepException(Exception):
+    pass
+
+
+def _sectionClass(spec, section):
+    if section == 'agent':
+        return Agent
+    registry = Algorithms if section == 'algorithm' else Problems
+    name = spec.get(section, {}).get('name')
+    if name not in registry:
+        raise SweepException("Unknown %s %s, choose from: %s" % (
+            section, name, ", ".join(sorted(registry))))
+    return registry[name]
+
+
+def _checkValue(cls, param, value):
+    domain = cls.PARAMS_DOMAIN.get(param, {})
+    if value in domain.get('values', []):
+        return
+    if 'range' in domain:
+        low, high = domain['range']
+        if not isinstance(value, (int, float)) or not low <= value <= high:
+            raise SweepException(
+                "Invalid value %s for %s.%s, it should be in [%s, %s] or one "
+                "of: %s" % (value, cls.__name__, param, low, high, ", ".join(
+                    map(unicode, domain.get('values', [])))))
+    elif 'values' in domain:
+        raise SweepException("Invalid value %s for %s.%s, choose from: %s" % (
+            value, cls.__name__, param, ", ".join(
+                map(unicode, domain['values']))))
+
+
+def _isSwept(value):
+    return isinstance(value, (list, dict)) or value == 'domain'
+
+
+def _gridValues(cls, param, value):
+    """
+    Values the parameter `param` of `cls` takes in a grid sweep: the values
+    listed, `steps` values spread over a range ({'range': [low, high],
+    'steps': n, 'log': bool}), or the values of its domain ('domain').
+    """
+    if value == 'domain':
+        return list(cls.PARAMS_DOMAIN.get(param, {}).get('values', []))
+    if isinstance(value, dict):
+        low, high = value['range']
+        steps = int(value.get('steps', 5))
+        if value.get('log'):
+            return list(np.logspace(
+                math.log10(low), math.log10(high), steps))
+        return list(np.linspace(low, high, steps))
+    return value
+
+
+def _sampleValue(cls, param, value, rng):
+    """
+    Random value of the parameter `param` of `cls`: one of the values
+    listed, a value drawn over a range ({'range': [low, high], 'log':
+    bool}), or a value drawn over its domain ('domain'): over its range if
+    it is a bounded number, among its values otherwise.
+    """
+    if isinstance(value, list):
+        return rng.choice(value)
+    domain = value
+    if value == 'domain':
+        domain = cls.PARAMS_DOMAIN.get(param, {})
+        bounded = 'range' in domain and not any(
+            math.isinf(bound) for bound in domain['range'])
+        if cls.PARAMS.get(param) != ParamsTypes.Number or not bounded:
+            return rng.choice(domain.get('values', []))
+    low, high = domain['range']
+    log = domain.get('log', low > 0 and high / float(low) >= LOG_SCALE_RATIO)
+    if log:
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    return rng.uniform(low, high)
+
+
+def expand(spec):
+    """
+    Returns the list of the runs of the sweep `spec`, a dict holding:
+    * algorithm.name, problem.name: the algorithm and problem to run
+    * algorithm.params, problem.params, agent.params: the parameters of the
+      runs. Parameters given a list, a range ({'range': [low, high]} with
+      optionally 'steps' and 'log') or 'domain' (the domain the class
+      declares in `PARAMS_DOMAIN`) are swept, the others are the same for
+      all the runs. Missing parameters take their default value.
+    * mode: 'grid' (default) runs every combination of the swept values,
+      'random' runs `nSamples` combinations drawn at random.
+    * seed: seed of the random combinations, and of the first run. Run `i`
+      is seeded with `seed + i`.
+    Each run is the configuration of a training, as the fields of the
+    'train' command (see `TrainingSession._trainCommand`), along with its
+    `seed` and the values of its `swept` parameters (by 'section.param').
+    """
+    seed = int(spec.get('seed', 0))
+    fixed = {}
+    swept = []
+    for section in SECTIONS:
+        cls = _sectionClass(spec, section)
+        params = spec.get(section, {}).get('params', {})
+        fixed[section] = dict(cls.PARAMS_DEFAULT)
+        for param, value in params.iteritems():
+            if param not in cls.PARAMS:
+                raise SweepException("%s has no parameter %s" % (
+                    cls.__name__, param))
+            if _isSwept(value):
+                swept.append((section, cls, param, value))
+            else:
+                _checkValue(cls, param, value)
+                fixed[section][param] = value
+    if not swept:
+        raise SweepException("No parameter to sweep: give a list of values, "
+                             "a range or 'domain' for one of them.")
+
+    mode = spec.get('mode', 'grid')
+    if mode == 'grid':
+        values = [_gridValues(paramCls, param, value)
+                  for _, paramCls, param, value in swept]
+        nRuns = np.prod([len(v) for v in values])
+        if nRuns > options.maxSweepRuns:
+            raise SweepException(
+                "The sweep expands to %d runs, the limit is %d." % (
+                    nRuns, options.maxSweepRuns))
+        combinations = list(itertools.product(*values))
+    elif mode == 'random':
+        nSamples = int(spec.get('nSamples', 10))
+        if nSamples > options.maxSweepRuns:
+            raise SweepException("%d samples asked, the limit is %d." % (
+                nSamples, options.maxSweepRuns))
+        rng = random.Random(seed)
+        combinations = [
+            [_sampleValue(paramCls, param, value, rng)
+             for _, paramCls, param, value in swept]
+            for _ in xrange(nSamples)]
+    else:
+        raise SweepException("Unknown sweep mode %s, choose from: grid, "
+                             "random" % mode)
+
+    runs = []
+    for i, combination in enumerate(combinations):
+        run = {
+            'algorithm': {'name': spec['algorithm']['name'],
+                          'params': dict(fixed['algorithm'])},
+            'problem': {'name': spec['problem']['name'],
+                        'params': dict(fixed['problem'])},
+            'agent': {'params': dict(fixed['agent'], **HEADLESS_PARAMS)},
+            'seed': seed + i,
+            'swept': {}
+        }
+        for (section, cls, param, _), value in zip(swept, combination):
+            # numpy scalars aren't JSON serializable
+            value = value.item() if isinstance(value, np.generic) else value
+            _checkValue(cls, param, value)
+            run[section]['params'][param] = value
+            run['swept']['%s.%s' % (section, param)] = value
+        runs.append(run)
+    return runs
+
+
+def seedRuns(config, seeds):
+    """
+    Returns the runs training the configuration `config` (the fields of the
+    'train' command) once per seed of `seeds`, their episodes being streamed
+    as they run (see `Sweep`).
+    """
+    return [{
+        'algorithm': {'name': config['algorithm']['name'],
+                      'params': dict(config['algorithm'].get('params', {}))},
+        'problem': {'name': config['problem']['name'],
+                    'params': dict(config['problem'].get('params', {}))},
+        'agent': {'params': dict(config['agent'].get('params', {}),
+                                 **HEADLESS_PARAMS)},
+        'seed': seed,
+        'swept': {'seed': seed},
+        'streamEpisodes': True
+    } for seed in seeds]
+
+
+def runConfiguration(run, onEpisodes=None):
+    """
+    Train the agent of the run `run` (see `expand`) at full speed, and
+    return its `METRICS`. `onEpisodes` is given the metrics of the episodes
+    in batches as they run, if set (see `EpisodesFeed`).
+    """
+    factory = InspectorsFactory(lambda message: None)
+    episodesLog = EpisodesLog(None, None, 'episodes')
+    evaluationLog = EvaluationLog(None, 'evaluation')
+    factory.addInspector(episodesLog)
+    factory.addInspector(evaluationLog)
+    feed = None
+    if onEpisodes is not None:
+        feed = EpisodesFeed(EPISODES_BATCH_SIZE, EPISODES_BATCH_PERIOD,
+                            onEpisodes, 'feed')
+        factory.addInspector(feed)
+
+    # seeded before anything is built: algorithms and problems may draw from
+    # the generators as they are setup (e.g. random start positions).
+    utils.seed(run['seed'])
+    algo = Algorithms[run['algorithm']['name']](**run['algorithm']['params'])
+    problem = Problems[run['problem']['name']](**run['problem']['params'])
+    problem.seed(run['seed'])
+    agent = Agent(inspectorsFactory=factory, **run['agent']['params'])
+    resources.check(problem, algo, agent)
+    try:
+        agent.setup(problem, algo)
+        factory.setup(problem, algo, agent)
+        startT = time.time()
+        for _ in agent.train(yieldSteps=False):
+            pass
+        duration = time.time() - startT
+        if feed is not None:
+            feed.flush()
+        for _ in agent.evaluate():
+            pass
+    finally:
+        agent.release()
+    return {
+        'meanReturn': float(np.mean(
+            episodesLog.returns[-RETURN_EPISODES:] or [0])),
+        'evaluationReturn': evaluationLog.result['returns']['mean']
+        if evaluationLog.result else None,
+        'nEpisodes': episodesLog.nEpisodes,
+        'duration': duration,
+        'stepsPerSecond': episodesLog.nSteps / duration if duration else 0,
+        'stopReason': agent.stopReason
+    }
+
+
+def workersCount(nRuns, nWorkers=0):
+    """
+    Number of processes a sweep of `nRuns` runs is spread over: `nWorkers`
+    if given, never more than the `sweepWorkers` option (one per core by
+    default) nor than the number of runs.
+    """
+    limit = options.sweepWorkers or multiprocessing.cpu_count()
+    return max(1, min(nRuns, int(nWorkers) or limit, limit))
+
+
+def _runWorker(tasks, results):
+    """
+    Entry point of the sweep workers: run the runs of the queue `tasks`
+    until getting None, putting their metrics on the queue `results`, and
+    their episodes if they stream them.
+    """
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        index, run = task
+        results.put((STARTED, index, multiprocessing.current_process().pid))
+        onEpisodes = None
+        if run.get('streamEpisodes'):
+            def onEpisodes(episodes, index=index):
+                results.put((EPISODES, index, episodes))
+        try:
+            results.put((DONE, index, {
+                'metrics': runConfiguration(run, onEpisodes)}))
+        except Exception as e:
+            logger.exception("[Sweep] Run %d failed", index)
+            results.put((DONE, index, {'error': unicode(e)}))
+
+
+class Sweep(object):
+    """
+    Runs the configurations a sweep expands to (see `expand`) over a pool of
+    worker processes, and ranks them by `metric` (see `METRICS`) as their
+    results arrive. The runs are independent and seeded, so a sweep gives
+    the same results however many workers run it.
+    The sweep doesn't block: `poll` returns the results that arrived since
+    it was last called, so it can be polled from an IOLoop as well as in a
+    loop (see `stream`).
+    `runs` can be given instead of expanding `spec`, e.g. the runs of
+    `seedRuns`, and `onEpisodes` is then called with the index of a run
+    and a batch of its episodes as they arrive, if it streams them.
+    """
+    # seconds the workers are given to exit when the sweep stops
+    EXIT_TIMEOUT = 2
+
+    def __init__(self, spec, runs=None, onEpisodes=None):
+        super(Sweep, self).__init__()
+        self.metric = spec.get('metric', 'meanReturn')
+        if self.metric not in METRICS:
+            raise SweepException("Unknown metric %s, choose from: %s" % (
+                self.metric, ", ".join(sorted(METRICS))))
+        self.runs = runs if runs is not None else expand(spec)
+        self._onEpisodes = onEpisodes
+        # results of the runs over, by index of the run
+        self.results = {}
+        self.startT = None
+        self._processes = []
+        self._tasks = None
+        self._results = None
+        # pid of the worker each run in progress runs in, by index
+        self._running = {}
+
+    @property
+    def done(self):
+        return len(self.results) == len(self.runs)
+
+    def start(self, nWorkers=0):
+        nWorkers = workersCount(len(self.runs), nWorkers)
+        self.startT = time.time()
+        self._tasks = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        for task in enumerate(self.runs):
+            self._tasks.put(task)
+        for _ in xrange(nWorkers):
+            self._tasks.put(None)
+        for i in xrange(nWorkers):
+            # not a daemon: algorithms may start processes of their own
+            process = multiprocessing.Process(
+                target=_runWorker, args=(self._tasks, self._results),
+                name='SweepWorker-%d' % i)
+            process.start()
+            self._processes.append(process)
+        logger.info("[Sweep] Running %d runs over %d workers",
+                    len(self.runs), nWorkers)
+
+    def _result(self, index, result):
+        run = self.runs[index]
+        result = dict(result, index=index, seed=run['seed'],
+                      swept=run['swept'])
+        self.results[index] = result
+        return result
+
+    def poll(self, timeout=0):
+        """
+        Returns the results of the runs over since the last call, waiting up
+        to `timeout` seconds for one if there is none yet. Results hold the
+        `index`, `seed` and `swept` parameters of the run, and either its
+        `metrics` or the `error` it failed with.
+        """
+        results = []
+        # the state of the workers is read before their results: a worker
+        # that exited flushed its last results to the queue beforehand, so
+        # they are read below rather than its runs being reported lost.
+        exitCodes = [(p.pid, p.exitcode) for p in self._processes]
+        try:
+            while True:
+                kind, index, value = self._results.get(
+                    timeout=timeout if not results else 0)
+                if kind == STARTED:
+                    self._running[index] = value
+                elif kind == EPISODES:
+                    if self._onEpisodes is not None:
+                        self._onEpisodes(index, value)
+                else:
+                    self._running.pop(index, None)
+                    results.append(self._result(index, value))
+        except Queue.Empty:
+            pass
+        for processPid, exitCode in exitCodes:
+            if exitCode not in (None, 0):
+                for index, pid in self._running.items():
+                    if pid == processPid:
+                        del self._running[index]
+                        results.append(self._result(index, {
+                            'error': "The process of the run stopped "
+                            "unexpectedly (exit code %d)." % exitCode
+                        }))
+        if not self.done and all(
+                exitCode is not None for _, exitCode in exitCodes):
+            # all the workers died: the runs left can't run
+            for index in xrange(len(self.runs)):
+                if index not in self.results:
+                    results.append(self._result(index, {
+                        'error': "No worker left to run it."}))
+        return results
+
+    def stream(self, timeout=1):
+        """
+        Iterate over the results of the runs as they arrive.
+        """
+        while not self.done:
+            for result in self.poll(timeout):
+                yield result
+
+    def ranking(self):
+        """
+        Returns the results of the runs that succeeded, best first.
+        """
+        results = [result for result in self.results.itervalues()
+                   if result.get('metrics') and
+                   result['metrics'][self.metric] is not None]
+        return sorted(results, key=lambda r: r['metrics'][self.metric],
+                      reverse=METRICS[self.metric])
+
+    def stop(self):
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+            process.join(self.EXIT_TIMEOUT)
+        self._processes = []
+        logger.info("[Sweep] %d of %d runs done in %s", len(self.results),
+                    len(self.runs), utils.timeFormat(
+                        time.time() - (self.startT or time.time())))
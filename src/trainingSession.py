@@ -0,0 +1,827 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import os
+import tempfile
+import time
+import logging
+logger = logging.getLogger(__name__)
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.options import define, options
+
+import utils
+from algorithms import Algorithms
+from problems import Problems
+from agent import Agent, AgentException
+from inspectors.factory import InspectorsFactory
+from consts import Hooks
+import checkpoint
+import resources
+import sweep
+
+define('executionTimeSlice', default=10, type=int,
+       help="Milliseconds a training session runs for before giving control "
+       "back to the IOLoop, when it isn't delayed.")
+define('swapIdleTime', default=300, type=float,
+       help="Seconds a session stays paused or idle before its agent is "
+       "swapped out to disk. Negative values disable swapping.")
+define('swapDir', default='', type=str,
+       help="Directory the agents of idle sessions are swapped out to. "
+       "Defaults to the system's temporary directory.")
+
+# milliseconds between two checks of the results of a sweep
+SWEEP_POLL_PERIOD = 200
+# number of best runs sent along with the results of a sweep
+SWEEP_RANKING_SIZE = 10
+# milliseconds between two checks of the episodes of the other seeds of a
+# training
+SEEDS_POLL_PERIOD = 100
+
+
+def placeholder(*args):
+    pass
+
+
+class CancellationFlag(object):
+    """
+    Tells a running execution to stop. A raised flag holds the time it was
+    raised at, so the latency of the interruption can be reported.
+    Flags can live in shared memory (`values` being a `RawArray` of doubles
+    and `index` the slot of the flag) so a process can interrupt an
+    execution running in another one, without waiting for that process to
+    read its commands. The first slot of `values` is raised along with any
+    flag: executions sharing the same array check it to give control back to
+    their IOLoop early, so the interrupted execution gets to notice its flag.
+    """
+    def __init__(self, values=None, index=1):
+        super(CancellationFlag, self).__init__()
+        self._values = values if values is not None else [0.0, 0.0]
+        self._index = index
+
+    def set(self):
+        self._values[self._index] = self._values[0] = time.time()
+
+    def isSet(self):
+        return self._values[self._index] != 0
+
+    def isPending(self):
+        """
+        Returns True if any flag of `values` may be raised.
+        """
+        return self._values[0] != 0
+
+    def consume(self):
+        """
+        Lower the flag. Returns the time it was raised at, or None if it
+        wasn't.
+        """
+        raisedAt = self._values[self._index]
+        self._values[self._index] = self._values[0] = 0
+        return raisedAt or None
+
+
+class DelayedExecution(object):
+    """
+    Wraps up the code that enables to execute the agent in a delayed fashion.
+    The execution runs cooperatively in the IOLoop: undelayed steps are run
+    for as long as a time slice lasts (see the `executionTimeSlice` option),
+    then the IOLoop gets control back so the server and the other sessions
+    can run. Delayed steps are run one at a time, `stepDelay` (or
+    `renderStepDelay`) apart, and the first step of an episode comes
+    `episodeDelay` after the last step of the previous one. Delays are
+    counted from the time the previous step was due rather than from the
+    time it was done, so they don't drift with the time spent computing the
+    steps.
+    """
+    # number of steps of undelayed episodes the agent runs between two checks
+    # of the time slice, when the steps don't need to be reported one by one
+    CHUNK_STEPS = 100
+
+    def __init__(self, agent, hooks, action='train', cancelFlag=None):
+        """
+        Initialize the delayed execution on the given agent.
+        `hooks` can contain the following keys associated with callbacks:
+        * `execFinished`: called once the execution is terminated
+        * `step`: called at every step
+        * `episodeFinished`: called after each episode
+        * `interrupted`: called with the time elapsed (in seconds) between
+          the cancellation flag being raised and the execution stopping
+        The `action` parameter denotes the kind of run performed. `train` will
+        train the agent, `evaluate` will evaluate it over several episodes
+        (see `Agent.evaluate`, never delayed), `test` (or any other value)
+        will run a single test episode.
+        """
+        super(DelayedExecution, self).__init__()
+        self._agent = agent
+        self._hooks = hooks
+        self._action = action
+        self._delayed = action != 'evaluate'
+
+        self._hookExecFinished = self._hooks.get('execFinished', placeholder)
+        self._hookStep = self._hooks.get('step', placeholder)
+        self._hookEpisodeFinished = self._hooks.get(
+            'episodeFinished', placeholder)
+        self._hookInterrupted = self._hooks.get('interrupted', placeholder)
+
+        self._cancelFlag = cancelFlag or CancellationFlag()
+
+        self._currentExec = None
+
+        # handle of the next scheduled run, and IOLoop time it is due
+        self._timeout = None
+        self._deadline = None
+
+        self._interrupted = False
+        self.paused = False
+
+        # CPU time (in seconds) spent running the agent so far
+        self.cpuTime = 0
+
+        logger.info(
+            "Delayed callback setup - episodeDelay = %s - stepDelay = %s",
+            self._agent.episodeDelay, self._agent.stepDelay)
+
+    def interrupt(self):
+        self._interrupted = True
+        self._execFinished()
+
+    def checkCancelled(self):
+        """
+        Interrupt the execution if its cancellation flag is raised.
+        Returns True if it was.
+        """
+        raisedAt = self._cancelFlag.consume()
+        if raisedAt is None:
+            return False
+        self._hookInterrupted(time.time() - raisedAt)
+        self.interrupt()
+        return True
+
+    def stop(self):
+        """
+        Interrupt the execution without calling the `execFinished` hook.
+        """
+        self._interrupted = True
+        self._currentExec = None
+        self._cancel()
+
+    def pause(self):
+        """
+        Stop running the execution until `resume` is called. The agent is
+        frozen between two steps (or two chunks of steps, see `CHUNK_STEPS`).
+        """
+        self.paused = True
+        self._cancel()
+
+    def resume(self):
+        if not self.paused:
+            return
+        self.paused = False
+        if self._currentExec is not None and not self._interrupted:
+            self._deadline = None
+            self._schedule(0)
+
+    def _cancel(self):
+        if self._timeout is not None:
+            IOLoop.current().remove_timeout(self._timeout)
+            self._timeout = None
+
+    def _execFinished(self):
+        self._currentExec = None
+        self._cancel()
+        self._hookExecFinished()
+
+    def _schedule(self, delay):
+        """
+        Run the next slice `delay` ms after the previous one was due, or as
+        soon as possible if that's already late.
+        """
+        ioloop = IOLoop.current()
+        now = ioloop.time()
+        if delay > 0 and self._deadline is not None:
+            self._deadline = max(now, self._deadline + float(delay) / 1000.0)
+        else:
+            self._deadline = now
+        self._timeout = ioloop.call_at(self._deadline, self._run)
+
+    def _run(self):
+        """
+        Run the execution until the end of the time slice or the next delay.
+        """
+        self._timeout = None
+        if self._interrupted or self.paused or self._currentExec is None:
+            return
+
+        ioloop = IOLoop.current()
+        sliceEnd = ioloop.time() + float(options.executionTimeSlice) / 1000.0
+        cancelFlag = self._cancelFlag
+        try:
+            while True:
+                if cancelFlag.isPending():
+                    if self.checkCancelled():
+                        return
+                    # another execution has been interrupted, let it know
+                    return self._schedule(0)
+                accReturn, iEpisode, iStep, done = next(self._currentExec)
+                self._hookStep()
+                if done:
+                    self._hookEpisodeFinished()
+                    if self._interrupted or self._currentExec is None:
+                        return
+                    if self._delayed and self._agent.episodeDelay > 0:
+                        return self._schedule(self._agent.episodeDelay)
+                elif self._delayed and self._agent.episodeStepDelay() > 0:
+                    return self._schedule(self._agent.episodeStepDelay())
+                if ioloop.time() >= sliceEnd:
+                    return self._schedule(0)
+        except StopIteration:
+            self._execFinished()
+
+    def _accountCpu(self, execution):
+        """
+        Wraps the agent's execution iterator to measure the CPU time spent
+        in it.
+        """
+        while True:
+            startT = time.clock()
+            try:
+                item = next(execution)
+            finally:
+                self.cpuTime += time.clock() - startT
+            yield item
+
+    def run(self):
+        self._interrupted = False
+        self.paused = False
+        if self._action == 'train':
+            # only go through the steps one by one if someone is listening
+            execution = self._agent.train(
+                yieldSteps='step' in self._hooks, chunkSteps=self.CHUNK_STEPS)
+        elif self._action == 'evaluate':
+            execution = self._agent.evaluate()
+        else:
+            execution = self._agent.test()
+        self._currentExec = self._accountCpu(execution)
+        self._deadline = None
+        self._schedule(0)
+
+
+class TrainingSession(object):
+    """
+    Training session of one client: the agent the user is working on, its
+    inspectors and its current execution.
+    Once a session has been paused or idle for `swapIdleTime` seconds, the
+    state of its algorithm and problem is swapped out to disk (see `swap`)
+    to free the memory it uses, until the next command it receives.
+    The session is independent from the way it communicates with the client:
+    it receives the commands of the client as dicts through `onMessage` and
+    sends messages (dicts as well) through the `send` function given to the
+    constructor. It can thus be run either in the server process or in a
+    worker process (see `trainingWorker`).
+    """
+
+    # commands a session can execute
+    COMMANDS = ('train', 'evaluate', 'registerInspector', 'removeInspector',
+                'interrupt', 'pause', 'resume', 'sweep')
+
+    def __init__(self, send, cancelFlag=None):
+        super(TrainingSession, self).__init__()
+        self.send = send
+        # raised to interrupt the execution in progress
+        self._cancelFlag = cancelFlag or CancellationFlag()
+        # the agent the user is currently working on
+        self._agent = Agent()
+        self._trainStartT = None
+
+        self._inspectorsFactory = InspectorsFactory(self.send)
+
+        self._exec = None
+        # CPU time spent by the previous executions
+        self._cpuTime = 0
+        # sweep in progress, if any, and the callback polling its results
+        self._sweep = None
+        self._sweepPoll = None
+        # other seeds of the training in progress, if it runs over several
+        # (see `_startSeeds`), the callback polling their episodes, and the
+        # one to call once they are over
+        self._seeds = None
+        self._seedsPoll = None
+        self._afterSeeds = None
+
+        # swap the agent is swapped out to, if it is, and handle of the
+        # timeout swapping it out
+        self._swap = None
+        self._swapTimeout = None
+
+    @property
+    def cpuTime(self):
+        """
+        CPU time (in seconds) spent running the agent of this session so far.
+        """
+        return self._cpuTime + (self._exec.cpuTime if self._exec else 0)
+
+    @property
+    def idle(self):
+        return (self._exec is None or self._exec.paused) and \
+            self._sweep is None and self._seeds is None
+
+    def _setExec(self, execution):
+        if self._exec is not None:
+            self._cpuTime += self._exec.cpuTime
+        self._exec = execution
+
+    #############################################
+    # TRAIN COMMAND SUB-ROUTINES
+    #############################################
+    def _testingDone(self):
+        self._setExec(None)
+        self._scheduleSwap()
+        if not self._agent.isSetup:
+            return self.send({
+                'route': 'success',
+                'message': ("Successfull interruption, but no agent training "
+                            "was in progress.")
+            })
+
+        message = "Agent successfully trained in %s" % utils.timeFormat(
+            time.time() - (self._trainStartT or time.time()))
+        if self._agent.stopReason:
+            message += " - stopped early, %s" % self._agent.stopReason
+        self.send({
+            'route': 'success',
+            'message': message,
+            'stopReason': self._agent.stopReason
+        })
+
+    def _seedTrainingDone(self):
+        """
+        Called once the training of the agent, the first seed of a training
+        run over several seeds, is over. The agent is evaluated and tested
+        once the other seeds are over too.
+        """
+        self._inspectorsFactory.dispatch(
+            Hooks.seedProgress, seed=0, episodes=[], done=True)
+        if self._seeds is None:
+            return self._trainingDone()
+        self._afterSeeds = self._trainingDone
+
+    def _trainingDone(self):
+        # run one more episode after training with rendering enabled
+        if not self._agent.isSetup:
+            return self.send({
+                'route': 'success',
+                'message': ("Successfull interruption, but no agent training "
+                            "was in progress.")
+            })
+
+        if int(self._agent.nEvalEpisodes) > 0:
+            self._setExec(DelayedExecution(self._agent, {
+                'execFinished': self._testAgent,
+                'interrupted': self._executionInterrupted
+            }, action='evaluate', cancelFlag=self._cancelFlag))
+            return self._exec.run()
+        self._testAgent()
+
+    def _testAgent(self):
+        logger.info("Episode %d - Final test." % (self._agent.nEpisodes))
+
+        self._setExec(DelayedExecution(self._agent, {
+            'execFinished': self._testingDone,
+            'interrupted': self._executionInterrupted
+        }, action='test', cancelFlag=self._cancelFlag))
+        self._exec.run()
+
+    def _trainCommand(self, message):
+        """
+        Called when receiving the command 'train'
+        Message expects the fields.subfields:
+        * algorithm.name: name of the algorithm to use for training
+        * algorithm.params: hyperparameter settings for this algorithm
+          (param name - param value mapping)
+        * problem.name: name of the problem to solve
+        * problem.params: hyperparameters settings for this problem
+          (param name - param value mapping)
+        * agent.params: agent's execution parameters
+        * resume: id of a run to resume from its latest checkpoint. The
+          fields above are then read from the checkpoint and can be
+          omitted.
+        Sends a message on the route 'run' holding the id of the run
+        (`runId`), if it is checkpointed, and the episode it starts from.
+        Trainings run over several seeds (see the `nSeeds` agent parameter)
+        succeed once every seed is over.
+        """
+        self._trainStartT = time.time()
+        runId = checkpoint.newRunId()
+        checkpointPath = None
+        if message.get('resume'):
+            checkpointPath = checkpoint.find(message['resume'])
+            header = checkpoint.readHeader(checkpointPath)
+            runId = header['runId']
+            message = header['config']
+        config = {key: message[key]
+                  for key in ('algorithm', 'problem', 'agent')}
+
+        # create a new agent. The agent will be setup on a new problem and will
+        # solve using a new algorithm, but defined inspectors remain the same.
+        # They will be setup for the new problem and algorithm later on.
+        agent = Agent(
+            # reuse inspectors setup on previous agent.
+            inspectorsFactory=self._inspectorsFactory,
+            **message['agent']['params'])
+        # the agent's own training is the first seed of a multi-seed run. It
+        # is seeded before the algorithm and problem are built and setup, as
+        # the other seeds are (see `sweep.runConfiguration`).
+        firstSeed = checkpointPath is None and int(agent.nSeeds) > 1
+        if firstSeed:
+            utils.seed(0)
+        algo = Algorithms[message['algorithm']['name']](
+            **message['algorithm']['params'])
+        problem = Problems[message['problem']['name']](
+            **message['problem']['params'])
+        if firstSeed:
+            problem.seed(0)
+        # before anything gets allocated, and before the previous agent is
+        # released: a training too big for the server doesn't cost its
+        # previous one.
+        resources.check(problem, algo, agent)
+        if self._seeds is not None:
+            self._afterSeeds = None
+            self._stopSeeds()
+        if self._agent is not None:
+            self._agent.release()
+        self._agent = agent
+
+        self._agent.setup(problem, algo)
+        if checkpointPath is not None:
+            header = checkpoint.restore(
+                checkpointPath, self._agent.checkpointObjects())
+            self._agent.startEpisode = header['iEpisode']
+            self._restoreInspectors(header['config'].get('inspectors', []))
+            if int(self._agent.nSeeds) > 1:
+                logger.info("[TrainingSession] Resuming the first seed of "
+                            "run %s only", runId)
+                self._agent.nSeeds = 1
+        self._inspectorsFactory.setup(problem, algo, self._agent)
+
+        if (self._agent.checkpointEpisodes > 0 or
+                self._agent.checkpointInterval > 0):
+            self._agent.checkpointer = checkpoint.Checkpointer(
+                runId, lambda: dict(
+                    config,
+                    inspectors=self._inspectorsFactory.registrations()))
+        self.send({
+            'route': 'run',
+            'runId': runId if self._agent.checkpointer else None,
+            'startEpisode': self._agent.startEpisode
+        })
+
+        execFinished = self._trainingDone
+        if int(self._agent.nSeeds) > 1:
+            self._startSeeds(config)
+            execFinished = self._seedTrainingDone
+        self._setExec(DelayedExecution(self._agent, {
+            'execFinished': execFinished,
+            'interrupted': self._executionInterrupted
+        }, action='train', cancelFlag=self._cancelFlag))
+        self._exec.run()
+
+    def _restoreInspectors(self, registrations):
+        """
+        Register the inspectors of a checkpointed run that aren't registered
+        in this session.
+        """
+        registered = set(reg['uid']
+                         for reg in self._inspectorsFactory.registrations())
+        for reg in registrations:
+            if reg['uid'] not in registered:
+                self._inspectorsFactory.registerInspector(
+                    reg['name'], reg['uid'], reg['params'])
+
+    def _evaluationDone(self):
+        self._setExec(None)
+        self._scheduleSwap()
+        self.send({
+            'route': 'success',
+            'message': "Agent evaluated over %d episodes" % (
+                self._agent.nEvalEpisodes)
+        })
+
+    def _evaluateCommand(self, message):
+        """
+        Called when receiving the command 'evaluate'
+        Evaluate the agent trained last over several greedy episodes, the
+        statistics being reported to the inspectors bound to the evaluation
+        hook. Message can hold the field:
+        * nEpisodes: number of episodes to run, overriding the agent's
+          `nEvalEpisodes` parameter.
+        """
+        if not self._agent.isSetup:
+            raise AgentException("No agent to evaluate, train one first.")
+        if 'nEpisodes' in message:
+            self._agent.nEvalEpisodes = int(message['nEpisodes'])
+        if self._exec is not None:
+            self._exec.stop()
+        self._setExec(DelayedExecution(self._agent, {
+            'execFinished': self._evaluationDone,
+            'interrupted': self._executionInterrupted
+        }, action='evaluate', cancelFlag=self._cancelFlag))
+        self._exec.run()
+
+    def _executionInterrupted(self, latency):
+        logger.info("[TrainingSession] Execution interrupted in %.1fms",
+                    latency * 1000)
+        self.send({
+            'route': 'interrupted',
+            'latency': latency * 1000
+        })
+
+    def _interruptCommand(self, message):
+        """
+        Called when receiving the command 'interrupt'.
+        This interrupts the current agent training process, and sends a
+        message on the route 'interrupted' holding the time (in ms) it took
+        the execution to stop.
+        The field `flagged` can be set if the cancellation flag of the
+        session was raised already (see `interrupt`): the command then only
+        makes sure an execution waiting for its next step is interrupted.
+        If no agent training is currently in progress, this will do nothing.
+        """
+        if self._sweep is not None:
+            startT = time.time()
+            self._stopSweep()
+            self._executionInterrupted(time.time() - startT)
+        if self._seeds is not None:
+            self._stopSeeds()
+        if not message.get('flagged'):
+            self._cancelFlag.set()
+        if self._exec is not None:
+            self._exec.checkCancelled()
+        else:
+            self._cancelFlag.consume()
+
+    def interrupt(self):
+        """
+        Interrupt the execution in progress, if any.
+        """
+        self._cancelFlag.set()
+        self._interruptCommand({'flagged': True})
+
+    def _pauseCommand(self, message):
+        """
+        Called when receiving the command 'pause'
+        Freeze the execution in progress until the command 'resume' is
+        received, and send a message on the route 'paused'.
+        """
+        if self._exec is None:
+            raise AgentException("No execution in progress to pause.")
+        self._exec.pause()
+        self._agent.suspend()
+        self.send({'route': 'paused'})
+
+    def _resumeCommand(self, message):
+        """
+        Called when receiving the command 'resume'
+        Resume the execution paused by the command 'pause', and send a message
+        on the route 'resumed'.
+        """
+        if self._exec is None or not self._exec.paused:
+            raise AgentException("No paused execution to resume.")
+        self._exec.resume()
+        self.send({'route': 'resumed'})
+
+    #############################################
+    # SWEEP
+    #############################################
+    def _sweepCommand(self, message):
+        """
+        Called when receiving the command 'sweep'
+        Train many agents, one per configuration of the hyperparameters the
+        sweep expands to, in parallel over `nWorkers` processes (see
+        `sweep.workersCount`), ranking them by `metric`. Message holds
+        the fields of the sweep (see `sweep.expand`): the same fields as the
+        command 'train', the parameters to sweep being given a list of
+        values, a range or 'domain', plus `mode`, `nSamples`, `seed` and
+        `metric` (see `sweep.METRICS`).
+        Sends a message on the route 'sweepStarted' with the runs
+        (`runs`, the swept parameters of each run) and whether higher values
+        of the metric are better (`higherIsBetter`), then one on the route
+        'sweepResult' as each run ends, with its `result`, its `rank` (None
+        if it failed) and the `ranking` of the best runs so far, and finally
+        one on the route 'sweepDone' with the final `ranking`. The command
+        'interrupt' stops the sweep.
+        """
+        if self._sweep is not None:
+            raise AgentException(
+                "A sweep is already in progress, interrupt it first.")
+        self._sweep = sweep.Sweep(message)
+        self._sweep.start(message.get('nWorkers', 0))
+        self.send({
+            'route': 'sweepStarted',
+            'metric': self._sweep.metric,
+            'higherIsBetter': sweep.METRICS[self._sweep.metric],
+            'runs': [run['swept'] for run in self._sweep.runs]
+        })
+        self._sweepPoll = PeriodicCallback(self._pollSweep, SWEEP_POLL_PERIOD)
+        self._sweepPoll.start()
+
+    def _pollSweep(self):
+        results = self._sweep.poll()
+        if not results:
+            return
+        ranking = self._sweep.ranking()
+        for result in results:
+            self.send({
+                'route': 'sweepResult',
+                'result': result,
+                'rank': ranking.index(result) + 1
+                if result in ranking else None,
+                'nDone': len(self._sweep.results),
+                'nRuns': len(self._sweep.runs),
+                'ranking': ranking[:SWEEP_RANKING_SIZE]
+            })
+        if self._sweep.done:
+            done = self._sweep
+            self._stopSweep()
+            message = "Sweep of %d runs done in %s" % (
+                len(done.runs), utils.timeFormat(time.time() - done.startT))
+            if ranking:
+                message += " - best %s: %.3f with %s" % (
+                    done.metric, ranking[0]['metrics'][done.metric],
+                    ", ".join("%s=%s" % item for item in sorted(
+                        ranking[0]['swept'].iteritems())))
+            self.send({
+                'route': 'sweepDone',
+                'message': message,
+                'ranking': ranking
+            })
+
+    def _stopSweep(self):
+        self._sweepPoll.stop()
+        self._sweepPoll = None
+        self._sweep.stop()
+        self._sweep = None
+        self._scheduleSwap()
+
+    #############################################
+    # SEEDS
+    #############################################
+    def _startSeeds(self, config):
+        """
+        Train the configuration `config` over the `nSeeds - 1` other seeds
+        of the agent, in parallel worker processes, the agent's own training
+        being the first seed. Their episodes are dispatched to the
+        inspectors bound to the seedProgress hook as they arrive.
+        """
+        nSeeds = int(self._agent.nSeeds)
+        self._seeds = sweep.Sweep(
+            {}, runs=sweep.seedRuns(config, xrange(1, nSeeds)),
+            onEpisodes=self._seedEpisodes)
+        self._seeds.start(nSeeds - 1)
+        self._seedsPoll = PeriodicCallback(self._pollSeeds, SEEDS_POLL_PERIOD)
+        self._seedsPoll.start()
+
+    def _seedEpisodes(self, index, episodes):
+        self._inspectorsFactory.dispatch(
+            Hooks.seedProgress, seed=self._seeds.runs[index]['seed'],
+            episodes=episodes, done=False)
+
+    def _pollSeeds(self):
+        for result in self._seeds.poll():
+            if result.get('error'):
+                logger.warning("[TrainingSession] Seed %d failed: %s",
+                               result['seed'], result['error'])
+            self._inspectorsFactory.dispatch(
+                Hooks.seedProgress, seed=result['seed'], episodes=[],
+                done=True)
+        if self._seeds.done:
+            self._stopSeeds()
+
+    def _stopSeeds(self):
+        """
+        Stop the other seeds of the training, and carry on with the agent
+        if its training is over already.
+        """
+        self._seedsPoll.stop()
+        self._seedsPoll = None
+        seeds = self._seeds
+        self._seeds = None
+        seeds.stop()
+        # the seeds left won't run any more episodes
+        for index, run in enumerate(seeds.runs):
+            if index not in seeds.results:
+                self._inspectorsFactory.dispatch(
+                    Hooks.seedProgress, seed=run['seed'], episodes=[],
+                    done=True)
+        afterSeeds = self._afterSeeds
+        self._afterSeeds = None
+        if afterSeeds is not None:
+            afterSeeds()
+
+    #############################################
+    # SWAP
+    #############################################
+    def _scheduleSwap(self):
+        if (options.swapIdleTime < 0 or self._swap is not None or
+                self._swapTimeout is not None or not self._agent.isSetup):
+            return
+        self._swapTimeout = IOLoop.current().call_later(
+            options.swapIdleTime, self._swapOut)
+
+    def _swapOut(self):
+        self._swapTimeout = None
+        if not self.idle:
+            return
+        directory = options.swapDir or tempfile.gettempdir()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory, 'rlviz-%d-%x.swap' % (
+            os.getpid(), id(self)))
+        try:
+            self._swap = self._agent.swapOut(path)
+        except Exception:
+            logger.exception("[TrainingSession] Unable to swap out the agent")
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _swapIn(self):
+        if self._swapTimeout is not None:
+            IOLoop.current().remove_timeout(self._swapTimeout)
+            self._swapTimeout = None
+        if self._swap is not None:
+            self._agent.swapIn(self._swap)
+            self._swap = None
+
+    def _registerInspectorCommand(self, message):
+        """
+        Called when receiving the command 'registerInspector'
+        Message expects to hold the fields.subfields:
+        * name: name of the inspector to register
+        * uid: uid for this inspector - will be transmitted with each message
+          sent by the created inspector instance.
+        * params; override parameter settings for the created inspector as a
+          mapping between parameter name and value.
+          None should be required (they all have a default value but it might
+          not be suited to the problem & algorithm the agent is running).
+          See the inspector class doc for more details about these.
+        """
+        self._inspectorsFactory.registerInspector(
+            message['name'], message['uid'], message.get('params', {}))
+
+    def _removeInspectorCommand(self, message):
+        """
+        Called when receiving the command 'removeInspector'
+        Message expects to hold the fields:
+        * uid: uid for this inspector.
+        """
+        self._inspectorsFactory.removeInspector(message['uid'])
+
+    def onMessage(self, message):
+        """
+        All messages should at least hold the field 'command' plus any other
+        field required by the given command. See the corresponding command
+        function for more detail about these.
+        """
+        commands = {
+            'train': self._trainCommand,
+            'evaluate': self._evaluateCommand,
+            'registerInspector': self._registerInspectorCommand,
+            'removeInspector': self._removeInspectorCommand,
+            'interrupt': self._interruptCommand,
+            'pause': self._pauseCommand,
+            'resume': self._resumeCommand,
+            'sweep': self._sweepCommand
+        }
+
+        logger.info("[TrainingSession] Executing command: %s" % (
+            message.get('command')))
+        try:
+            self._swapIn()
+            return commands[message.get('command')](message)
+        except Exception as e:
+            logger.exception(e)
+            return self.send({
+                'route': 'error',
+                'message': str(e),
+                'command': message.get('command')
+            })
+        finally:
+            if self.idle:
+                self._scheduleSwap()
+
+    def release(self):
+        """
+        Stop the execution in progress and release the agent.
+        """
+        self._swapIn()
+        if self._sweep is not None:
+            self._stopSweep()
+        if self._exec is not None:
+            self._exec.stop()
+            self._setExec(None)
+        if self._seeds is not None:
+            self._afterSeeds = None
+            self._stopSeeds()
+        self._cancelFlag.consume()
+        self._agent.release()
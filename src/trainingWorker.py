@@ -0,0 +1,579 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import json
+import logging
+logger = logging.getLogger(__name__)
+import ctypes
+import itertools
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+import struct
+
+from tornado import gen
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.iostream import StreamClosedError
+from tornado.options import define, options
+from tornado.tcpclient import TCPClient
+
+from trainingSession import TrainingSession, CancellationFlag
+
+define('trainingWorkers', default=0, type=int,
+       help="Number of worker processes the training sessions are spread "
+       "over. 0 starts one per core, shared out between the server "
+       "processes. Negative values start none, the sessions running on the "
+       "remote workers only.")
+define('remoteWorkers', default=[], type=str, multiple=True,
+       help="Addresses (host:port) of the worker daemons the training "
+       "sessions are spread over along with the local workers (see "
+       "`workerDaemon.py`).")
+define('workerSecret', default='', type=str,
+       help="Secret the server gives the worker daemons when connecting. "
+       "Daemons reject the servers that don't know their secret, and don't "
+       "start without one.")
+
+# commands exchanged with the workers. The messages of the sessions go
+# through `SESSION_MESSAGE` commands, both ways.
+OPEN_SESSION = 'openSession'
+CLOSE_SESSION = 'closeSession'
+SESSION_MESSAGE = 'sessionMessage'
+SESSION_STATS = 'sessionStats'
+CLOSE = 'close'
+# first command exchanged with the worker daemons, both ways: the server
+# gives its secret, the daemon answers with the number of trainings it can
+# run at once
+HELLO = 'hello'
+
+# milliseconds between two reports of the CPU time used by the sessions
+STATS_PERIOD = 1000
+
+# number of sessions of a worker that get a cancellation flag in shared
+# memory. The others are interrupted through their commands only.
+MAX_FLAGGED_SESSIONS = 255
+
+# commands are exchanged with the worker daemons as frames: the length of
+# the command (4 bytes, big-endian) followed by the command in JSON
+FRAME_HEADER = struct.Struct(str('!I'))
+# size (in bytes) of the largest frame accepted
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+
+def writeFrame(stream, message):
+    data = json.dumps(message).encode('utf8')
+    stream.write(FRAME_HEADER.pack(len(data)) + data)
+
+
+@gen.coroutine
+def readFrame(stream):
+    """
+    Returns the next command read from `stream`. Raises `StreamClosedError`
+    once the stream is closed.
+    """
+    size, = FRAME_HEADER.unpack((yield stream.read_bytes(FRAME_HEADER.size)))
+    if size > MAX_FRAME_SIZE:
+        logger.error("[TrainingWorker] Frame of %d bytes from %s, closing "
+                     "the connection", size, stream.socket.getpeername())
+        stream.close()
+        raise StreamClosedError()
+    data = yield stream.read_bytes(size)
+    raise gen.Return(json.loads(data.decode('utf8')))
+
+
+def _runWorker(conn, parentConns, cancelFlags, listeningSockets):
+    """
+    Entry point of the worker processes. Workers are forked from the server
+    process: they drop the IOLoop they inherited and run a new one, hosting
+    the `TrainingSession`s the server assigns them. Trainings return to the
+    IOLoop after each time slice, so the sessions sharing a worker take turns
+    (see `DelayedExecution`).
+    `cancelFlags` holds the cancellation flags of the sessions, in shared
+    memory so the server can raise them directly.
+    """
+    # the parent's ends of the pipes must only be opened in the parent, so
+    # workers notice when the parent closes them.
+    for parentConn in parentConns:
+        parentConn.close()
+    # nor should the workers hold the ports of the server, e.g. once it died
+    for sock in listeningSockets:
+        sock.close()
+    IOLoop.clear_current()
+    ioloop = IOLoop()
+    ioloop.make_current()
+    sessions = {}
+
+    def send(message):
+        conn.send_bytes(json.dumps(message))
+
+    def sessionSend(sessionId):
+        return lambda message: send({
+            'command': SESSION_MESSAGE,
+            'session': sessionId,
+            'message': message
+        })
+
+    def sendStats():
+        if sessions:
+            send({
+                'command': SESSION_STATS,
+                'cpuTime': {sid: session.cpuTime
+                            for sid, session in sessions.iteritems()}
+            })
+
+    def onCommands(fd, events):
+        try:
+            while conn.poll():
+                message = json.loads(conn.recv_bytes())
+                command = message['command']
+                if command == SESSION_MESSAGE:
+                    if message['session'] in sessions:
+                        sessions[message['session']].onMessage(
+                            message['message'])
+                elif command == OPEN_SESSION:
+                    sessions[message['session']] = TrainingSession(
+                        sessionSend(message['session']),
+                        cancelFlag=CancellationFlag(
+                            cancelFlags, message['slot'])
+                        if message['slot'] else None)
+                elif command == CLOSE_SESSION:
+                    sendStats()
+                    sessions.pop(message['session']).release()
+                elif command == CLOSE:
+                    ioloop.stop()
+                    return
+        except (EOFError, IOError):
+            logger.warning("[TrainingWorker] Server is gone, exiting.")
+            ioloop.stop()
+
+    ioloop.add_handler(conn.fileno(), onCommands, IOLoop.READ)
+    PeriodicCallback(sendStats, STATS_PERIOD).start()
+    try:
+        ioloop.start()
+    finally:
+        for session in sessions.itervalues():
+            session.release()
+        conn.close()
+
+
+class TrainingWorker(object):
+    """
+    Handle on a worker process of the `WorkerPool`, and the sessions it
+    hosts.
+    """
+    # number of trainings the worker runs at once
+    capacity = 1
+
+    def __init__(self, pool, index):
+        super(TrainingWorker, self).__init__()
+        self.pool = pool
+        self.index = index
+        self.sessions = {}
+        self.conn = None
+        self.cancelFlags = None
+        self._process = None
+        # slots of `cancelFlags` not used by any session
+        self._freeSlots = range(MAX_FLAGGED_SESSIONS, 0, -1)
+
+    @property
+    def cpuTime(self):
+        return sum(session.cpuTime for session in self.sessions.itervalues())
+
+    def start(self):
+        self.conn, workerConn = multiprocessing.Pipe()
+        self.cancelFlags = RawArray(ctypes.c_double, MAX_FLAGGED_SESSIONS + 1)
+        # not a daemon: algorithms may start processes of their own
+        self._process = multiprocessing.Process(
+            target=_runWorker,
+            args=(workerConn, [w.conn for w in self.pool.workers if w.conn],
+                  self.cancelFlags, self.pool.listeningSockets),
+            name='TrainingWorker-%d' % self.index)
+        self._process.start()
+        workerConn.close()
+        IOLoop.current().add_handler(
+            self.conn.fileno(), self._onMessages, IOLoop.READ)
+        logger.info("[TrainingWorker] Started worker %d (pid %d)",
+                    self.index, self._process.pid)
+
+    def send(self, message):
+        self.conn.send_bytes(json.dumps(message))
+
+    def addSession(self, session):
+        session.worker = self
+        session.slot = self._freeSlots.pop() if self._freeSlots else 0
+        self.sessions[session.sessionId] = session
+        self.send({
+            'command': OPEN_SESSION,
+            'session': session.sessionId,
+            'slot': session.slot
+        })
+
+    def removeSession(self, session):
+        """
+        Returns False if the session wasn't hosted by this worker.
+        """
+        if self.sessions.pop(session.sessionId, None) is None:
+            return False
+        session.worker = None
+        if session.slot:
+            self.cancelFlags[session.slot] = 0
+            self._freeSlots.append(session.slot)
+        if self.conn is not None:
+            try:
+                self.send({
+                    'command': CLOSE_SESSION, 'session': session.sessionId})
+            except IOError:
+                pass
+        return True
+
+    def _onMessages(self, fd, events):
+        try:
+            while self.conn.poll():
+                message = json.loads(self.conn.recv_bytes())
+                if message['command'] == SESSION_MESSAGE:
+                    session = self.sessions.get(message['session'])
+                    if session is not None:
+                        session.send(message['message'])
+                elif message['command'] == SESSION_STATS:
+                    for sid, cpuTime in message['cpuTime'].iteritems():
+                        if int(sid) in self.sessions:
+                            self.sessions[int(sid)].cpuTime = cpuTime
+        except (EOFError, IOError):
+            logger.error("[TrainingWorker] Worker %d died", self.index)
+            IOLoop.current().remove_handler(fd)
+            self.conn.close()
+            self.conn = None
+            self._process.join()
+            self._process = None
+            self.pool.workerDied(self)
+
+    def stop(self):
+        if self.conn is not None:
+            IOLoop.current().remove_handler(self.conn.fileno())
+            try:
+                self.send({'command': CLOSE})
+            except IOError:
+                pass
+            self.conn.close()
+            self.conn = None
+        if self._process is not None:
+            self._process.join(self.pool.EXIT_TIMEOUT)
+            if self._process.is_alive():
+                logger.warning(
+                    "[TrainingWorker] Worker %d did not exit, terminating it",
+                    self.index)
+                self._process.terminate()
+            self._process = None
+
+
+class RemoteTrainingWorker(object):
+    """
+    Handle on a worker daemon of the `WorkerPool` (see `workerDaemon.py`),
+    reached at `address` (host:port) over TCP, and the sessions it hosts.
+    The daemon runs its sessions on a pool of workers of its own: its
+    `capacity`, reported once connected, is the number of these workers.
+    When the connection is lost, the sessions of the daemon are opened again
+    on other workers, empty, and the connection is retried every
+    `RECONNECT_DELAY` seconds.
+    """
+    RECONNECT_DELAY = 5
+    # no pipe to a local process
+    conn = None
+
+    def __init__(self, pool, index, address):
+        super(RemoteTrainingWorker, self).__init__()
+        self.pool = pool
+        self.index = index
+        self.address = address
+        host, _, port = address.rpartition(':')
+        self._host = host or 'localhost'
+        self._port = int(port)
+        self.sessions = {}
+        # interruptions go through the commands only
+        self.cancelFlags = None
+        # unknown until the daemon says hello
+        self.capacity = 0
+        self._stream = None
+        self._stopped = False
+
+    @property
+    def cpuTime(self):
+        return sum(session.cpuTime for session in self.sessions.itervalues())
+
+    @gen.coroutine
+    def start(self):
+        self._stopped = False
+        try:
+            self._stream = yield TCPClient().connect(self._host, self._port)
+        except IOError as e:
+            logger.warning("[TrainingWorker] Unable to reach worker daemon "
+                           "%s: %s", self.address, e)
+            self._reconnect()
+            return
+        self.send({'command': HELLO, 'secret': options.workerSecret})
+        try:
+            while True:
+                self._onMessage((yield readFrame(self._stream)))
+        except StreamClosedError:
+            self._disconnected()
+
+    def _reconnect(self):
+        if not self._stopped:
+            IOLoop.current().call_later(self.RECONNECT_DELAY, self.start)
+
+    def _disconnected(self):
+        self._stream = None
+        if self._stopped:
+            return
+        logger.error("[TrainingWorker] Lost worker daemon %s", self.address)
+        self.capacity = 0
+        self.pool.workerLost(self)
+        self._reconnect()
+
+    def send(self, message):
+        if self._stream is None:
+            raise IOError("Not connected to worker daemon %s" % self.address)
+        try:
+            writeFrame(self._stream, message)
+        except StreamClosedError as e:
+            raise IOError(e)
+
+    def addSession(self, session):
+        session.worker = self
+        session.slot = 0
+        self.sessions[session.sessionId] = session
+        self.send({
+            'command': OPEN_SESSION,
+            'session': session.sessionId,
+            'slot': 0
+        })
+
+    def removeSession(self, session):
+        """
+        Returns False if the session wasn't hosted by this worker.
+        """
+        if self.sessions.pop(session.sessionId, None) is None:
+            return False
+        session.worker = None
+        try:
+            self.send({'command': CLOSE_SESSION, 'session': session.sessionId})
+        except IOError:
+            pass
+        return True
+
+    def _onMessage(self, message):
+        if message['command'] == SESSION_MESSAGE:
+            session = self.sessions.get(message['session'])
+            if session is not None:
+                session.send(message['message'])
+        elif message['command'] == SESSION_STATS:
+            for sid, cpuTime in message['cpuTime'].iteritems():
+                if int(sid) in self.sessions:
+                    self.sessions[int(sid)].cpuTime = cpuTime
+        elif message['command'] == HELLO:
+            self.capacity = message['capacity']
+            logger.info("[TrainingWorker] Connected to worker daemon %s "
+                        "(%d workers)", self.address, self.capacity)
+            self.pool.workerAvailable(self)
+
+    def stop(self):
+        self._stopped = True
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+class RemoteSession(object):
+    """
+    A `TrainingSession` hosted by a worker of the `WorkerPool`, so the
+    training doesn't block the server however fast it goes.
+    This is a drop-in replacement for the session itself: commands received
+    through `onMessage` are forwarded to the worker, and the messages the
+    session sends (e.g. by its inspectors) come back from the worker and are
+    given to `send`, in the IOLoop of the server.
+    """
+    def __init__(self, pool, sessionId, send):
+        super(RemoteSession, self).__init__()
+        self.pool = pool
+        self.sessionId = sessionId
+        self.send = send
+        self.worker = None
+        # slot of the session's cancellation flag in the worker's flags, 0 if
+        # it has none
+        self.slot = 0
+        # CPU time used by the session, as last reported by its worker
+        self.cpuTime = 0
+
+    def start(self):
+        self.pool.openSession(self)
+
+    def onMessage(self, message):
+        if self.worker is None:
+            self.pool.openSession(self)
+        if self.worker is None:
+            return self.send({
+                'route': 'error',
+                'message': "No training worker is available, try again "
+                "later.",
+                'command': message.get('command')
+            })
+        self.worker.send({
+            'command': SESSION_MESSAGE,
+            'session': self.sessionId,
+            'message': message
+        })
+
+    def interrupt(self):
+        """
+        Interrupt the execution in progress, if any. The cancellation flag of
+        the session is raised right away, the worker's execution noticing it
+        even if the worker is busy with other sessions.
+        """
+        if self.slot and self.worker is not None:
+            CancellationFlag(self.worker.cancelFlags, self.slot).set()
+        self.onMessage({'command': 'interrupt', 'flagged': bool(self.slot)})
+
+    def release(self):
+        self.pool.closeSession(self)
+
+
+class WorkerPool(object):
+    """
+    Pool of worker processes the training sessions run in. Workers are forked
+    when the server starts, with the algorithms, problems, gym and numpy
+    already imported, so opening a session only costs a message.
+    The pool also spreads the sessions over the worker daemons of the
+    `remoteWorkers` option, possibly on other hosts.
+    A new session goes to the worker hosting the fewest sessions for its
+    capacity, the one whose sessions used the least CPU time in case of a
+    tie. With more sessions than workers, sessions sharing a worker take
+    turns, one time slice each.
+    """
+    # seconds the workers are given to exit when the pool stops
+    EXIT_TIMEOUT = 2
+
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(
+                max(0, options.trainingWorkers or multiprocessing.cpu_count()),
+                options.remoteWorkers)
+        return cls._instance
+
+    def __init__(self, nWorkers, remoteAddresses=()):
+        super(WorkerPool, self).__init__()
+        self.workers = []
+        self._nWorkers = nWorkers
+        self._remoteAddresses = remoteAddresses
+        self._sessionIds = itertools.count()
+        # called when the capacity of the pool changes
+        self.capacityListeners = []
+        # sockets the server process listens on: the workers close their
+        # copies (see `_runWorker`)
+        self.listeningSockets = []
+
+    def start(self):
+        """
+        Fork the workers. The sockets the server listens on already, if
+        any, should be added to `listeningSockets` first so the workers close
+        them. Workers started again once they died close the ones added
+        since.
+        """
+        for i in xrange(self._nWorkers):
+            worker = TrainingWorker(self, i)
+            self.workers.append(worker)
+            worker.start()
+        for address in self._remoteAddresses:
+            worker = RemoteTrainingWorker(self, len(self.workers), address)
+            self.workers.append(worker)
+            worker.start()
+
+    def capacity(self):
+        """
+        Number of trainings the workers of the pool run at once.
+        """
+        if not self.workers:
+            return self._nWorkers
+        return sum(worker.capacity for worker in self.workers)
+
+    def session(self, send):
+        """
+        Returns a new `RemoteSession` sending its messages with `send`.
+        """
+        return RemoteSession(self, next(self._sessionIds), send)
+
+    def openSession(self, session):
+        if not self.workers:
+            self.start()
+        workers = [w for w in self.workers if w.capacity > 0]
+        if not workers:
+            logger.warning("[WorkerPool] No worker available for session %d",
+                           session.sessionId)
+            return
+        worker = min(workers, key=lambda w: (
+            len(w.sessions) / float(w.capacity), w.cpuTime))
+        worker.addSession(session)
+        logger.info("[WorkerPool] Session %d opened on worker %d "
+                    "(%d sessions)", session.sessionId, worker.index,
+                    len(worker.sessions))
+
+    def closeSession(self, session):
+        worker = session.worker
+        if worker is None or not worker.removeSession(session):
+            return
+        logger.info("[WorkerPool] Session %d closed, %.2fs of CPU time used",
+                    session.sessionId, session.cpuTime)
+
+    def workerDied(self, worker):
+        """
+        Replace a worker that died, and let its sessions know they were lost.
+        They are opened again on the new worker, empty.
+        """
+        worker.start()
+        for session in worker.sessions.itervalues():
+            worker.send({
+                'command': OPEN_SESSION,
+                'session': session.sessionId,
+                'slot': session.slot
+            })
+            session.cpuTime = 0
+            session.send({
+                'route': 'error',
+                'message': "The training process stopped unexpectedly."
+            })
+
+    def workerAvailable(self, worker):
+        for listener in self.capacityListeners:
+            listener()
+
+    def workerLost(self, worker):
+        """
+        Open the sessions of a worker daemon that was lost on the other
+        workers, and let them know they were lost.
+        """
+        sessions = worker.sessions.values()
+        worker.sessions = {}
+        for session in sessions:
+            session.worker = None
+            session.cpuTime = 0
+            self.openSession(session)
+            session.send({
+                'route': 'error',
+                'message': "The training worker was lost."
+            })
+        for listener in self.capacityListeners:
+            listener()
+
+    def stats(self):
+        """
+        Returns the CPU time used by each session, by worker.
+        """
+        return [{sid: session.cpuTime
+                 for sid, session in worker.sessions.iteritems()}
+                for worker in self.workers]
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
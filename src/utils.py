@@ -4,6 +4,9 @@ from __future__ import unicode_literals
 
 import time
 import math
+import random
+
+import numpy as np
 
 
 def extends(dico, **kwargs):
@@ -89,6 +92,16 @@ def enum(*args, **kwargs):
     return type(str('Enum'), (), enums)
 
 
+def seed(value):
+    """
+    Seed the global random number generators (python's and numpy's) so that
+    a run can be reproduced, e.g. in a worker process that would otherwise
+    inherit the generators state of its parent.
+    """
+    random.seed(value)
+    np.random.seed(value % 2 ** 32)
+
+
 def makeMapping(classes):
     """
     Create a mapping between class name and actual classes.
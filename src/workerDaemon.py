@@ -0,0 +1,166 @@
+# -*- coding: utf8 -*-
+
+from __future__ import unicode_literals
+
+import hmac
+import logging
+import sys
+
+import log
+
+import gym  # import gym before initializing the logs
+log.init()
+
+logger = logging.getLogger('workerDaemon')
+
+import tornado.ioloop
+import tornado.options
+from tornado import gen
+from tornado.ioloop import PeriodicCallback
+from tornado.iostream import StreamClosedError
+from tornado.netutil import bind_sockets
+from tornado.options import define, options
+from tornado.tcpserver import TCPServer
+
+from trainingWorker import WorkerPool, readFrame, writeFrame, \
+    OPEN_SESSION, CLOSE_SESSION, SESSION_MESSAGE, SESSION_STATS, HELLO, \
+    STATS_PERIOD
+
+define('workerAddress', default='localhost', type=str,
+       help="Address the worker daemon listens on. Listen on the address "
+       "of a private network interface to accept servers running on other "
+       "hosts: the daemon runs the pickled trainings they send.")
+define('workerPort', default=8800, type=int,
+       help="Port the worker daemon listens on.")
+
+
+class WorkerConnection(object):
+    """
+    Connection of a server to the worker daemon. The server opens training
+    sessions on the daemon and gives them their commands (e.g. 'train',
+    with the algorithm, problem and agent to train), the messages of the
+    sessions (e.g. sent by their inspectors) being streamed back to it. See
+    `RemoteTrainingWorker` for the other end of the connection.
+    The sessions run on the daemon's `WorkerPool`, and are released when
+    the server disconnects.
+    """
+    def __init__(self, stream, address):
+        super(WorkerConnection, self).__init__()
+        self._stream = stream
+        self._address = address
+        self._sessions = {}
+
+    def send(self, message):
+        try:
+            writeFrame(self._stream, message)
+        except StreamClosedError:
+            logger.warning("[WorkerDaemon] Dropping message to closed "
+                           "connection %s: %s", self._address,
+                           message.get('command'))
+
+    def _sessionSend(self, sessionId):
+        return lambda message: self.send({
+            'command': SESSION_MESSAGE,
+            'session': sessionId,
+            'message': message
+        })
+
+    def _sendStats(self):
+        if self._sessions:
+            self.send({
+                'command': SESSION_STATS,
+                'cpuTime': {sid: session.cpuTime
+                            for sid, session in self._sessions.iteritems()}
+            })
+
+    @gen.coroutine
+    def serve(self):
+        hello = yield readFrame(self._stream)
+        if hello.get('command') != HELLO or not hmac.compare_digest(
+                hello.get('secret', '').encode('utf8'),
+                options.workerSecret.encode('utf8')):
+            logger.warning("[WorkerDaemon] Rejecting connection from %s: "
+                           "wrong secret", self._address)
+            self._stream.close()
+            return
+        pool = WorkerPool.instance()
+        self.send({'command': HELLO, 'capacity': pool.capacity()})
+        logger.info("[WorkerDaemon] Server connected from %s", self._address)
+
+        stats = PeriodicCallback(self._sendStats, STATS_PERIOD)
+        stats.start()
+        try:
+            while True:
+                self._onMessage(pool, (yield readFrame(self._stream)))
+        except StreamClosedError:
+            logger.info("[WorkerDaemon] Server disconnected from %s",
+                        self._address)
+        finally:
+            stats.stop()
+            for session in self._sessions.itervalues():
+                session.release()
+            self._sessions = {}
+
+    def _onMessage(self, pool, message):
+        command = message['command']
+        if command == SESSION_MESSAGE:
+            session = self._sessions.get(message['session'])
+            if session is None:
+                return
+            # interruptions go through the flags of the daemon's workers
+            if message['message'].get('command') == 'interrupt':
+                session.interrupt()
+            else:
+                session.onMessage(message['message'])
+        elif command == OPEN_SESSION:
+            session = pool.session(self._sessionSend(message['session']))
+            session.start()
+            self._sessions[message['session']] = session
+        elif command == CLOSE_SESSION:
+            self._sendStats()
+            session = self._sessions.pop(message['session'], None)
+            if session is not None:
+                session.release()
+
+
+class WorkerServer(TCPServer):
+    @gen.coroutine
+    def handle_stream(self, stream, address):
+        try:
+            yield WorkerConnection(stream, '%s:%d' % address[:2]).serve()
+        except StreamClosedError:
+            pass
+
+
+def main():
+    """
+    Run a worker daemon: the training sessions of the servers connecting to
+    it (see the `remoteWorkers` option of the server) run on its own pool of
+    `trainingWorkers` worker processes.
+    The daemon refuses to start without a `workerSecret`: any process that
+    can connect to it could run code on the host otherwise.
+    """
+    # logs are already set up by `log.init`
+    options.logging = None
+    tornado.options.parse_command_line()
+    if not options.workerSecret:
+        logger.error("A worker daemon needs a --workerSecret, shared with "
+                     "the servers connecting to it.")
+        sys.exit(1)
+    # fork the workers before listening, so they don't hold the port
+    WorkerPool.instance().start()
+    server = WorkerServer()
+    sockets = bind_sockets(options.workerPort, options.workerAddress)
+    # for the workers started again once one died
+    WorkerPool.instance().listeningSockets.extend(sockets)
+    server.add_sockets(sockets)
+    logger.info("Starting worker daemon - %s:%d, %d workers",
+                options.workerAddress, options.workerPort,
+                WorkerPool.instance().capacity())
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    finally:
+        WorkerPool.instance().stop()
+
+if __name__ == "__main__":
+    main()
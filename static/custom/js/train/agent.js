@@ -11,6 +11,12 @@ function Agent($inspectorsPanel, callbacks) {
     self._errorCb = (callbacks || {}).error;
     self._successCb = (callbacks || {}).success;
     self._disconnectCb = (callbacks || {}).disconnect;
+    self._pausedCb = (callbacks || {}).paused;
+    self._resumedCb = (callbacks || {}).resumed;
+    self._runCb = (callbacks || {}).run;
+    self._sweepStartedCb = (callbacks || {}).sweepStarted;
+    self._sweepResultCb = (callbacks || {}).sweepResult;
+    self._sweepDoneCb = (callbacks || {}).sweepDone;
 
     // stores all user-defined data for problem, algo and agent
     // required to re-create the whole env upon disconnect
@@ -26,18 +32,30 @@ function Agent($inspectorsPanel, callbacks) {
     self._inspectorParams = {};
     self._inspectorsManager = new InspectorsManager($inspectorsPanel, self);
     self._connection = null;
+    // control channel of the session, for commands that shouldn't wait
+    // behind the others (e.g. interrupt)
+    self._control = null;
+    // time the last interrupt command was sent at
+    self._interruptT = null;
+    // id of the training run in progress, if it is checkpointed, so it can
+    // be resumed upon reconnect
+    self._runId = null;
 
     self.initialize = function () {
         WSConnect(
-            'ws://localhost:8888/subscribe/train',
+            'ws://' + window.location.host + '/subscribe/train',
             self._onOpen, self._onMessage, self._onClose);
     }
 
     self._onOpen = function (connection) {
         if (self._connection != null) {
             alerts.hide();
-            alerts.success("Sucessfully reconnected! Inspectors will be re-created server-side, but any on-going training process will have to be restarted.")
+            if (self._runId != null)
+                alerts.success("Sucessfully reconnected! Inspectors will be re-created server-side, and the training will resume from its last checkpoint.")
+            else
+                alerts.success("Sucessfully reconnected! Inspectors will be re-created server-side, but any on-going training process will have to be restarted.")
         }
+        var reconnected = self._connection != null;
         self._connection = connection;
         console.log("Connection opened");
         var progressInspectorAdded = false;
@@ -52,6 +70,8 @@ function Agent($inspectorsPanel, callbacks) {
         }
         if (!progressInspectorAdded)
             self._inspectorsManager.addInspector('ProgressInspector', {frequency: 1000});
+        if (reconnected && self._runId != null)
+            self._connection.send({'command': 'train', 'resume': self._runId});
     }
 
     self._onClose = function () {
@@ -63,7 +83,17 @@ function Agent($inspectorsPanel, callbacks) {
         routes = {
             'inspect': self._inspectorsManager.dispatch,
             'error': self._errorCb,
-            'success': self._successCb
+            'success': self._onSuccess,
+            'run': self._onRun,
+            'queued': self._onQueued,
+            'jobStarted': self._onJobStarted,
+            'session': self._onSession,
+            'interrupted': self._onInterrupted,
+            'paused': self._pausedCb,
+            'resumed': self._resumedCb,
+            'sweepStarted': self._sweepStartedCb,
+            'sweepResult': self._sweepResultCb,
+            'sweepDone': self._sweepDoneCb
         }
         if (message.route && routes[message.route])
             return routes[message.route](message);
@@ -71,6 +101,51 @@ function Agent($inspectorsPanel, callbacks) {
         console.error("Route " + message.route + " not found.", message);
     }
 
+    self._onSuccess = function (message) {
+        self._runId = null;
+        self._successCb(message);
+    }
+
+    self._onRun = function (message) {
+        self._runId = message.runId;
+        if (message.startEpisode > 0)
+            alerts.info("Training resumed from episode " + message.startEpisode, 3000);
+        if (self._runCb)
+            self._runCb(message);
+    }
+
+    // the training waits for others to finish server-side
+    self._onQueued = function (message) {
+        alerts.info("Training queued: position " + message.position + " of " +
+                    message.queueLength, 3000);
+    }
+
+    self._onJobStarted = function (message) {
+        alerts.info("Training started after waiting " +
+                    message.waited.toFixed(1) + "s", 3000);
+    }
+
+    // open the control channel of the new session, closing the one of the
+    // previous session if any. The control channel goes to the port of the
+    // server process hosting the session.
+    self._onSession = function (message) {
+        if (self._control != null)
+            self._control.close();
+        self._control = WSConnect(
+            'ws://' + window.location.hostname + ':' + message.port +
+            '/subscribe/control/' + message.token,
+            function () {}, self._onMessage);
+    }
+
+    self._onInterrupted = function (message) {
+        var roundTrip = self._interruptT ? new Date() - self._interruptT : null;
+        console.log("Interrupted in " + message.latency.toFixed(1) +
+                    "ms server-side, " + roundTrip + "ms round trip");
+        alerts.info("Training interrupted in " + message.latency.toFixed(1) +
+                    "ms (" + roundTrip + "ms round trip)", 3000);
+        self._interruptT = null;
+    }
+
     // Protect the given function `fn` by making sure a connection will be available
     // before executing the call.
     // This means that the call may be delayed until the connection is available
@@ -127,11 +202,45 @@ function Agent($inspectorsPanel, callbacks) {
         self._connection.send(command);
     });
 
+    // train one agent per combination of the parameters given several values
+    // (as arrays), server-side, the runs being ranked by `metric`
+    self.sweep = self._waitForConnect(function (problemName, problemParams, algoName, algoParams, agentParams, metric) {
+        var command = {
+            'command': 'sweep',
+            'algorithm': {
+                'name': algoName,
+                'params': algoParams
+            },
+            'problem': {
+                'name': problemName,
+                'params': problemParams
+            },
+            'agent': {
+                'params': agentParams
+            },
+            'metric': metric
+        };
+        console.log("Command: ", command);
+        self._connection.send(command);
+    });
+
     self.interrupt = self._waitForConnect(function() {
         var command = {
             'command': 'interrupt'
         }
-        self._connection.send(command);
+        self._interruptT = new Date();
+        if (self._control != null && self._control.isReady())
+            self._control.send(command);
+        else
+            self._connection.send(command);
+    })
+
+    self.pause = self._waitForConnect(function() {
+        self._connection.send({'command': 'pause'});
+    })
+
+    self.resume = self._waitForConnect(function() {
+        self._connection.send({'command': 'resume'});
     })
 
     self.registerInspector = self._waitForConnect(function (name, uid, params) {
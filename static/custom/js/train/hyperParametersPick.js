@@ -12,6 +12,8 @@ API:
   are hyperparameter names and values are user-defined values (or the default
   ones if these haven't been touched)
 * `getProblemParams()`: same as `getAlgoParams()`, for the last rendered problem
+* `setSweepMode(enabled)`: let several values be picked for each parameter, to
+  sweep them. Parameters picked several values are then returned as arrays.
 */
 function HyperParametersPick($container) {
     var self = this;
@@ -26,13 +28,17 @@ function HyperParametersPick($container) {
 
     self._currentAlgo = null;
     self._currentProblem = null;
+    // whether several values can be picked for each parameter
+    self._multiple = false;
 
     // param name -> param picker instance
     self._problemParamPickers = {}
     self._algoParamPickers = {}
     self._agentParamPickers = {}
 
-    self._renderPickers = function (paramsTypes, paramsDomain, paramsDefault, paramsDescription, $form) {
+    // `values` are the values picked previously, if any, that the pickers
+    // start from rather than the default values
+    self._renderPickers = function (paramsTypes, paramsDomain, paramsDefault, paramsDescription, $form, values) {
         var params = Object.keys(paramsTypes);
         var store = {}
         for (var i = 0; i < params.length; i++) {
@@ -42,8 +48,10 @@ function HyperParametersPick($container) {
                 param,
                 paramsTypes[param],
                 paramsDomain[param],
-                paramsDefault[param],
-                paramsDescription[param]);
+                values && param in values ? values[param] : paramsDefault[param],
+                paramsDescription[param],
+                undefined,
+                self._multiple);
         }
         return store;
     }
@@ -57,7 +65,7 @@ function HyperParametersPick($container) {
         return values;
     }
 
-    self.renderAlgoPick = function (algo) {
+    self.renderAlgoPick = function (algo, values) {
         self._currentAlgo = algo;
 
         self._$algoForm.html('<legend>Tune parameters for ' + algo + '</legend>')
@@ -67,10 +75,10 @@ function HyperParametersPick($container) {
             window.STATIC_DATA.algorithmsParamsDomain[algo],
             window.STATIC_DATA.algorithmsParamsDefault[algo],
             window.STATIC_DATA.algorithmsParamsDescription[algo],
-            self._$algoForm);
+            self._$algoForm, values);
     }
 
-    self.renderProblemPick = function (problem) {
+    self.renderProblemPick = function (problem, values) {
         self._currentProblem = problem;
 
         self._$problemForm.html('<legend>Tune parameters for ' + problem + '</legend>')
@@ -80,10 +88,10 @@ function HyperParametersPick($container) {
             window.STATIC_DATA.problemsParamsDomain[problem],
             window.STATIC_DATA.problemsParamsDefault[problem],
             window.STATIC_DATA.problemsParamsDescription[problem],
-            self._$problemForm);
+            self._$problemForm, values);
     }
 
-    self.renderAgentPick = function () {
+    self.renderAgentPick = function (values) {
         self._$agentForm.html('<legend>Tune parameters for agent</legend>')
 
         self._agentParamPickers = self._renderPickers(  // reset - GC should unload all
@@ -91,7 +99,7 @@ function HyperParametersPick($container) {
             window.STATIC_DATA.agentParamsDomain,
             window.STATIC_DATA.agentParamsDefault,
             window.STATIC_DATA.agentParamsDescription,
-            self._$agentForm);
+            self._$agentForm, values);
     }
 
     self.getAlgoParams = function () {
@@ -105,11 +113,29 @@ function HyperParametersPick($container) {
     self.getAgentParams = function () {
         return self._getValues(self._agentParamPickers);
     }
+
+    // render the pickers again, keeping the values picked (only the first
+    // one of each parameter when leaving the sweep mode)
+    self.setSweepMode = function (enabled) {
+        var algoParams = self.getAlgoParams();
+        var problemParams = self.getProblemParams();
+        var agentParams = self.getAgentParams();
+        self._multiple = enabled;
+        self.renderProblemPick(self._currentProblem, problemParams);
+        self.renderAlgoPick(self._currentAlgo, algoParams);
+        self.renderAgentPick(agentParams);
+    }
 }
 
-function ParamPicker($appendTo, id, type, domain, defaultVal, description, widthCssClass) {
+// `defaultVal` can be an array of values if `multiple` is set, in which case
+// several values can be picked.
+function ParamPicker($appendTo, id, type, domain, defaultVal, description, widthCssClass, multiple) {
     var self = this;
 
+    var items = [].concat(defaultVal);
+    if (!multiple)
+        items = items.slice(0, 1);
+
     domain = {
         values: domain.values || [],
         range: domain.range || []
@@ -133,10 +159,11 @@ function ParamPicker($appendTo, id, type, domain, defaultVal, description, width
             '</select>' +
             '</div>').appendTo($appendTo);
         self._$container.find('select').selectize({
-            options: domain.values.concat([defaultVal]).map(function (val) {
+            options: domain.values.concat(items).map(function (val) {
                 return {value: val, text: val};
             }),
-            items: [defaultVal],
+            items: items,
+            maxItems: multiple ? null : 1,
             onOptionAdd: function (value, data) {
                 if (type == 'String')
                     return;
@@ -161,8 +188,7 @@ function ParamPicker($appendTo, id, type, domain, defaultVal, description, width
         self._$container.find('input').css('width', '0px');
     }
 
-    self.getValue = function () {
-        var value = self._selectize.getValue()
+    self._parse = function (value) {
         if (type == 'Number' && domain.values.indexOf(value) == -1)
             return parseFloat(value)
         if (type == 'Boolean' && ['1', 1, '0', 0].indexOf(value) >= 0)
@@ -170,5 +196,14 @@ function ParamPicker($appendTo, id, type, domain, defaultVal, description, width
         return value;
     }
 
+    // returns an array if several values are picked
+    self.getValue = function () {
+        var value = self._selectize.getValue()
+        if (!multiple)
+            return self._parse(value);
+        var values = [].concat(value).map(self._parse);
+        return values.length == 1 ? values[0] : values;
+    }
+
     self.initialize();
 }
\ No newline at end of file
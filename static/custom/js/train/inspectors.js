@@ -15,7 +15,8 @@ function InspectorsManager($container, agent) {
     self._inspectorWidgets = {
         'ProgressInspector': ProgressWidget,
         'ValueFunctionInspector': ValueFunctionWidget,
-        'EfficiencyInspector': EfficiencyWidget
+        'EfficiencyInspector': EfficiencyWidget,
+        'EvaluationInspector': EvaluationWidget
     }
 
     // uid -> Inspector instance
@@ -561,6 +562,35 @@ function ValueFunctionWidget($container, params) {
     }
 }
 
+// fills the area between a dataset and the dataset of index `fillBetween`
+// with its `fillColor`, to draw bands: Chart.js 2.4 can only fill datasets
+// down to the axis
+Chart.plugins.register({
+    beforeDatasetsDraw: function (chart) {
+        var ctx = chart.chart.ctx;
+        chart.data.datasets.forEach(function (dataset, i) {
+            if (dataset.fillBetween === undefined || !chart.isDatasetVisible(i) ||
+                    !chart.isDatasetVisible(dataset.fillBetween))
+                return;
+            var upper = chart.getDatasetMeta(i).data;
+            var lower = chart.getDatasetMeta(dataset.fillBetween).data;
+            if (!upper.length || upper.length != lower.length)
+                return;
+            ctx.save();
+            ctx.fillStyle = dataset.fillColor;
+            ctx.beginPath();
+            ctx.moveTo(upper[0]._model.x, upper[0]._model.y);
+            for (var j = 1; j < upper.length; j++)
+                ctx.lineTo(upper[j]._model.x, upper[j]._model.y);
+            for (var j = lower.length - 1; j >= 0; j--)
+                ctx.lineTo(lower[j]._model.x, lower[j]._model.y);
+            ctx.closePath();
+            ctx.fill();
+            ctx.restore();
+        });
+    }
+});
+
 function EfficiencyWidget($container, params) {
     var self = this;
 
@@ -597,6 +627,7 @@ function EfficiencyWidget($container, params) {
 
     self._setup = function () {
         self._nbRuns = 0;
+        self._runDatasets = null;
         self._$widget.html(
             '<div class="panel panel-default">' +
             '   <div class="panel-heading">' +
@@ -641,16 +672,52 @@ function EfficiencyWidget($container, params) {
     self._setup();
 
 
-    self._addDataset = function () {
-        self._graph2d.data.datasets.push({
-            label: self._params.metric + ' per episode (run ' + (self._nbRuns + 1) + ')' ,
+    // datasets of the current run: its mean, and the bounds of its band if
+    // it runs over several seeds
+    self._runDatasets = null;
+
+    self._addDataset = function (label, color, options) {
+        self._graph2d.data.datasets.push($.extend({
+            label: label,
             data: [],
-            borderColor: self._runColors[self._nbRuns],
-            pointColor: self._runColors[self._nbRuns],
+            borderColor: color,
+            pointColor: color,
             borderWidth: 1,
             pointBorderWidth: 1,
-            pointRadius: 1
+            pointRadius: 1,
+            fill: false
+        }, options));
+        return self._graph2d.data.datasets[self._graph2d.data.datasets.length - 1];
+    }
+
+    self._transparent = function (color, alpha) {
+        var rgb = [1, 3, 5].map(function (i) {
+            return parseInt(color.substr(i, 2), 16);
         });
+        return 'rgba(' + rgb.join(', ') + ', ' + alpha + ')';
+    }
+
+    // add the datasets of a new run, with a band between the 5th and 95th
+    // percentiles of its seeds if `nSeeds` is given
+    self._addRun = function (nSeeds) {
+        var color = self._runColors[self._nbRuns % self._runColors.length];
+        var label = self._params.metric + ' per episode (run ' + (self._nbRuns + 1);
+        self._runDatasets = {};
+        if (nSeeds) {
+            var bound = {
+                borderColor: self._transparent(color, 0.3),
+                pointRadius: 0,
+                pointBorderWidth: 0
+            };
+            var first = self._graph2d.data.datasets.length;
+            self._runDatasets.low = self._addDataset(label + ', p5)', color, bound);
+            self._runDatasets.high = self._addDataset(label + ', p95)', color, $.extend({
+                fillBetween: first,
+                fillColor: self._transparent(color, 0.15)
+            }, bound));
+            label += ', mean of ' + nSeeds + ' seeds';
+        }
+        self._runDatasets.mean = self._addDataset(label + ')', color);
         self._graph2d.update();
         self._nbRuns++;
     }
@@ -673,21 +740,108 @@ function EfficiencyWidget($container, params) {
     * episodeReturn: total return for the i-th episode
     * episodeSteps: total number of steps in the i-th episode
     * episodeDuration: total time it took to generate this episode.
+    If the run is trained over several seeds, the message also holds the
+    number of seeds that reached the i-th episode (`nSeeds`), and the metrics
+    are the statistics of these seeds (mean, p5, p95...)
     */
     self.dispatch = function (message) {
-        if (!self._graph2d.data.datasets[self._nbRuns - 1]) {
-            self._addDataset();  // add a dataset if we don't have one yet
+        if (!self._runDatasets)
+            self._addRun(message.nSeeds);  // first message of the run
+        var value = self._getMetricData(message, self._params.metric);
+        if (message.nSeeds) {
+            self._runDatasets.low.data.push({x: message.iEpisode, y: value.p5});
+            self._runDatasets.high.data.push({x: message.iEpisode, y: value.p95});
+            value = value.mean;
         }
-        self._graph2d.data.datasets[self._nbRuns - 1].data.push({
-            x: message.iEpisode,
-            y: self._getMetricData(message, self._params.metric)
-        });
+        self._runDatasets.mean.data.push({x: message.iEpisode, y: value});
         self._graph2d.update();
     }
 
     self.newSession = function (command) {
         if (self._params.reset)
             self._setup();
-        self._addDataset();
+        // the datasets are added with the first message, once it is known
+        // whether the run is trained over several seeds
+        self._runDatasets = null;
     }
-}
\ No newline at end of file
+}
+
+function EvaluationWidget($container, params, options) {
+    var self = this;
+
+    // parameters are given as a key-value store, keys being the names of the
+    // parameters as defined in the corresponding inspector.
+    self._params = params;
+    // number of evaluations shown so far
+    self._nbRuns = 0;
+
+    // save container, create widget, append to the container
+    self._$container = $container;
+    self._$widget = $(
+        '<div class="col-xs-12 inspector-widget">' +
+        '<div class="panel panel-default">' +
+        '   <div class="panel-heading">' +
+        '       <h3 class="panel-title">Evaluation</h3>' +
+        '       <div class="btn-group" role="group" aria-label="controls">' +
+        '           <button type="button" id="delete" class="btn btn-default"><span class="glyphicon glyphicon-remove" aria-hidden="true"></span></button>' +
+        '        </div>' +
+        '   </div>' +
+        '   <div class="panel-body">' +
+        '       <p id="message">Waiting for the agent to be evaluated (see the agent parameter nEvalEpisodes)...</p>' +
+        '       <table class="table table-condensed hidden">' +
+        '           <thead><tr>' +
+        '               <th>Run</th><th>Episodes</th>' +
+        '               <th>Return (95% CI)</th><th>Return p5 / p50 / p95</th>' +
+        '               <th>Steps (95% CI)</th><th>Steps p5 / p50 / p95</th>' +
+        '               <th>Duration</th>' +
+        '           </tr></thead>' +
+        '           <tbody></tbody>' +
+        '       </table>' +
+        '   </div>' +
+        '</div>');
+    self._$container.prepend(self._$widget);
+    self._$widget.find('#delete').click(function () {
+        if (options && options.onRemove)
+            options.onRemove();
+        self._$widget.remove();
+    });
+
+    self._formatMean = function (stats) {
+        return stats.mean.toFixed(2) + ' [' + stats.ciLow.toFixed(2) + ', ' +
+            stats.ciHigh.toFixed(2) + ']';
+    }
+
+    self._formatPercentiles = function (stats) {
+        return [stats.p5, stats.p50, stats.p95].map(function (v) {
+            return v.toFixed(1);
+        }).join(' / ');
+    }
+
+    /*
+    Dispatch a message to this widget.
+    It is expected that the message holds the following fields:
+    * nEpisodes: number of evaluation episodes,
+    * returns: statistics of the returns of the episodes (mean, std, min, max,
+      ciLow, ciHigh, p5, p25, p50, p75, p95),
+    * steps: statistics of the number of steps of the episodes (same fields),
+    * duration: time it took to run the episodes, in seconds
+    */
+    self.dispatch = function (message) {
+        self._nbRuns++;
+        self._$widget.find('#message').addClass('hidden');
+        self._$widget.find('table').removeClass('hidden');
+        self._$widget.find('tbody').prepend(
+            '<tr>' +
+            '<td>' + self._nbRuns + '</td>' +
+            '<td>' + message.nEpisodes + '</td>' +
+            '<td>' + self._formatMean(message.returns) + '</td>' +
+            '<td>' + self._formatPercentiles(message.returns) + '</td>' +
+            '<td>' + self._formatMean(message.steps) + '</td>' +
+            '<td>' + self._formatPercentiles(message.steps) + '</td>' +
+            '<td>' + message.duration.toFixed(2) + 's</td>' +
+            '</tr>');
+    }
+
+    // evaluations of the previous sessions are kept for comparison
+    self.newSession = function (command) {}
+}
@@ -80,13 +80,48 @@ function TrainComponent($container) {
         self._agent = new Agent(self._$container.find('#inspectors-panel'), {
             error: self.onError,
             success: self.onSuccess,
-            disconnect: self.onDisconnect
+            disconnect: self.onDisconnect,
+            paused: self.onPaused,
+            resumed: self.onResumed,
+            run: self.onRun,
+            sweepStarted: self.onSweepStarted,
+            sweepResult: self.onSweepResult,
+            sweepDone: self.onSweepDone
         });
 
         self._$container.find('#submit').click(self.onTrain);
+        self._$container.find('#sweep').click(self.onSweep);
+        self._$container.find('#sweep-mode').change(self.onSweepMode);
         self._$container.find('#interrupt').click(self.onInterrupt);
+        self._$container.find('#pause').click(self._agent.pause);
+        self._$container.find('#resume').click(self._agent.resume);
     };
 
+    // whether the parameters are being swept rather than a single agent
+    // trained
+    self._sweepMode = false;
+
+    // reveal the 'train' (or 'sweep') button once no training is in progress
+    self._showIdleButtons = function () {
+        self._hidePauseResume();
+        self._$container.find('#interrupt').addClass('hidden');
+        self._$container.find('#submit').toggleClass('hidden', self._sweepMode);
+        self._$container.find('#sweep').toggleClass('hidden', !self._sweepMode);
+        self._$container.find('#sweep-mode').prop('disabled', false);
+    }
+
+    // reveal the 'interrupt' button while training or sweeping
+    self._showRunningButtons = function () {
+        self._$container.find('#submit').addClass('hidden');
+        self._$container.find('#sweep').addClass('hidden');
+        self._$container.find('#interrupt').removeClass('hidden');
+        self._$container.find('#sweep-mode').prop('disabled', true);
+    }
+
+    self._isRunning = function () {
+        return !self._$container.find('#interrupt').hasClass('hidden');
+    }
+
     // called when clicking on the 'train' button that should start the
     // training of the agent and reveal the 'interrupt' button
     self._lastTrain = new Date();
@@ -99,42 +134,159 @@ function TrainComponent($container) {
             self._selectizeAlgo.getValue(),
             self._hyperParametersOverride.getAlgoParams(),
             self._hyperParametersOverride.getAgentParams());
-        self._$container.find('#submit').toggleClass('hidden')
-        self._$container.find('#interrupt').toggleClass('hidden')
+        self._showRunningButtons();
+        self._$container.find('#pause').removeClass('hidden')
     }
 
-    self.onDisconnect = function () {
-        if (self._$container.find('#submit').hasClass('hidden')) {
-            self._$container.find('#submit').toggleClass('hidden');
-            self._$container.find('#interrupt').toggleClass('hidden');
+    // called when toggling the sweep mode, in which several values can be
+    // picked for each parameter
+    self.onSweepMode = function () {
+        self._sweepMode = $(this).is(':checked');
+        self._hyperParametersOverride.setSweepMode(self._sweepMode);
+        self._$container.find('#sweep-metric').toggleClass('hidden', !self._sweepMode);
+        self._showIdleButtons();
+    }
+
+    // called when clicking on the 'sweep' button that should start training
+    // every combination of the parameters picked
+    self.onSweep = function () {
+        if (new Date() - self._lastTrain < 500)
+            return;  // ignore any double query in less than 500ms
+        self._agent.sweep(
+            self._selectizeProblem.getValue(),
+            self._hyperParametersOverride.getProblemParams(),
+            self._selectizeAlgo.getValue(),
+            self._hyperParametersOverride.getAlgoParams(),
+            self._hyperParametersOverride.getAgentParams(),
+            self._$container.find('#sweep-metric').val());
+        self._showRunningButtons();
+    }
+
+    // results of the runs of the ongoing sweep, the metric they are ranked
+    // by, whether higher values of it are better, and the metrics shown
+    self._sweepResults = [];
+    self._sweepMetric = null;
+    self._sweepHigherIsBetter = true;
+    self._sweepMetricNames = [];
+
+    self._formatValue = function (value) {
+        if (typeof value == 'number' && Math.round(value) != value)
+            return value.toFixed(3);
+        return value === null || value === undefined ? '-' : String(value);
+    }
+
+    // render the results received so far, best ones first, failed runs last
+    self._renderSweepResults = function () {
+        var $table = self._$container.find('#sweep-results');
+        if (!self._sweepResults.length)
+            return;
+        var params = Object.keys(self._sweepResults[0].swept).sort();
+        var score = function (result) {
+            var value = result.metrics ? result.metrics[self._sweepMetric] : null;
+            if (value === null || value === undefined)
+                return Infinity;
+            return self._sweepHigherIsBetter ? -value : value;
+        }
+        var results = self._sweepResults.slice().sort(function (a, b) {
+            return score(a) - score(b);
+        });
+        $table.find('thead').html('<tr>' +
+            ['#'].concat(params).concat(self._sweepMetricNames).map(function (name) {
+                return '<th>' + name + '</th>';
+            }).join('') + '</tr>');
+        $table.find('tbody').html(results.map(function (result, i) {
+            var cells = [score(result) === Infinity ? '-' : i + 1];
+            cells = cells.concat(params.map(function (param) {
+                return self._formatValue(result.swept[param]);
+            }));
+            if (result.error) {
+                cells.push('<span class="text-danger">' + $('<span>').text(result.error).html() + '</span>');
+            } else {
+                cells = cells.concat(self._sweepMetricNames.map(function (name) {
+                    var value = self._formatValue(result.metrics[name]);
+                    return name == self._sweepMetric ? '<strong>' + value + '</strong>' : value;
+                }));
+            }
+            return '<tr' + (result.error ? ' class="danger"' : '') + '><td>' +
+                cells.join('</td><td>') + '</td></tr>';
+        }).join(''));
+    }
+
+    // called when the sweep starts, with the parameters of each run
+    self.onSweepStarted = function (message) {
+        self._showRunningButtons();
+        self._sweepResults = [];
+        self._sweepMetric = message.metric;
+        self._sweepHigherIsBetter = message.higherIsBetter;
+        self._sweepMetricNames = self._$container.find('#sweep-metric option').map(function () {
+            return $(this).attr('value');
+        }).get();
+        self._$container.find('#sweep-results thead, #sweep-results tbody').empty();
+        self._$container.find('#sweep-progress').text('0/' + message.runs.length + ' runs');
+        self._$container.find('#sweep-panel').removeClass('hidden');
+    }
+
+    // called each time a run of the sweep is over
+    self.onSweepResult = function (message) {
+        self._sweepResults.push(message.result);
+        self._$container.find('#sweep-progress').text(message.nDone + '/' + message.nRuns + ' runs');
+        self._renderSweepResults();
+    }
+
+    // called once every run of the sweep is over
+    self.onSweepDone = function (message) {
+        self._showIdleButtons();
+        alerts.success(message.message);
+    }
+
+    // hide the 'pause' and 'resume' buttons once no training is in progress
+    self._hidePauseResume = function () {
+        self._$container.find('#pause').addClass('hidden');
+        self._$container.find('#resume').addClass('hidden');
+    }
+
+    // called when the training has been paused, reveal the 'resume' button
+    self.onPaused = function () {
+        self._$container.find('#pause').addClass('hidden');
+        self._$container.find('#resume').removeClass('hidden');
+    }
+
+    self.onResumed = function () {
+        self._$container.find('#resume').addClass('hidden');
+        self._$container.find('#pause').removeClass('hidden');
+    }
+
+    // called when a training starts, including when it is resumed from a
+    // checkpoint after reconnecting
+    self.onRun = function () {
+        if (!self._isRunning()) {
+            self._showRunningButtons();
+            self._$container.find('#pause').removeClass('hidden')
         }
     }
 
+    self.onDisconnect = function () {
+        self._showIdleButtons();
+    }
+
     // called when clicking on the 'interrupt' button that should interrupt any
     // ongoing progress and reveal the 'train' button back.
     self.onInterrupt = function () {
         if (new Date() - self._lastTrain < 500)
             return;  // ignore any double query in less than 500ms
         self._agent.interrupt();
-        self._$container.find('#submit').toggleClass('hidden')
-        self._$container.find('#interrupt').toggleClass('hidden')
+        self._showIdleButtons();
     }
 
     // called when an error occurs during the agent training
     self.onError = function (message) {
-        if (self._$container.find('#submit').hasClass('hidden')) {
-            self._$container.find('#submit').toggleClass('hidden')
-            self._$container.find('#interrupt').toggleClass('hidden')
-        }
+        self._showIdleButtons();
         alerts.danger(message.message);
     }
 
     // called when the agent training succeeds
     self.onSuccess = function (message) {
-        if (self._$container.find('#submit').hasClass('hidden')) {
-            self._$container.find('#submit').toggleClass('hidden')
-            self._$container.find('#interrupt').toggleClass('hidden')
-        }
+        self._showIdleButtons();
         alerts.success(message.message);
     }
 